@@ -6,11 +6,44 @@ class Settings(BaseSettings):
     llm_base_url: str = "https://models.inference.ai.azure.com"
     chat_model: str = "gpt-4o"
     embedding_model: str = "text-embedding-3-small"
+    embedding_dimensions: int = 0  # shorter embeddings from text-embedding-3-* models (0 = the model's full size); changing it requires python -m app.reindex
     database_url: str = "sqlite:///./tssllm.db"  # overridden by DATABASE_URL env var in Azure
     chroma_persist_dir: str = "./chroma_data"
     upload_dir: str = "./uploads"
     seed_data_dir: str = ""  # overridden by SEED_DATA_DIR env var in Azure
     hyde_enabled: bool = True
+    hyde_timeout_ms: int = 1500  # answer from raw-question retrieval if HyDE takes longer
+    hyde_cache_size: int = 1024  # HyDE paragraphs cached per (workspace, question)
+    context_token_budget: int = 6000  # estimated tokens of retrieved source text per chat prompt
+    page_size: int = 50  # default rows per page for chat messages, sources and artifacts
+    page_size_max: int = 200
+    history_max_messages: int = 20  # newest chat messages read for the prompt
+    history_token_budget: int = 3000  # estimated tokens of recent messages sent verbatim; older turns are summarized
+    history_summary_enabled: bool = True
+    history_summary_tokens: int = 400  # max length of the rolling summary of older turns
+    history_summary_batch: int = 40  # max messages folded into the summary per summarizer call; a backlog takes several
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95  # min cosine similarity between questions to reuse an answer
+    answer_cache_min_words: int = 4  # shorter questions are treated as conversation follow-ups and not cached
+    answer_cache_max_entries: int = 200  # cached answers kept per workspace
+    embedding_cache_max_entries: int = 200000  # LRU-evicted beyond this many cached chunk embeddings
+    embedding_concurrency: int = 4  # embedding batches in flight at once
+    embedding_batch_tokens: int = 16000  # estimated-token budget per embeddings request
+    embedding_max_retries: int = 5  # retries on 429/5xx, honouring Retry-After
+    ingest_workers: int = 2  # background threads parsing and embedding new sources
+    pdf_workers: int = 0  # processes extracting PDF text in parallel (0 = one per CPU, 1 = in-process)
+    pdf_pages_per_task: int = 8  # pages per process-pool task; shorter PDFs are parsed in-process
+    vector_store_backend: str = "file"  # "file" (segment logs in chroma_persist_dir, one worker) or "sql" (BLOBs in the database, any number of workers)
+    vector_compact_segments: int = 8  # compact the vector store once it has this many segments
+    vector_compact_dead_ratio: float = 0.25  # ...or once this fraction of rows is tombstoned
+    vector_quantization: str = "none"  # "float16" or "int8": score a low-precision copy of the vectors first, then rescore the candidates at full precision
+    vector_search_dimensions: int = 0  # search on this many leading dimensions (re-normalized) first, then rerank on the full vectors; 0 = off
+    vector_rerank_candidates: int = 200  # rows per segment reranked at full dimension after a truncated first pass
+    vector_cache_max_mb: int = 512  # workspace vectors kept in memory; least recently used workspaces are unloaded past this
+    ann_enabled: bool = True
+    ann_min_rows: int = 5000  # workspaces smaller than this are always searched exactly
+    ann_nprobe: int = 16  # IVF lists scanned per query
+    ann_train_sample: int = 20000  # max rows used to train IVF centroids
     azure_client_id: str = "d3590ed6-52b3-4102-aeff-aad2292ab01c"  # Microsoft Office (first-party)
     azure_tenant_id: str = "72f988bf-86f1-41af-91ab-2d7cd011db47"  # Microsoft corp tenant
 
@@ -1,5 +1,8 @@
-from sqlalchemy import create_engine
+import zlib
+from sqlalchemy import create_engine, LargeBinary
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.types import TypeDecorator
 from app.config import settings
 
 connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
@@ -9,6 +12,27 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 class Base(DeclarativeBase):
     pass
 
+def compress_text(value: str) -> bytes:
+    return zlib.compress(value.encode("utf-8"), 6)
+
+def decompress_text(value: bytes) -> str:
+    return zlib.decompress(value).decode("utf-8")
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed in a binary column, decompressed only when the column is loaded."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value) if value is not None else None
+
+def dialect_insert(model):
+    """An INSERT for the engine's dialect, which has `on_conflict_do_nothing` / `on_conflict_do_update`."""
+    return (postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert)(model)
+
 def get_db():
     db = SessionLocal()
     try:
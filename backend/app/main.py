@@ -4,9 +4,11 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from app.database import engine, Base
+from app.database import engine, Base, compress_text
+from app.models.source import PREVIEW_CHARS
 from app.routers import workspaces, sources, chat, artifacts
 from app.routers import teams as teams_router
+from app.routers import stats as stats_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -21,6 +23,42 @@ async def lifespan(app: FastAPI):
         if "team_id" not in columns:
             conn.execute(text("ALTER TABLE workspaces ADD COLUMN team_id VARCHAR(36) NULL REFERENCES teams(id)"))
             conn.commit()
+        if "content_version" not in columns:
+            conn.execute(text("ALTER TABLE workspaces ADD COLUMN content_version INTEGER NOT NULL DEFAULT 0"))
+            conn.commit()
+        if "history_summary" not in columns:
+            conn.execute(text("ALTER TABLE workspaces ADD COLUMN history_summary TEXT NULL"))
+            conn.execute(text("ALTER TABLE workspaces ADD COLUMN history_summary_through INTEGER NULL"))
+            conn.commit()
+        source_columns = [c["name"] for c in inspect(engine).get_columns("sources")]
+        if "preview" not in source_columns:
+            conn.execute(text("ALTER TABLE sources ADD COLUMN preview TEXT NULL"))
+            conn.execute(text("ALTER TABLE sources ADD COLUMN content_length INTEGER NOT NULL DEFAULT 0"))
+            conn.execute(text(
+                f"UPDATE sources SET preview = substr(content_text, 1, {PREVIEW_CHARS}), "
+                "content_length = coalesce(length(content_text), 0)"
+            ))
+            conn.commit()
+        # Move extracted text from the legacy content_text column into compressed content_z
+        if "content_text" in source_columns:
+            if "content_z" not in source_columns:
+                blob = "BYTEA" if engine.dialect.name == "postgresql" else "BLOB"
+                conn.execute(text(f"ALTER TABLE sources ADD COLUMN content_z {blob} NULL"))
+            while True:
+                rows = conn.execute(text("SELECT id, content_text FROM sources WHERE content_text IS NOT NULL LIMIT 100")).all()
+                if not rows:
+                    break
+                for source_id, content in rows:
+                    conn.execute(
+                        text("UPDATE sources SET content_z = :z, content_text = NULL WHERE id = :id"),
+                        {"z": compress_text(content), "id": source_id},
+                    )
+                conn.commit()
+        # Composite indexes for the paginated list endpoints (create_all skips existing tables)
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_chat_messages_workspace_created ON chat_messages (workspace_id, created_at)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_sources_workspace_created ON sources (workspace_id, created_at)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_artifacts_workspace_created ON artifacts (workspace_id, created_at)"))
+        conn.commit()
     # Seed demo workspace
     from app.database import SessionLocal
     from app.services.demo_seed import seed_demo_workspace
@@ -30,7 +68,17 @@ async def lifespan(app: FastAPI):
         db.close()
     except Exception as e:
         print(f"Warning: demo seed failed: {e}")
+    # Let background ingest workers push websocket events
+    import asyncio
+    from app.services.ws_manager import manager
+    from app.services.ingest_queue import IngestQueue
+    from app.services.source_service import SourceService
+    from app.services.suggestion_service import SuggestionService
+    manager.bind_loop(asyncio.get_running_loop())
     yield
+    IngestQueue.shutdown()
+    SourceService.shutdown()
+    SuggestionService.shutdown()
 
 app = FastAPI(title="TSS LLM - Trust and Security Services", lifespan=lifespan)
 
@@ -40,6 +88,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(teams_router.router, prefix="/api/teams", tags=["teams"])
@@ -47,6 +96,7 @@ app.include_router(workspaces.router, prefix="/api/workspaces", tags=["workspace
 app.include_router(sources.router, prefix="/api/workspaces/{workspace_id}/sources", tags=["sources"])
 app.include_router(chat.router, prefix="/api/workspaces/{workspace_id}/chat", tags=["chat"])
 app.include_router(artifacts.router, prefix="/api/workspaces/{workspace_id}/artifacts", tags=["artifacts"])
+app.include_router(stats_router.router, prefix="/api/stats", tags=["stats"])
 
 @app.get("/api/health")
 def health_check():
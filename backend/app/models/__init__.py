@@ -3,5 +3,8 @@ from app.models.workspace import Workspace
 from app.models.source import Source
 from app.models.chat import ChatMessage
 from app.models.artifact import Artifact
+from app.models.embedding_cache import EmbeddingCacheEntry
+from app.models.suggestion import WorkspaceSuggestions
+from app.models.vector import VectorPartition, VectorRow
 
-__all__ = ["Team", "Workspace", "Source", "ChatMessage", "Artifact"]
+__all__ = ["Team", "Workspace", "Source", "ChatMessage", "Artifact", "EmbeddingCacheEntry", "WorkspaceSuggestions", "VectorPartition", "VectorRow"]
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Artifact(Base):
     __tablename__ = "artifacts"
+    __table_args__ = (Index("ix_artifacts_workspace_created", "workspace_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     workspace_id = Column(String(36), ForeignKey("workspaces.id"), nullable=False, index=True)
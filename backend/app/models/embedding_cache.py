@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, Integer, LargeBinary, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    key = Column(String(64), primary_key=True)  # sha256 of model + normalized chunk text
+    model = Column(String(100), nullable=False)
+    dim = Column(Integer, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # raw float32 bytes
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
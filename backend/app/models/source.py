@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, event
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
-from app.database import Base
+from app.database import Base, CompressedText
+
+# Leading characters of the text kept in `preview` for greetings and suggestions
+PREVIEW_CHARS = 2000
 
 class Source(Base):
     __tablename__ = "sources"
+    __table_args__ = (Index("ix_sources_workspace_created", "workspace_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     workspace_id = Column(String(36), ForeignKey("workspaces.id"), nullable=False, index=True)
@@ -11,5 +16,16 @@ class Source(Base):
     source_type = Column(String(50), nullable=False)  # "docx" or "url"
     url = Column(String(2048), nullable=True)
     file_path = Column(String(512), nullable=True)
-    content_text = Column(Text, nullable=True)
+    # Full extracted text, stored compressed in `content_z`; only loaded (and decompressed)
+    # when accessed or undeferred, e.g. by the source detail endpoint
+    content_text = deferred(Column("content_z", CompressedText, nullable=True))
+    # Kept in sync with content_text by the listener below
+    preview = Column(Text, nullable=True)
+    content_length = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+@event.listens_for(Source.content_text, "set")
+def _sync_preview(source: Source, value: str | None, oldvalue, initiator):
+    source.preview = (value or "")[:PREVIEW_CHARS]
+    source.content_length = len(value or "")
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+class WorkspaceSuggestions(Base):
+    __tablename__ = "workspace_suggestions"
+
+    workspace_id = Column(String(36), ForeignKey("workspaces.id"), primary_key=True)
+    kind = Column(String(20), primary_key=True)  # "suggestions" or "followups"
+    key = Column(String(64), nullable=False)  # source-set hash, or id of the last chat message
+    items = Column(Text, nullable=False)  # JSON array of question strings
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Text, LargeBinary, ForeignKey, Index
+from sqlalchemy.orm import deferred
+from app.database import Base, CompressedText
+
+class VectorPartition(Base):
+    """Per-workspace change counters for the SQL vector store."""
+    __tablename__ = "vector_partitions"
+
+    workspace_id = Column(String(36), primary_key=True)
+    dim = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, default=0)  # bumped by every add and delete
+    removals = Column(Integer, nullable=False, default=0)  # bumped by deletes only
+
+class VectorRow(Base):
+    __tablename__ = "vector_rows"
+    __table_args__ = (Index("ix_vector_rows_workspace_version", "workspace_id", "version"),)
+
+    id = Column(Integer, primary_key=True)
+    workspace_id = Column(String(36), ForeignKey("vector_partitions.workspace_id"), nullable=False)
+    source_id = Column(Integer, nullable=False, index=True)
+    version = Column(Integer, nullable=False)  # partition version that added the row
+    chunk_id = Column(String(255), nullable=False)
+    metadata_json = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # raw float32 bytes, L2-normalized
+    text = deferred(Column(CompressedText, nullable=False))
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -11,4 +11,9 @@ class Workspace(Base):
     team_id = Column(String(36), ForeignKey("teams.id"), nullable=True, index=True)
     name = Column(String(255), nullable=False, default="Untitled Notebook")
     chat_reset_at = Column(DateTime(timezone=True), nullable=True, default=None)
+    # Bumped whenever sources are added or removed or the chat is reset; invalidates cached answers
+    content_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Rolling summary of chat messages up to history_summary_through that no longer fit the prompt window
+    history_summary = Column(Text, nullable=True)
+    history_summary_through = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,43 @@
+"""Re-embed stored chunks after changing `embedding_model` or `embedding_dimensions`.
+
+Run from the backend directory, with the app stopped:
+
+    python -m app.reindex [workspace_id ...]
+
+Without arguments every workspace is re-embedded. Each workspace's chunk
+texts and metadata are read back from the vector store, embedded with the
+current settings and swapped in at once, and its cached answers are
+invalidated.
+"""
+import argparse
+import logging
+import time
+from app.database import Base, SessionLocal, engine
+from app.models.workspace import Workspace
+from app.services.embedding_service import EmbeddingService
+
+logger = logging.getLogger("app.reindex")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("workspace_ids", nargs="*", help="workspaces to re-embed (default: all)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    Base.metadata.create_all(bind=engine)
+
+    with SessionLocal() as db:
+        workspace_ids = args.workspace_ids or [ws_id for (ws_id,) in db.query(Workspace.id).order_by(Workspace.created_at)]
+    for ws_id in workspace_ids:
+        started = time.perf_counter()
+        count = EmbeddingService.reindex_workspace(ws_id)
+        with SessionLocal() as db:
+            db.query(Workspace).filter(Workspace.id == ws_id).update(
+                {Workspace.content_version: Workspace.content_version + 1}, synchronize_session=False
+            )
+            db.commit()
+        logger.info(f"Workspace {ws_id}: re-embedded {count} chunks in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
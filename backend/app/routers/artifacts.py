@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.artifact import ArtifactCreate, ArtifactUpdate, ArtifactResponse
 from app.services.artifact_service import ArtifactService
 from app.services.ws_manager import manager
+from app.config import settings
 
 router = APIRouter()
 
 @router.get("", response_model=list[ArtifactResponse])
-def list_artifacts(workspace_id: str, db: Session = Depends(get_db)):
-    return ArtifactService.get_all(db, workspace_id)
+def list_artifacts(
+    workspace_id: str,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.page_size_max),
+    cursor: int | None = None,
+    db: Session = Depends(get_db),
+):
+    """Artifacts, most recently updated first. Pass `X-Next-Cursor` back as `cursor` for the next page."""
+    artifacts, next_cursor = ArtifactService.get_all(db, workspace_id, limit, cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return artifacts
 
 @router.get("/{artifact_id}", response_model=ArtifactResponse)
 def get_artifact(artifact_id: int, db: Session = Depends(get_db)):
@@ -1,27 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.chat import ChatRequest, ChatMessageResponse, SuggestionsResponse
 from app.services.chat_service import ChatService
+from app.services.suggestion_service import SuggestionService
 from app.models.workspace import Workspace
 from app.services.ws_manager import manager
+from app.config import settings
 from datetime import datetime, timezone
 
 router = APIRouter()
 
+# Streamed answers still being generated; referenced so they aren't garbage-collected
+_generations: set[asyncio.Task] = set()
+
 @router.get("", response_model=list[ChatMessageResponse])
-def list_messages(workspace_id: str, db: Session = Depends(get_db)):
-    return ChatService.get_messages(db, workspace_id)
+def list_messages(
+    workspace_id: str,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.page_size_max),
+    cursor: int | None = None,
+    db: Session = Depends(get_db),
+):
+    """The newest messages, oldest first. Pass `X-Next-Cursor` back as `cursor` for earlier ones."""
+    messages, next_cursor = ChatService.get_messages(db, workspace_id, limit, cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return messages
 
 @router.get("/suggestions", response_model=SuggestionsResponse)
 def get_suggestions(workspace_id: str, db: Session = Depends(get_db)):
-    suggestions = ChatService.generate_suggestions(db, workspace_id)
-    return SuggestionsResponse(suggestions=suggestions)
+    suggestions = SuggestionService.get_suggestions(db, workspace_id)
+    return SuggestionsResponse(suggestions=suggestions or [], pending=suggestions is None)
 
 @router.post("/followups", response_model=SuggestionsResponse)
 def get_followups(workspace_id: str, db: Session = Depends(get_db)):
-    followups = ChatService.generate_followups(db, workspace_id)
-    return SuggestionsResponse(suggestions=followups)
+    followups = SuggestionService.get_followups(db, workspace_id)
+    return SuggestionsResponse(suggestions=followups or [], pending=followups is None)
 
 @router.post("/reset")
 def reset_chat(workspace_id: str, db: Session = Depends(get_db)):
@@ -29,6 +47,9 @@ def reset_chat(workspace_id: str, db: Session = Depends(get_db)):
     if not ws:
         raise HTTPException(status_code=404, detail="Workspace not found")
     ws.chat_reset_at = datetime.now(timezone.utc)
+    ws.content_version += 1
+    ws.history_summary = None
+    ws.history_summary_through = None
     db.commit()
     return {"ok": True, "chat_reset_at": ws.chat_reset_at.isoformat()}
 
@@ -38,14 +59,54 @@ def restore_chat(workspace_id: str, db: Session = Depends(get_db)):
     if not ws:
         raise HTTPException(status_code=404, detail="Workspace not found")
     ws.chat_reset_at = None
+    ws.content_version += 1
+    ws.history_summary = None
+    ws.history_summary_through = None
     db.commit()
     return {"ok": True}
 
 @router.post("", response_model=ChatMessageResponse)
-async def send_message(workspace_id: str, data: ChatRequest, db: Session = Depends(get_db)):
+async def send_message(workspace_id: str, data: ChatRequest):
     try:
-        msg = ChatService.send_message(db, data.content, workspace_id, data.source_ids)
+        msg = await ChatService.send_message(data.content, workspace_id, data.source_ids)
         await manager.broadcast(workspace_id, "chat_message")
         return msg
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+
+@router.post("/stream")
+async def stream_message(workspace_id: str, data: ChatRequest):
+    """Answer as server-sent events: `token` deltas, then `done` with the saved message.
+
+    The answer is generated in its own task, so it is still finished and saved
+    (and announced with `chat_message`) if the client disconnects mid-stream.
+    """
+    queue: asyncio.Queue[dict | None] = asyncio.Queue()
+
+    async def generate():
+        try:
+            async for event in ChatService.stream_message(data.content, workspace_id, data.source_ids):
+                if event["type"] == "done":
+                    message = ChatMessageResponse.model_validate(event["message"]).model_dump(mode="json")
+                    queue.put_nowait({"type": "done", "message": message})
+                    await manager.broadcast(workspace_id, "chat_message")
+                else:
+                    queue.put_nowait(event)
+        except Exception as e:
+            queue.put_nowait({"type": "error", "detail": f"Chat error: {str(e)}"})
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(generate())
+    _generations.add(task)
+    task.add_done_callback(_generations.discard)
+
+    async def events():
+        while (event := await queue.get()) is not None:
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
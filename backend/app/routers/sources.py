@@ -1,12 +1,14 @@
 import os
 import uuid
 import asyncio
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas.source import UrlCreate, PasteCreate, SourceResponse, SourceDetailResponse
+from app.schemas.source import UrlCreate, PasteCreate, SourceResponse, SourceDetailResponse, IngestJobResponse
 from app.services.source_service import SourceService
+from app.services.suggestion_service import SuggestionService
 from app.services.embedding_service import EmbeddingService
+from app.services.ingest_queue import IngestQueue
 from app.services.sharepoint_service import SharePointService
 from app.services.ws_manager import manager
 from app.config import settings
@@ -14,8 +16,23 @@ from app.config import settings
 router = APIRouter()
 
 @router.get("", response_model=list[SourceResponse])
-def list_sources(workspace_id: str, db: Session = Depends(get_db)):
-    return SourceService.get_all(db, workspace_id)
+def list_sources(
+    workspace_id: str,
+    response: Response,
+    limit: int = Query(settings.page_size, ge=1, le=settings.page_size_max),
+    cursor: int | None = None,
+    db: Session = Depends(get_db),
+):
+    """Sources, newest first. Pass `X-Next-Cursor` back as `cursor` for the next page."""
+    sources, next_cursor = SourceService.get_all(db, workspace_id, limit, cursor)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return sources
+
+@router.get("/ids", response_model=list[int])
+def list_source_ids(workspace_id: str, db: Session = Depends(get_db)):
+    """Ids of all sources, newest first, so select-all works without loading every page."""
+    return SourceService.get_ids(db, workspace_id)
 
 @router.get("/sharepoint/status")
 def sharepoint_status():
@@ -32,8 +49,20 @@ async def sharepoint_login():
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"SharePoint sign-in failed: {str(e)}")
 
-@router.post("/upload", response_model=SourceResponse)
-async def upload_file(workspace_id: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+@router.get("/jobs", response_model=list[IngestJobResponse])
+def list_ingest_jobs(workspace_id: str):
+    """Ingest jobs still queued or running in this workspace."""
+    return IngestQueue.list_active(workspace_id)
+
+@router.get("/jobs/{job_id}", response_model=IngestJobResponse)
+def get_ingest_job(workspace_id: str, job_id: str):
+    job = IngestQueue.get(job_id)
+    if not job or job["workspace_id"] != workspace_id:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job
+
+@router.post("/upload", response_model=IngestJobResponse, status_code=202)
+async def upload_file(workspace_id: str, file: UploadFile = File(...)):
     if not file.filename or not file.filename.lower().endswith((".docx", ".vtt", ".pdf")):
         raise HTTPException(status_code=400, detail="Only .docx, .vtt, and .pdf files are supported")
     file_id = uuid.uuid4().hex[:8]
@@ -44,48 +73,32 @@ async def upload_file(workspace_id: str, file: UploadFile = File(...), db: Sessi
             f.write(content)
     except OSError as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {e}")
-    try:
-        source = SourceService.create_from_file(db, file_path, file.filename, workspace_id)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse file: {e}")
-    try:
-        EmbeddingService.add_source(source.id, source.name, source.content_text or "", workspace_id)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate embeddings: {e}")
-    await manager.broadcast(workspace_id, "sources_changed")
-    return source
+    # Parsing and embedding happen in the background; progress arrives as ingest_progress events
+    return IngestQueue.submit(workspace_id, "file", file.filename, file_path=file_path)
 
-@router.post("/url", response_model=SourceResponse)
-async def add_url(workspace_id: str, data: UrlCreate, db: Session = Depends(get_db)):
+@router.post("/url", response_model=IngestJobResponse, status_code=202)
+async def add_url(workspace_id: str, data: UrlCreate):
     if SharePointService.is_sharepoint_url(data.url):
         raise HTTPException(status_code=400, detail="SharePoint URLs are not currently supported. Please copy the text on the page and paste it using the button above \"Paste Copied Text\"")
-    try:
-        source = await SourceService.create_from_url(db, data.url, workspace_id)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {str(e)}")
-    EmbeddingService.add_source(source.id, source.name, source.content_text or "", workspace_id)
-    await manager.broadcast(workspace_id, "sources_changed")
-    return source
+    return IngestQueue.submit(workspace_id, "url", data.url, url=data.url)
 
-@router.post("/paste", response_model=SourceResponse)
-async def paste_content(workspace_id: str, data: PasteCreate, db: Session = Depends(get_db)):
+@router.post("/paste", response_model=IngestJobResponse, status_code=202)
+async def paste_content(workspace_id: str, data: PasteCreate):
     """Add a source by pasting text content directly (e.g. from SharePoint pages)."""
-    source = SourceService.create_from_paste(db, data.title, data.content, workspace_id)
-    EmbeddingService.add_source(source.id, source.name, source.content_text or "", workspace_id)
-    await manager.broadcast(workspace_id, "sources_changed")
-    return source
+    return IngestQueue.submit(workspace_id, "paste", data.title, content=data.content)
 
 @router.get("/{source_id}", response_model=SourceDetailResponse)
 def get_source(source_id: int, db: Session = Depends(get_db)):
-    source = SourceService.get_by_id(db, source_id)
+    source = SourceService.get_by_id(db, source_id, with_content=True)
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
     return source
 
 @router.delete("/{source_id}")
 async def delete_source(workspace_id: str, source_id: int, db: Session = Depends(get_db)):
-    EmbeddingService.remove_source(source_id)
+    EmbeddingService.remove_source(source_id, workspace_id)
     if not SourceService.delete(db, source_id):
         raise HTTPException(status_code=404, detail="Source not found")
     await manager.broadcast(workspace_id, "sources_changed")
+    SuggestionService.refresh_suggestions(workspace_id)
     return {"ok": True}
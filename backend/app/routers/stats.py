@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from app.services.answer_cache import AnswerCache
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_service import EmbeddingService
+
+router = APIRouter()
+
+@router.get("/embedding-cache")
+def embedding_cache_stats():
+    return EmbeddingCache.stats()
+
+@router.get("/answer-cache")
+def answer_cache_stats():
+    return AnswerCache.stats()
+
+@router.get("/vector-store")
+def vector_store_stats():
+    return EmbeddingService.store_stats()
@@ -9,7 +9,9 @@ from app.models.source import Source
 from app.models.chat import ChatMessage
 from app.models.artifact import Artifact
 from app.services.ws_manager import manager
+from app.services.answer_cache import AnswerCache
 from app.services.embedding_service import EmbeddingService
+from app.services.suggestion_service import SuggestionService
 
 router = APIRouter()
 
@@ -65,18 +67,22 @@ def delete_workspace(workspace_id: str, db: Session = Depends(get_db)):
     workspace = db.query(Workspace).filter(Workspace.id == workspace_id).first()
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
-    # Delete uploaded files and embeddings for each source
-    sources = db.query(Source).filter(Source.workspace_id == workspace_id).all()
-    for source in sources:
-        if source.file_path and os.path.exists(source.file_path):
-            os.remove(source.file_path)
-        EmbeddingService.remove_source(source.id)
+    # Delete uploaded files for each source
+    file_paths = db.query(Source.file_path).filter(Source.workspace_id == workspace_id).all()
+    for (file_path,) in file_paths:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
     # Delete related records
     db.query(Source).filter(Source.workspace_id == workspace_id).delete()
     db.query(ChatMessage).filter(ChatMessage.workspace_id == workspace_id).delete()
     db.query(Artifact).filter(Artifact.workspace_id == workspace_id).delete()
+    SuggestionService.forget_workspace(db, workspace_id)
     db.delete(workspace)
     db.commit()
+    # Then the whole vector partition: running ingest jobs stop writing once the
+    # workspace row is gone, so nothing they stored before that survives this
+    EmbeddingService.remove_workspace(workspace_id)
+    AnswerCache.forget_workspace(workspace_id)
     return {"ok": True}
 
 
@@ -18,3 +18,4 @@ class ChatMessageResponse(BaseModel):
 
 class SuggestionsResponse(BaseModel):
     suggestions: list[str]
+    pending: bool = False  # still being generated; delivered by a suggestions_ready websocket event
@@ -22,3 +22,14 @@ class SourceResponse(BaseModel):
 
 class SourceDetailResponse(SourceResponse):
     content_text: Optional[str] = None
+
+class IngestJobResponse(BaseModel):
+    id: str
+    kind: str
+    name: str
+    status: str  # "queued", "parsing", "embedding", "done" or "failed"
+    chunks_done: int = 0
+    chunks_total: int = 0
+    source_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
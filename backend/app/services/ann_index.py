@@ -0,0 +1,116 @@
+import os
+import numpy as np
+
+
+def _unit_rows(arr: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    return np.ascontiguousarray(arr / (norms + 1e-10), dtype=np.float32)
+
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) index over one workspace partition.
+
+    Rows are clustered around `nlist` unit-norm centroids with spherical
+    k-means; a query only scores the rows in its `nprobe` nearest lists.
+    Vectors stay in the segment matrices — the index keeps, per segment, the
+    row numbers grouped by list (`order`) and each list's bounds (`offsets`),
+    so new segments are indexed incrementally by assigning their rows to the
+    existing centroids.
+    """
+
+    def __init__(self, centroids: np.ndarray, trained_rows: int):
+        self.centroids = centroids
+        self.trained_rows = trained_rows
+        self._lists: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + sum(order.nbytes + offsets.nbytes for order, offsets, _ in self._lists.values())
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, nlist: int | None = None, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Spherical k-means on (a sample of) normalized vectors."""
+        n = len(vectors)
+        if nlist is None:
+            nlist = int(np.clip(np.sqrt(n), 16, 4096))
+        nlist = max(1, min(nlist, n))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = cls._nearest(vectors, centroids)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            filled = counts > 0
+            sums = np.add.reduceat(vectors[order], starts[filled], axis=0)
+            new = centroids.copy()
+            new[filled] = sums
+            # Re-seed empty lists from random rows so every list stays useful
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                new[empty] = vectors[rng.choice(n, len(empty), replace=False)]
+            centroids = _unit_rows(new)
+        return cls(centroids, n)
+
+    @staticmethod
+    def _nearest(matrix: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+        out = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), block):
+            out[start:start + block] = np.argmax(np.asarray(matrix[start:start + block]) @ centroids.T, axis=1)
+        return out
+
+    # -- per-segment lists -------------------------------------------------
+
+    def add_segment(self, seq: int, matrix: np.ndarray):
+        assign = self._nearest(matrix, self.centroids)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        self._lists[seq] = (order, offsets, matrix)
+
+    def drop_segment(self, seq: int):
+        self._lists.pop(seq, None)
+
+    def has_segment(self, seq: int) -> bool:
+        return seq in self._lists
+
+    def probe(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        """The ids of the `nprobe` lists whose centroids are closest to q."""
+        scores = self.centroids @ q
+        nprobe = min(nprobe, self.nlist)
+        if nprobe == self.nlist:
+            return np.arange(self.nlist)
+        return np.argpartition(-scores, nprobe - 1)[:nprobe]
+
+    def candidates(self, seq: int, matrix: np.ndarray, lists: np.ndarray) -> np.ndarray | None:
+        """Sorted row numbers of a segment that fall in `lists`, or None if unindexed.
+
+        Compaction reuses a seq for the merged segment, so the lists only
+        count if they were built from this very `matrix`; a reader still
+        holding the pre-compaction segment gets None and scans it exactly.
+        """
+        entry = self._lists.get(seq)
+        if entry is None or entry[2] is not matrix:
+            return None
+        order, offsets, _ = entry
+        parts = [order[offsets[c]:offsets[c + 1]] for c in lists.tolist()]
+        rows = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        rows.sort()
+        return rows
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, path: str):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, trained_rows=np.int64(self.trained_rows))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex | None":
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(np.ascontiguousarray(data["centroids"], dtype=np.float32), int(data["trained_rows"]))
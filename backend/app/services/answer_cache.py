@@ -0,0 +1,86 @@
+import threading
+import numpy as np
+from app.config import settings
+
+
+class AnswerCache:
+    """In-process semantic cache of chat answers, per workspace.
+
+    A question reuses a previous answer when its embedding is within
+    `answer_cache_threshold` cosine similarity of an earlier question asked
+    with the same source selection. Entries are tagged with the workspace's
+    `content_version` and ignored (and dropped) once it changes, so adding or
+    deleting sources or resetting the chat invalidates them. Each workspace
+    keeps at most `answer_cache_max_entries` entries, least recently used
+    first out.
+    """
+
+    _lock = threading.Lock()
+    _entries: dict[str, list[dict]] = {}
+    _hits = 0
+    _misses = 0
+    _latency_saved = 0.0
+
+    @staticmethod
+    def cacheable(question: str) -> bool:
+        # Short questions are usually follow-ups ("why?", "tell me more") that depend on the conversation
+        return settings.answer_cache_enabled and len(question.split()) >= settings.answer_cache_min_words
+
+    @classmethod
+    def lookup(cls, workspace_id: str, version: int, source_ids: list[int] | None, embedding) -> dict | None:
+        q = np.asarray(embedding, dtype=np.float32)
+        q /= np.linalg.norm(q) + 1e-10
+        scope = sorted(source_ids) if source_ids is not None else None
+        with cls._lock:
+            entries = [e for e in cls._entries.get(workspace_id, []) if e["version"] == version]
+            cls._entries[workspace_id] = entries
+            positions = [n for n, e in enumerate(entries) if e["scope"] == scope]
+            best = None
+            if positions:
+                sims = np.stack([entries[n]["vector"] for n in positions]) @ q
+                i = int(np.argmax(sims))
+                if sims[i] >= settings.answer_cache_threshold:
+                    # By position: entries hold numpy vectors, so they can't be compared with ==
+                    best = entries.pop(positions[i])
+                    entries.append(best)
+            if best is None:
+                cls._misses += 1
+                return None
+            cls._hits += 1
+            cls._latency_saved += best["latency"]
+            return {"content": best["content"], "sources_cited": best["sources_cited"], "similarity": float(sims[i])}
+
+    @classmethod
+    def store(cls, workspace_id: str, version: int, source_ids: list[int] | None, embedding, content: str, sources_cited: str | None, latency: float):
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector /= np.linalg.norm(vector) + 1e-10
+        entry = {
+            "version": version,
+            "scope": sorted(source_ids) if source_ids is not None else None,
+            "vector": vector,
+            "content": content,
+            "sources_cited": sources_cited,
+            "latency": latency,
+        }
+        with cls._lock:
+            entries = [e for e in cls._entries.get(workspace_id, []) if e["version"] == version]
+            entries.append(entry)
+            cls._entries[workspace_id] = entries[-settings.answer_cache_max_entries:]
+
+    @classmethod
+    def forget_workspace(cls, workspace_id: str):
+        with cls._lock:
+            cls._entries.pop(workspace_id, None)
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            lookups = cls._hits + cls._misses
+            return {
+                "hits": cls._hits,
+                "misses": cls._misses,
+                "hit_rate": cls._hits / lookups if lookups else 0.0,
+                "latency_saved_s": round(cls._latency_saved, 3),
+                "entries": sum(len(v) for v in cls._entries.values()),
+                "workspaces": len(cls._entries),
+            }
@@ -1,10 +1,17 @@
 from sqlalchemy.orm import Session
 from app.models.artifact import Artifact
+from app.services.pagination import keyset_page
 
 class ArtifactService:
     @staticmethod
-    def get_all(db: Session, workspace_id: str) -> list[Artifact]:
-        return db.query(Artifact).filter(Artifact.workspace_id == workspace_id).order_by(Artifact.updated_at.desc()).all()
+    def get_all(db: Session, workspace_id: str, limit: int, cursor: int | None = None) -> tuple[list[Artifact], int | None]:
+        """A page of artifacts, newest first, and the cursor for the next page.
+
+        Pages on `created_at`: edits change `updated_at`, which would move an
+        artifact across the cursor between page fetches.
+        """
+        query = db.query(Artifact).filter(Artifact.workspace_id == workspace_id)
+        return keyset_page(query, Artifact, "created_at", limit, cursor)
 
     @staticmethod
     def get_by_id(db: Session, artifact_id: int) -> Artifact | None:
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from openai import AsyncOpenAI
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.chat import ChatMessage
+from app.models.workspace import Workspace
+from app.services.embedding_service import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Longest slice of a single message fed to the summarizer
+_SUMMARY_MESSAGE_CHARS = 2000
+
+
+class ChatHistory:
+    """Bounded conversation history for chat prompts.
+
+    Only the newest `history_max_messages` messages are read (SQL LIMIT) and
+    of those, as many as fit in `history_token_budget` estimated tokens are
+    sent verbatim. Older turns are folded into a rolling summary stored on the
+    workspace (`history_summary`, covering messages up to
+    `history_summary_through`), which is updated in the background after each
+    answer, so prompt size stays flat however long the conversation gets.
+    """
+
+    _tasks: dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _recent(db: Session, ws: Workspace | None, workspace_id: str, before_id: int | None) -> list[ChatMessage]:
+        """Unsummarized messages that fit the window, oldest first."""
+        query = db.query(ChatMessage).filter(ChatMessage.workspace_id == workspace_id)
+        if before_id is not None:
+            query = query.filter(ChatMessage.id < before_id)
+        if ws and ws.chat_reset_at:
+            query = query.filter(ChatMessage.created_at > ws.chat_reset_at)
+        if ws and ws.history_summary_through:
+            query = query.filter(ChatMessage.id > ws.history_summary_through)
+        rows = query.order_by(ChatMessage.id.desc()).limit(settings.history_max_messages).all()
+        kept: list[ChatMessage] = []
+        used = 0
+        for m in rows:
+            used += estimate_tokens(m.content)
+            if kept and used > settings.history_token_budget:
+                break
+            kept.append(m)
+        kept.reverse()
+        return kept
+
+    @classmethod
+    def window(cls, db: Session, workspace_id: str, before_id: int) -> list[dict]:
+        """Completion messages for the conversation before message `before_id`."""
+        ws = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+        max_chars = settings.history_token_budget * 4
+        messages = [{"role": m.role, "content": m.content[-max_chars:]} for m in cls._recent(db, ws, workspace_id, before_id)]
+        if ws and ws.history_summary:
+            messages.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{ws.history_summary}"})
+        return messages
+
+    @classmethod
+    def schedule_summary(cls, client: AsyncOpenAI, workspace_id: str):
+        """Fold messages that fell out of the window into the summary. Doesn't wait;
+        skipped while an update for the workspace is still running."""
+        if not settings.history_summary_enabled:
+            return
+        task = cls._tasks.get(workspace_id)
+        if task is not None and not task.done():
+            return
+        task = cls._tasks[workspace_id] = asyncio.create_task(cls._update_summary(client, workspace_id))
+        task.add_done_callback(lambda _: cls._tasks.pop(workspace_id, None))
+
+    @classmethod
+    def _pending(cls, db: Session, workspace_id: str) -> dict | None:
+        ws = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+        if ws is None:
+            return None
+        recent = cls._recent(db, ws, workspace_id, None)
+        if not recent:
+            return None
+        query = db.query(ChatMessage).filter(
+            ChatMessage.workspace_id == workspace_id,
+            ChatMessage.id < recent[0].id,
+        )
+        if ws.chat_reset_at:
+            query = query.filter(ChatMessage.created_at > ws.chat_reset_at)
+        if ws.history_summary_through:
+            query = query.filter(ChatMessage.id > ws.history_summary_through)
+        # Oldest first, so `history_summary_through` only ever moves past messages
+        # that were summarized; a long backlog takes several batches
+        rows = query.order_by(ChatMessage.id.asc()).limit(settings.history_summary_batch).all()
+        if not rows:
+            return None
+        return {
+            "summary": ws.history_summary,
+            "through": ws.history_summary_through,
+            "reset_at": ws.chat_reset_at,
+            "turns": [{"role": m.role, "content": m.content[:_SUMMARY_MESSAGE_CHARS]} for m in rows],
+            "last_id": rows[-1].id,
+        }
+
+    @staticmethod
+    def _save(db: Session, workspace_id: str, pending: dict, summary: str) -> bool:
+        ws = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+        # The chat was reset or another update won in the meantime
+        if ws is None or ws.history_summary_through != pending["through"] or ws.chat_reset_at != pending["reset_at"]:
+            return False
+        ws.history_summary = summary
+        ws.history_summary_through = pending["last_id"]
+        db.commit()
+        return True
+
+    @staticmethod
+    async def _db(fn, *args):
+        def run():
+            db = SessionLocal()
+            try:
+                return fn(db, *args)
+            finally:
+                db.close()
+        return await asyncio.to_thread(run)
+
+    @classmethod
+    async def _update_summary(cls, client: AsyncOpenAI, workspace_id: str):
+        """Fold pending messages into the summary, one batch at a time, until caught up."""
+        try:
+            while (pending := await cls._db(cls._pending, workspace_id)) is not None:
+                if not await cls._fold(client, workspace_id, pending):
+                    return
+        except Exception:
+            logger.exception(f"Updating the chat history summary of workspace {workspace_id} failed")
+
+    @classmethod
+    async def _fold(cls, client: AsyncOpenAI, workspace_id: str, pending: dict) -> bool:
+        """Merge one batch into the summary; False if nothing was saved."""
+        turns = "\n\n".join(f"{t['role'].upper()}: {t['content']}" for t in pending["turns"])
+        response = await client.chat.completions.create(
+            model=settings.chat_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You maintain a running summary of a conversation between a user and a research assistant. "
+                        "Merge the new turns into the current summary. Keep the user's goals, facts and figures "
+                        "that were established, source names, decisions and open questions. Drop pleasantries. "
+                        f"Reply with the updated summary only, in at most {settings.history_summary_tokens * 3 // 4} words."
+                    ),
+                },
+                {"role": "user", "content": f"CURRENT SUMMARY:\n{pending['summary'] or '(none)'}\n\nNEW TURNS:\n{turns}"},
+            ],
+            temperature=0.2,
+            max_tokens=settings.history_summary_tokens,
+        )
+        summary = (response.choices[0].message.content or "").strip()
+        if not summary or not await cls._db(cls._save, workspace_id, pending, summary):
+            return False
+        logger.info(f"Folded {len(pending['turns'])} chat messages into the history summary of workspace {workspace_id}")
+        return True
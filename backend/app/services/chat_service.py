@@ -1,29 +1,56 @@
+import asyncio
 import json
+import logging
 import re
-from openai import OpenAI
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from openai import AsyncOpenAI
 from sqlalchemy.orm import Session
+from app.database import SessionLocal
 from app.models.chat import ChatMessage
 from app.models.source import Source
 from app.models.workspace import Workspace
+from app.services.answer_cache import AnswerCache
+from app.services.chat_history import ChatHistory
+from app.services.context_packer import ContextPacker
+from app.services.embedding_cache import EmbeddingCache
 from app.services.embedding_service import EmbeddingService
+from app.services.pagination import keyset_page
+from app.services.suggestion_service import SuggestionService
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
 _GREETING_PATTERN = re.compile(
     r"^(h(i|ello|ey|owdy)|greetings|good\s*(morning|afternoon|evening)|what'?s\s*up|sup|yo)[\s!.,?]*$",
     re.IGNORECASE,
 )
 
 class ChatService:
-    _client = None
+    _async_client: AsyncOpenAI | None = None
+    # (workspace_id, normalized question) → HyDE paragraph, least recently used first
+    _hyde_cache: "OrderedDict[tuple[str, str], str]" = OrderedDict()
+    _hyde_tasks: dict[tuple[str, str], asyncio.Task] = {}
 
     @classmethod
-    def _get_client(cls) -> OpenAI:
-        if cls._client is None:
-            cls._client = OpenAI(
+    def _get_async_client(cls) -> AsyncOpenAI:
+        if cls._async_client is None:
+            cls._async_client = AsyncOpenAI(
                 base_url=settings.llm_base_url,
                 api_key=settings.github_token,
             )
-        return cls._client
+        return cls._async_client
+
+    @staticmethod
+    def _context_label(metadata: dict) -> str:
+        """Source name, plus time range and speakers for transcript chunks."""
+        label = metadata["source_name"]
+        if metadata.get("start"):
+            label += f" @ {metadata['start']}–{metadata.get('end') or metadata['start']}"
+        if metadata.get("speakers"):
+            label += f" ({', '.join(metadata['speakers'])})"
+        return label
 
     @classmethod
     def _get_reset_at(cls, db: Session, workspace_id: str):
@@ -31,128 +58,242 @@ class ChatService:
         return ws.chat_reset_at if ws else None
 
     @classmethod
-    def get_messages(cls, db: Session, workspace_id: str) -> list[ChatMessage]:
+    def get_messages(cls, db: Session, workspace_id: str, limit: int, cursor: int | None = None) -> tuple[list[ChatMessage], int | None]:
+        """The newest `limit` messages older than `cursor`, oldest first, and the cursor for earlier ones."""
         query = db.query(ChatMessage).filter(ChatMessage.workspace_id == workspace_id)
         reset_at = cls._get_reset_at(db, workspace_id)
         if reset_at:
             query = query.filter(ChatMessage.created_at > reset_at)
-        return query.order_by(ChatMessage.created_at.asc()).all()
+        messages, next_cursor = keyset_page(query, ChatMessage, "created_at", limit, cursor)
+        messages.reverse()
+        return messages, next_cursor
+
+    @staticmethod
+    async def _db(fn, *args):
+        """Run `fn(db, *args)` with its own session on a worker thread, off the event loop."""
+        def run():
+            db = SessionLocal()
+            try:
+                return fn(db, *args)
+            finally:
+                db.close()
+        return await asyncio.to_thread(run)
+
+    @staticmethod
+    def _save_message(db: Session, workspace_id: str, role: str, content: str, sources_cited: str | None = None) -> ChatMessage:
+        msg = ChatMessage(role=role, content=content, workspace_id=workspace_id, sources_cited=sources_cited)
+        db.add(msg)
+        db.commit()
+        db.refresh(msg)
+        if role == "assistant":
+            SuggestionService.prefetch_followups(workspace_id, msg.id)
+        return msg
+
+    @classmethod
+    async def _save_answer(cls, workspace_id: str, content: str, sources_cited: str | None) -> ChatMessage:
+        msg = await cls._db(cls._save_message, workspace_id, "assistant", content, sources_cited)
+        # Turns that no longer fit the history window get summarized before the next question
+        ChatHistory.schedule_summary(cls._get_async_client(), workspace_id)
+        return msg
+
+    @staticmethod
+    def _greeting_prompt(db: Session, workspace_id: str) -> str:
+        sources = db.query(Source.name, Source.preview).filter(Source.workspace_id == workspace_id).all()
+        if sources:
+            source_samples = []
+            for name, preview in sources:
+                text = (preview or "").strip()
+                if text:
+                    source_samples.append(f"- {name}: {text[:500]}")
+            source_info = "\n".join(source_samples) or "\n".join(f"- {name}" for name, _ in sources)
+            return (
+                "You are a friendly research assistant. The user just greeted you. "
+                "Respond warmly and briefly explain that you can help them analyze their sources — "
+                "answer questions, compare across sources, summarize key points, and create artifacts.\n\n"
+                "Then, based on the source material below, suggest 3-5 specific, insightful questions "
+                "the user could ask about their sources. Make the suggestions diverse and useful.\n\n"
+                f"SOURCES:\n{source_info}"
+            )
+        return (
+            "You are a friendly research assistant. The user just greeted you. "
+            "Respond warmly, then use **bold** and bullet points to clearly list what you can help with:\n"
+            "- **Analyze sources** — answer questions grounded in uploaded documents\n"
+            "- **Compare across sources** — find similarities and differences\n"
+            "- **Summarize key points** — extract the most important insights\n"
+            "- **Create artifacts** — draft markdown documents from research\n\n"
+            "End by letting them know they should start by adding some sources "
+            "(docx files or URLs) in the **Sources pane** on the left. "
+            "Use markdown formatting in your response for readability."
+        )
+
+    @staticmethod
+    def _count_sources(db: Session, workspace_id: str) -> int:
+        return db.query(Source).filter(Source.workspace_id == workspace_id).count()
+
+    @classmethod
+    def _cached_hyde(cls, key: tuple[str, str]) -> str | None:
+        hypothetical = cls._hyde_cache.get(key)
+        if hypothetical is not None:
+            cls._hyde_cache.move_to_end(key)
+        return hypothetical
+
+    @classmethod
+    async def _hypothetical_answer(cls, key: tuple[str, str], user_content: str) -> str | None:
+        """HyDE paragraph for a question, or None if it isn't ready within `hyde_timeout_ms`.
+
+        A late paragraph still lands in the cache for the next time the question is asked.
+        """
+        task = cls._hyde_tasks.get(key)
+        if task is None:
+            task = cls._hyde_tasks[key] = asyncio.create_task(cls._generate_hyde(key, user_content))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), settings.hyde_timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            logger.info(f"HyDE missed its {settings.hyde_timeout_ms}ms budget; using raw-question retrieval")
+            return None
+
+    @classmethod
+    async def _generate_hyde(cls, key: tuple[str, str], user_content: str) -> str | None:
+        try:
+            hyde_response = await cls._get_async_client().chat.completions.create(
+                model=settings.chat_model,
+                messages=[
+                    {"role": "system", "content": "Given the question below, write a short paragraph that would answer it. Be specific and factual. Do not hedge or add disclaimers."},
+                    {"role": "user", "content": user_content},
+                ],
+                temperature=0.0,
+                max_tokens=150,
+            )
+            hypothetical = hyde_response.choices[0].message.content.strip()
+        except Exception:
+            return None  # fall back to raw query on any error
+        finally:
+            cls._hyde_tasks.pop(key, None)
+        cls._hyde_cache[key] = hypothetical
+        while len(cls._hyde_cache) > settings.hyde_cache_size:
+            cls._hyde_cache.popitem(last=False)
+        return hypothetical
+
+    @classmethod
+    async def _retrieval_prompt(cls, user_content: str, workspace_id: str, source_ids: list[int] | None) -> tuple[str, list[str]]:
+        # HyDE: a hypothetical answer is generated alongside retrieval (see below)
+        hyde_key = (workspace_id, EmbeddingCache.normalize(user_content).lower())
+        hypothetical = cls._cached_hyde(hyde_key) if settings.hyde_enabled else None
+        hyde = None
+        if settings.hyde_enabled and hypothetical is None:
+            hyde = asyncio.create_task(cls._hypothetical_answer(hyde_key, user_content))
+
+        # Determine how many chunks to retrieve based on source count
+        if source_ids is not None:
+            num_sources = len(source_ids)
+        else:
+            num_sources = await cls._db(cls._count_sources, workspace_id)
+        n_results = max(15, num_sources * 3)
+
+        # Retrieve relevant context from sources. Retrieval on the raw question starts
+        # right away and answers if HyDE fails or misses the budget; once the paragraph
+        # is known, the question and its expansion are embedded in one batch and
+        # searched together (a chunk keeps its best similarity across both).
+        query_kwargs = {"n_results": n_results, "source_ids": source_ids, "workspace_id": workspace_id}
+        raw = None
+        if hyde is not None:
+            raw = asyncio.create_task(asyncio.to_thread(EmbeddingService.query, user_content, **query_kwargs))
+            hypothetical = await hyde
+        if hypothetical:
+            if raw is not None:
+                # The speculative results go unused; still collect a failure so it isn't reported as unhandled
+                raw.add_done_callback(lambda task: task.cancelled() or task.exception())
+            contexts = await asyncio.to_thread(
+                EmbeddingService.query, [user_content, f"{user_content} {hypothetical}"], **query_kwargs
+            )
+        elif raw is not None:
+            contexts = await raw
+        else:
+            contexts = await asyncio.to_thread(EmbeddingService.query, user_content, **query_kwargs)
+
+        # Merge adjacent chunks and fit them into the prompt's token budget
+        contexts = ContextPacker.pack(contexts, settings.context_token_budget)
+
+        # Build system prompt with context
+        if contexts:
+            source_names = list(set(c["metadata"]["source_name"] for c in contexts))
+            context_text = "\n\n---\n\n".join(
+                f"[Source: {cls._context_label(c['metadata'])}]\n{c['text']}" for c in contexts
+            )
+            system_prompt = (
+                "You are a knowledgeable research assistant. Answer the user's question using the source material below.\n\n"
+                "Guidelines:\n"
+                "- Cite sources by name when you use information from them (e.g., \"According to [Source Name], ...\"); "
+                "for transcripts, include the timestamp range shown next to the source name\n"
+                "- Only cite sources that are relevant to the answer — do not mention irrelevant sources\n"
+                "- If the source material does not contain enough information to answer the question, say so honestly "
+                "and offer what you can from general knowledge\n"
+                "- Be concise and direct. Use markdown formatting for readability.\n\n"
+                f"SOURCE MATERIAL:\n{context_text}"
+            )
+            return system_prompt, source_names
+        system_prompt = (
+            "You are a helpful research assistant. No sources have been added yet. "
+            "Let the user know they should add some sources first for the best experience, "
+            "but still try to help with their question using your general knowledge."
+        )
+        return system_prompt, []
 
     @classmethod
-    def send_message(cls, db: Session, user_content: str, workspace_id: str, source_ids: list[int] | None = None) -> ChatMessage:
+    async def _prepare(cls, user_content: str, workspace_id: str, source_ids: list[int] | None) -> tuple[list[dict], list[str]]:
+        """Save the user message and build the completion messages and cited source names."""
         # Save user message
-        user_msg = ChatMessage(role="user", content=user_content, workspace_id=workspace_id)
-        db.add(user_msg)
-        db.commit()
-        db.refresh(user_msg)
+        user_msg = await cls._db(cls._save_message, workspace_id, "user", user_content)
 
         # Handle greetings with a friendly capability overview
         if _GREETING_PATTERN.match(user_content.strip()):
-            sources = db.query(Source).filter(Source.workspace_id == workspace_id).all()
-            if sources:
-                source_samples = []
-                for s in sources:
-                    text = (s.content_text or "").strip()
-                    if text:
-                        source_samples.append(f"- {s.name}: {text[:500]}")
-                source_info = "\n".join(source_samples) or "\n".join(f"- {s.name}" for s in sources)
-                system_prompt = (
-                    "You are a friendly research assistant. The user just greeted you. "
-                    "Respond warmly and briefly explain that you can help them analyze their sources — "
-                    "answer questions, compare across sources, summarize key points, and create artifacts.\n\n"
-                    "Then, based on the source material below, suggest 3-5 specific, insightful questions "
-                    "the user could ask about their sources. Make the suggestions diverse and useful.\n\n"
-                    f"SOURCES:\n{source_info}"
-                )
-            else:
-                system_prompt = (
-                    "You are a friendly research assistant. The user just greeted you. "
-                    "Respond warmly, then use **bold** and bullet points to clearly list what you can help with:\n"
-                    "- **Analyze sources** — answer questions grounded in uploaded documents\n"
-                    "- **Compare across sources** — find similarities and differences\n"
-                    "- **Summarize key points** — extract the most important insights\n"
-                    "- **Create artifacts** — draft markdown documents from research\n\n"
-                    "End by letting them know they should start by adding some sources "
-                    "(docx files or URLs) in the **Sources pane** on the left. "
-                    "Use markdown formatting in your response for readability."
-                )
-            source_names = []
-            contexts = None
+            system_prompt = await cls._db(cls._greeting_prompt, workspace_id)
+            source_names: list[str] = []
         else:
-            # Determine how many chunks to retrieve based on source count
-            if source_ids is not None:
-                num_sources = len(source_ids)
-            else:
-                num_sources = db.query(Source).filter(Source.workspace_id == workspace_id).count()
-            n_results = max(15, num_sources * 3)
-
-            # Retrieve relevant context from sources
-            # HyDE: generate a hypothetical answer to use as the retrieval query
-            retrieval_query = user_content
-            if settings.hyde_enabled:
-                try:
-                    client = cls._get_client()
-                    hyde_response = client.chat.completions.create(
-                        model=settings.chat_model,
-                        messages=[
-                            {"role": "system", "content": "Given the question below, write a short paragraph that would answer it. Be specific and factual. Do not hedge or add disclaimers."},
-                            {"role": "user", "content": user_content},
-                        ],
-                        temperature=0.0,
-                        max_tokens=150,
-                    )
-                    hypothetical = hyde_response.choices[0].message.content.strip()
-                    retrieval_query = f"{user_content} {hypothetical}"
-                except Exception:
-                    pass  # fall back to raw query on any error
-
-            contexts = EmbeddingService.query(retrieval_query, n_results=n_results, source_ids=source_ids, workspace_id=workspace_id)
-
-            # Build system prompt with context
-            if contexts:
-                source_names = list(set(c["metadata"]["source_name"] for c in contexts))
-                context_text = "\n\n---\n\n".join(
-                    f"[Source: {c['metadata']['source_name']}]\n{c['text']}" for c in contexts
-                )
-                system_prompt = (
-                    "You are a knowledgeable research assistant. Answer the user's question using the source material below.\n\n"
-                    "Guidelines:\n"
-                    "- Cite sources by name when you use information from them (e.g., \"According to [Source Name], ...\")\n"
-                    "- Only cite sources that are relevant to the answer — do not mention irrelevant sources\n"
-                    "- If the source material does not contain enough information to answer the question, say so honestly "
-                    "and offer what you can from general knowledge\n"
-                    "- Be concise and direct. Use markdown formatting for readability.\n\n"
-                    f"SOURCE MATERIAL:\n{context_text}"
-                )
-            else:
-                source_names = []
-                system_prompt = (
-                    "You are a helpful research assistant. No sources have been added yet. "
-                    "Let the user know they should add some sources first for the best experience, "
-                    "but still try to help with their question using your general knowledge."
-                )
-
-        # Build conversation history (last 20 messages to stay within token limits)
-        history_query = db.query(ChatMessage).filter(
-            ChatMessage.workspace_id == workspace_id
-        )
-        reset_at = cls._get_reset_at(db, workspace_id)
-        if reset_at:
-            history_query = history_query.filter(ChatMessage.created_at > reset_at)
-        history = history_query.order_by(ChatMessage.created_at.asc()).all()
-        # Exclude the user message we just saved (it's the last one)
-        history = history[:-1]
-        # Keep last 20 messages to avoid token overflow
-        history = history[-20:]
+            system_prompt, source_names = await cls._retrieval_prompt(user_content, workspace_id, source_ids)
 
-        # Call OpenAI
-        client = cls._get_client()
-        messages = [{"role": "system", "content": system_prompt}]
-        for msg in history:
-            messages.append({"role": msg.role, "content": msg.content})
-        messages.append({"role": "user", "content": user_content})
+        history = await cls._db(ChatHistory.window, workspace_id, user_msg.id)
+        messages = [{"role": "system", "content": system_prompt}, *history, {"role": "user", "content": user_content}]
+        return messages, source_names
+
+    @staticmethod
+    def _content_version(db: Session, workspace_id: str) -> int:
+        ws = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+        return ws.content_version if ws else 0
+
+    @classmethod
+    async def _cache_lookup(cls, user_content: str, workspace_id: str, source_ids: list[int] | None) -> tuple[ChatMessage | None, tuple | None]:
+        """Answer from the semantic answer cache if possible.
+
+        Returns the saved assistant message on a hit, otherwise the
+        (version, embedding) key to store the fresh answer under — or None if
+        the question isn't cacheable.
+        """
+        if _GREETING_PATTERN.match(user_content.strip()) or not AnswerCache.cacheable(user_content):
+            return None, None
+        version = await cls._db(cls._content_version, workspace_id)
+        # Served from the embedding cache when retrieval embeds the question again
+        embedding = await asyncio.to_thread(EmbeddingService.embed_query, user_content)
+        hit = AnswerCache.lookup(workspace_id, version, source_ids, embedding)
+        if hit is None:
+            return None, (version, embedding)
+        logger.info(f"Answer cache hit (similarity {hit['similarity']:.3f}) in workspace {workspace_id}")
+        await cls._db(cls._save_message, workspace_id, "user", user_content)
+        msg = await cls._save_answer(workspace_id, hit["content"], hit["sources_cited"])
+        return msg, None
+
+    @classmethod
+    async def send_message(cls, user_content: str, workspace_id: str, source_ids: list[int] | None = None) -> ChatMessage:
+        """Answer a chat message. All LLM calls are async and DB work runs on worker threads,
+        so one event loop can serve many chats at once."""
+        started = time.perf_counter()
+        cached, cache_key = await cls._cache_lookup(user_content, workspace_id, source_ids)
+        if cached is not None:
+            return cached
+        messages, source_names = await cls._prepare(user_content, workspace_id, source_ids)
 
-        response = client.chat.completions.create(
+        # Call OpenAI
+        response = await cls._get_async_client().chat.completions.create(
             model=settings.chat_model,
             messages=messages,
             temperature=0.3,
@@ -162,112 +303,48 @@ class ChatService:
         assistant_content = response.choices[0].message.content
 
         # Save assistant message
-        assistant_msg = ChatMessage(
-            role="assistant",
-            content=assistant_content,
-            workspace_id=workspace_id,
-            sources_cited=json.dumps(source_names) if source_names else None,
-        )
-        db.add(assistant_msg)
-        db.commit()
-        db.refresh(assistant_msg)
-
-        return assistant_msg
+        sources_cited = json.dumps(source_names) if source_names else None
+        if cache_key is not None:
+            version, embedding = cache_key
+            AnswerCache.store(workspace_id, version, source_ids, embedding, assistant_content, sources_cited, time.perf_counter() - started)
+        return await cls._save_answer(workspace_id, assistant_content, sources_cited)
 
     @classmethod
-    def generate_suggestions(cls, db: Session, workspace_id: str) -> list[str]:
-        sources = db.query(Source).filter(Source.workspace_id == workspace_id).all()
-        if not sources:
-            return []
-
-        # Sample content from each source (cap at ~2000 chars each)
-        content_samples = []
-        for s in sources:
-            text = (s.content_text or "").strip()
-            if text:
-                content_samples.append(f"[{s.name}]: {text[:2000]}")
-        if not content_samples:
-            return []
-
-        combined = "\n\n---\n\n".join(content_samples)
-        # Cap total context to avoid token limits
-        combined = combined[:8000]
-
-        client = cls._get_client()
-        response = client.chat.completions.create(
-            model=settings.chat_model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "Based on the following source material, suggest exactly 3 specific, useful questions "
-                        "a user could ask about this content. The questions should be diverse and help the user "
-                        "extract key insights. Return ONLY a JSON array of 3 strings, no other text."
-                    ),
-                },
-                {"role": "user", "content": combined},
-            ],
-            temperature=0.7,
-            max_tokens=300,
-        )
-
-        raw = response.choices[0].message.content.strip()
-        # Strip markdown code fences if present
-        if raw.startswith("```"):
-            raw = raw.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
-        try:
-            suggestions = json.loads(raw)
-            if isinstance(suggestions, list):
-                return [str(s) for s in suggestions[:3]]
-        except json.JSONDecodeError:
-            pass
-        return []
-
-    @classmethod
-    def generate_followups(cls, db: Session, workspace_id: str) -> list[str]:
-        """Generate follow-up questions based on the current conversation."""
-        history_query = db.query(ChatMessage).filter(
-            ChatMessage.workspace_id == workspace_id
-        )
-        reset_at = cls._get_reset_at(db, workspace_id)
-        if reset_at:
-            history_query = history_query.filter(ChatMessage.created_at > reset_at)
-        history = history_query.order_by(ChatMessage.created_at.desc()).limit(10).all()
-        history.reverse()
-
-        if not history:
-            return []
-
-        conversation = "\n".join(
-            f"{'User' if m.role == 'user' else 'Assistant'}: {m.content[:1000]}" for m in history
-        )
+    async def stream_message(cls, user_content: str, workspace_id: str, source_ids: list[int] | None = None) -> AsyncIterator[dict]:
+        """Like `send_message`, but yields `{"type": "token", "content"}` events as the
+        answer is generated, then `{"type": "done", "message"}` once it is saved."""
+        started = time.perf_counter()
+        cached, cache_key = await cls._cache_lookup(user_content, workspace_id, source_ids)
+        if cached is not None:
+            yield {"type": "token", "content": cached.content}
+            yield {"type": "done", "message": cached}
+            return
+        messages, source_names = await cls._prepare(user_content, workspace_id, source_ids)
 
-        client = cls._get_client()
-        response = client.chat.completions.create(
+        stream = await cls._get_async_client().chat.completions.create(
             model=settings.chat_model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "Based on the conversation below, suggest exactly 3 follow-up questions the user could ask. "
-                        "Focus on deeper analysis of the sources, identifying key insights, comparisons across sources, "
-                        "or actionable takeaways. The questions should be specific, diverse, and build on what was already discussed. "
-                        "Return ONLY a JSON array of 3 strings, no other text."
-                    ),
-                },
-                {"role": "user", "content": conversation},
-            ],
-            temperature=0.7,
-            max_tokens=300,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=16000,
+            stream=True,
         )
+        parts: list[str] = []
+        first_token_at = None
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                logger.info(f"Chat time to first token: {(first_token_at - started) * 1000:.0f}ms (workspace {workspace_id})")
+            parts.append(delta)
+            yield {"type": "token", "content": delta}
 
-        raw = response.choices[0].message.content.strip()
-        if raw.startswith("```"):
-            raw = raw.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
-        try:
-            followups = json.loads(raw)
-            if isinstance(followups, list):
-                return [str(s) for s in followups[:3]]
-        except json.JSONDecodeError:
-            pass
-        return []
+        assistant_content = "".join(parts)
+        sources_cited = json.dumps(source_names) if source_names else None
+        if cache_key is not None:
+            version, embedding = cache_key
+            AnswerCache.store(workspace_id, version, source_ids, embedding, assistant_content, sources_cited, time.perf_counter() - started)
+        assistant_msg = await cls._save_answer(workspace_id, assistant_content, sources_cited)
+        logger.info(f"Chat answer streamed in {time.perf_counter() - started:.2f}s ({len(parts)} deltas)")
+        yield {"type": "done", "message": assistant_msg}
@@ -0,0 +1,139 @@
+import logging
+import re
+from app.services.embedding_service import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Longest overlap looked for between consecutive chunks (chunk_text overlaps by up to 200 chars)
+_MAX_OVERLAP_CHARS = 1000
+
+# Sentence boundaries, as the chunker splits them
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n{2,}')
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b`."""
+    if not a or not b:
+        return 0
+    probe = b[:20]
+    start = max(0, len(a) - min(_MAX_OVERLAP_CHARS, len(b)))
+    pos = a.find(probe, start)
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(probe, pos + 1)
+    return 0
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """The leading sentences of `text` that fit in `max_tokens` estimated tokens.
+
+    Falls back to a word boundary when even the first sentence is too long.
+    """
+    max_chars = (max_tokens - 1) * 4
+    if max_chars <= 0:
+        return ""
+    cut = 0
+    for m in _SENTENCE_BREAK.finditer(text, 0, max_chars + 1):
+        cut = m.start()
+    if cut == 0:
+        cut = max(0, text.rfind(" ", 0, max_chars + 1))
+    return text[:cut].rstrip()
+
+
+class ContextPacker:
+    """Packs retrieved chunks into the chat prompt under a token budget.
+
+    Chunks from the same source with consecutive `chunk_index` are merged into
+    one passage with the repeated overlap removed. Passages are then taken
+    within `budget` estimated tokens: first the best passage of every source
+    (in the order the sources were retrieved), then the rest by relevance.
+    A source's best passage that doesn't fit is cut to its leading sentences
+    rather than dropped, leaving room for the sources after it.
+    """
+
+    @staticmethod
+    def _merge(contexts: list[dict]) -> list[dict]:
+        by_source: dict[int, list[tuple[int, dict]]] = {}
+        for rank, c in enumerate(contexts):
+            by_source.setdefault(c["metadata"]["source_id"], []).append((rank, c))
+
+        passages: list[dict] = []
+        for chunks in by_source.values():
+            chunks.sort(key=lambda rc: rc[1]["metadata"].get("chunk_index", 0))
+            current = None
+            for rank, c in chunks:
+                index = c["metadata"].get("chunk_index")
+                if current is not None and index is not None and index == current["last_index"] + 1:
+                    # Drop the overlap the chunker repeated at the start of this chunk
+                    overlap = _overlap(current["text"], c["text"])
+                    current["text"] += c["text"][overlap:] if overlap else " " + c["text"]
+                    current["last_index"] = index
+                    current["rank"] = min(current["rank"], rank)
+                    current["similarity"] = max(current["similarity"], c.get("similarity", 0.0))
+                    current["chunks"] += 1
+                    if c["metadata"].get("end"):
+                        current["metadata"]["end"] = c["metadata"]["end"]
+                    if c["metadata"].get("speakers"):
+                        current["metadata"]["speakers"] = list(dict.fromkeys(current["metadata"].get("speakers", []) + c["metadata"]["speakers"]))
+                    continue
+                current = {
+                    "id": c["id"],
+                    "text": c["text"],
+                    "metadata": dict(c["metadata"]),
+                    "similarity": c.get("similarity", 0.0),
+                    "rank": rank,
+                    "last_index": index if index is not None else -2,
+                    "chunks": 1,
+                }
+                passages.append(current)
+        passages.sort(key=lambda p: p["rank"])
+        return passages
+
+    @classmethod
+    def pack(cls, contexts: list[dict], budget: int) -> list[dict]:
+        """Merge and select retrieved chunks; returns passages shaped like the input chunks."""
+        if not contexts:
+            return []
+        passages = cls._merge(contexts)
+
+        # Per-source coverage first, then the remaining passages by relevance
+        seen: set[int] = set()
+        coverage, rest = [], []
+        for p in passages:
+            source_id = p["metadata"]["source_id"]
+            (rest if source_id in seen else coverage).append(p)
+            seen.add(source_id)
+
+        # Budget held back for the best passages of later sources, up to an even share each
+        share = budget // len(coverage)
+        reserve = [0] * len(coverage)
+        for i in range(len(coverage) - 2, -1, -1):
+            reserve[i] = reserve[i + 1] + min(estimate_tokens(coverage[i + 1]["text"]), share)
+
+        tokens_merged = sum(estimate_tokens(p["text"]) for p in passages)
+        selected, used = [], 0
+        for i, p in enumerate(coverage + rest):
+            tokens = estimate_tokens(p["text"])
+            if i < len(coverage):
+                allowance = budget - used - reserve[i]
+                if tokens > allowance:
+                    p = dict(p, text=_truncate(p["text"], allowance))
+                    if not p["text"]:
+                        continue
+                    tokens = estimate_tokens(p["text"])
+            elif used + tokens > budget:
+                continue
+            selected.append(p)
+            used += tokens
+        selected.sort(key=lambda p: p["rank"])
+
+        tokens_in = sum(estimate_tokens(c["text"]) for c in contexts)
+        logger.info(
+            f"Packed {len(contexts)} chunks into {len(selected)} passages: {tokens_in} → {used} tokens "
+            f"(saved {tokens_in - used}: {tokens_in - tokens_merged} overlap, {tokens_merged - used} over budget {budget})"
+        )
+        return [
+            {"id": p["id"], "text": p["text"], "metadata": p["metadata"], "similarity": p["similarity"], "distance": 1.0 - p["similarity"]}
+            for p in selected
+        ]
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from app.models.team import Team
 from app.models.workspace import Workspace
 from app.models.artifact import Artifact
-from app.services.source_service import SourceService
+from app.services.source_service import SourceService, piece_text
 from app.services.embedding_service import EmbeddingService
 from app.config import settings
 
@@ -155,9 +155,12 @@ def seed_demo_workspace(db: Session) -> None:
             dest_path = os.path.join(settings.upload_dir, f"{file_id}_{filename}")
             shutil.copy2(src_path, dest_path)
 
-            source = SourceService.create_from_file(db, dest_path, filename, notebook.id)
+            # Keep the parsed pieces so transcript chunks get their turn timestamps
+            source, pieces = SourceService.create_streaming(db, dest_path, filename, notebook.id)
+            pieces = list(pieces)
+            SourceService.set_content(db, source, "\n\n".join(piece_text(p) for p in pieces))
             try:
-                EmbeddingService.add_source(source.id, source.name, source.content_text or "", notebook.id)
+                EmbeddingService.add_source_stream(source.id, source.name, pieces, notebook.id)
             except Exception as e:
                 logger.warning(f"Seed: embedding failed for {filename}: {e}")
 
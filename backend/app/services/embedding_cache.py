@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from app.config import settings
+from app.database import SessionLocal, dialect_insert
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Cache hits only mark their keys as used; `last_used_at` is written for all of them at most this often
+_TOUCH_INTERVAL_SECONDS = 30.0
+
+# Keys per IN (...) clause
+_KEY_BATCH = 500
+
+
+class EmbeddingCache:
+    """Persistent content-addressed cache of chunk embeddings.
+
+    Entries are keyed by (embedding model and `embedding_dimensions`, sha256
+    of the normalized text), so
+    the same chunk is embedded once no matter how many sources or workspaces
+    it appears in. The table is bounded to `embedding_cache_max_entries`,
+    evicting least-recently-used entries first. Lookups never write: hits
+    are recorded in memory and their `last_used_at` is updated in batches.
+    A failed cache write is logged and skipped, never raised to the caller.
+    """
+
+    _lock = threading.Lock()
+    _touched: set[str] = set()
+    _touch_flushed_at = 0.0
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @staticmethod
+    def model_tag() -> str:
+        """The embedding model, plus the requested size when it isn't the model's default."""
+        if settings.embedding_dimensions > 0:
+            return f"{settings.embedding_model}@{settings.embedding_dimensions}"
+        return settings.embedding_model
+
+    @classmethod
+    def key(cls, text: str, model: str | None = None) -> str:
+        model = model or cls.model_tag()
+        return hashlib.sha256(f"{model}\0{cls.normalize(text)}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def get_many(cls, keys: list[str]) -> dict[str, list[float]]:
+        """Look up cached embeddings; returns only the keys that were found."""
+        unique = list(dict.fromkeys(keys))
+        found: dict[str, list[float]] = {}
+        db = SessionLocal()
+        try:
+            for i in range(0, len(unique), _KEY_BATCH):
+                batch = unique[i : i + _KEY_BATCH]
+                for key, blob in db.query(EmbeddingCacheEntry.key, EmbeddingCacheEntry.embedding).filter(EmbeddingCacheEntry.key.in_(batch)):
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        finally:
+            db.close()
+        hits = sum(1 for k in keys if k in found)
+        with cls._lock:
+            cls._hits += hits
+            cls._misses += len(keys) - hits
+            cls._touched.update(found)
+            flush = time.monotonic() - cls._touch_flushed_at >= _TOUCH_INTERVAL_SECONDS
+        if flush:
+            cls._flush_touches()
+        return found
+
+    @classmethod
+    def _flush_touches(cls, db=None):
+        """Write `last_used_at` for every key hit since the last flush."""
+        with cls._lock:
+            touched, cls._touched = cls._touched, set()
+            cls._touch_flushed_at = time.monotonic()
+        if not touched:
+            return
+        own = db is None
+        db = db or SessionLocal()
+        try:
+            now = datetime.now(timezone.utc)
+            touched = list(touched)
+            for i in range(0, len(touched), _KEY_BATCH):
+                db.query(EmbeddingCacheEntry).filter(EmbeddingCacheEntry.key.in_(touched[i : i + _KEY_BATCH])).update(
+                    {EmbeddingCacheEntry.last_used_at: now}, synchronize_session=False
+                )
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"Embedding cache: recording {len(touched)} hits failed: {e}")
+        finally:
+            if own:
+                db.close()
+
+    @classmethod
+    def put_many(cls, items: dict[str, list[float]], model: str | None = None):
+        if not items:
+            return
+        model = model or cls.model_tag()
+        values = []
+        for key, embedding in items.items():
+            vec = np.asarray(embedding, dtype=np.float32)
+            values.append({"key": key, "model": model, "dim": len(vec), "embedding": vec.tobytes()})
+        db = SessionLocal()
+        try:
+            # Another ingest or chat may be caching the same text right now; its row wins
+            db.execute(dialect_insert(EmbeddingCacheEntry).on_conflict_do_nothing(), values)
+            db.commit()
+            # Evict by up-to-date recency
+            cls._flush_touches(db)
+            cls._evict(db)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"Embedding cache: storing {len(values)} embeddings failed: {e}")
+        finally:
+            db.close()
+
+    @classmethod
+    def _evict(cls, db):
+        overflow = db.query(func.count(EmbeddingCacheEntry.key)).scalar() - settings.embedding_cache_max_entries
+        if overflow <= 0:
+            return
+        stale = (
+            db.query(EmbeddingCacheEntry.key)
+            .order_by(EmbeddingCacheEntry.last_used_at.asc())
+            .limit(overflow)
+            .subquery()
+        )
+        deleted = db.query(EmbeddingCacheEntry).filter(EmbeddingCacheEntry.key.in_(stale.select())).delete(synchronize_session=False)
+        db.commit()
+        with cls._lock:
+            cls._evictions += deleted
+
+    @classmethod
+    def stats(cls) -> dict:
+        db = SessionLocal()
+        try:
+            entries = db.query(func.count(EmbeddingCacheEntry.key)).scalar()
+        finally:
+            db.close()
+        with cls._lock:
+            lookups = cls._hits + cls._misses
+            return {
+                "hits": cls._hits,
+                "misses": cls._misses,
+                "hit_rate": cls._hits / lookups if lookups else 0.0,
+                "evictions": cls._evictions,
+                "entries": entries,
+                "max_entries": settings.embedding_cache_max_entries,
+            }
@@ -1,16 +1,108 @@
-import json
+import logging
 import os
+import random
 import re
-import numpy as np
-from openai import OpenAI
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from openai import OpenAI, APIConnectionError, APIStatusError, APITimeoutError
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
+from app.services.quantization import MODES as QUANTIZATION_MODES
+from app.services.sql_vector_store import SqlVectorStore
+from app.services.vector_store import FileVectorStore, VectorStore
 
+logger = logging.getLogger(__name__)
+
+# Legacy flat-JSON store, migrated into workspace partitions on first load
 STORE_PATH = os.path.join(settings.chroma_persist_dir, "vectors.json")
 
+# Chunks embedded (and committed) per window during add_source_stream
+_PROGRESS_WINDOW = 256
+
+# Sentence boundaries: whitespace after .!? or a paragraph break
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n{2,}')
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text with cl100k-style tokenizers
+    return len(text) // 4 + 1
+
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    start = 0
+    for m in _SENTENCE_BREAK.finditer(text):
+        sentence = text[start:m.start()].strip()
+        if sentence:
+            yield sentence
+        start = m.end()
+    sentence = text[start:].strip()
+    if sentence:
+        yield sentence
+
+
+def _turn_metadata(turns: list[dict]) -> dict:
+    """Time range and speakers of the transcript turns behind a chunk."""
+    if not turns:
+        return {}
+    speakers = list(dict.fromkeys(t["speaker"] for t in turns if t.get("speaker")))
+    return {"start": turns[0].get("start"), "end": turns[-1].get("end"), "speakers": speakers}
+
+
+def _token_batches(texts: list[str], max_tokens: int, max_items: int) -> list[tuple[int, int]]:
+    """Split texts into contiguous [start, stop) batches under a token budget."""
+    batches: list[tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, text in enumerate(texts):
+        t = estimate_tokens(text)
+        if i > start and (tokens + t > max_tokens or i - start >= max_items):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += t
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def _retry_after_seconds(exc: Exception) -> float | None:
+    """Server-requested delay from Retry-After / retry-after-ms headers, if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(exc, APIStatusError) and (exc.status_code == 429 or exc.status_code >= 500)
+
 
 class EmbeddingService:
     _client: OpenAI | None = None
-    _store: list[dict] | None = None
+    _store: VectorStore | None = None
+    _pool: ThreadPoolExecutor | None = None
+    _pool_lock = threading.Lock()
+    _store_lock = threading.Lock()
 
     @classmethod
     def _get_client(cls) -> OpenAI:
@@ -18,145 +110,293 @@ class EmbeddingService:
             cls._client = OpenAI(
                 base_url=settings.llm_base_url,
                 api_key=settings.github_token,
+                max_retries=0,  # retries are handled by _embed_batch so Retry-After is honoured
             )
         return cls._client
 
     @classmethod
-    def _load_store(cls) -> list[dict]:
+    def _get_pool(cls) -> ThreadPoolExecutor:
+        if cls._pool is None:
+            with cls._pool_lock:
+                if cls._pool is None:
+                    cls._pool = ThreadPoolExecutor(
+                        max_workers=max(1, settings.embedding_concurrency),
+                        thread_name_prefix="embed",
+                    )
+        return cls._pool
+
+    @classmethod
+    def _load_store(cls) -> VectorStore:
         if cls._store is None:
-            if os.path.exists(STORE_PATH):
-                with open(STORE_PATH, "r") as f:
-                    cls._store = json.load(f)
-            else:
-                cls._store = []
+            # Two threads opening the store at once would each get an instance and one's writes would be lost
+            with cls._store_lock:
+                if cls._store is None:
+                    if settings.vector_quantization not in ("none", *QUANTIZATION_MODES):
+                        raise ValueError(f"Unknown vector_quantization {settings.vector_quantization!r}")
+                    if settings.vector_store_backend == "sql":
+                        store = SqlVectorStore()
+                    elif settings.vector_store_backend == "file":
+                        store = FileVectorStore(settings.chroma_persist_dir)
+                        store.migrate_legacy(STORE_PATH)
+                    else:
+                        raise ValueError(f"Unknown vector_store_backend {settings.vector_store_backend!r}")
+                    cls._store = store
         return cls._store
 
     @classmethod
-    def _save_store(cls):
-        os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
-        with open(STORE_PATH, "w") as f:
-            json.dump(cls._store or [], f)
+    def _embed_batch(cls, batch: list[str]) -> list[list[float]]:
+        """One embeddings call, retried with backoff on 429/5xx/connection errors."""
+        client = cls._get_client()
+        attempt = 0
+        while True:
+            try:
+                extra = {"dimensions": settings.embedding_dimensions} if settings.embedding_dimensions > 0 else {}
+                response = client.embeddings.create(model=settings.embedding_model, input=batch, **extra)
+                # The API may return items out of order; `index` is authoritative
+                return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+            except Exception as e:
+                attempt += 1
+                if not _is_retryable(e) or attempt > settings.embedding_max_retries:
+                    raise
+                delay = _retry_after_seconds(e)
+                if delay is None:
+                    delay = min(30.0, 2 ** (attempt - 1)) * (0.5 + random.random())
+                logger.warning(f"Embedding batch of {len(batch)} failed ({e.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+                time.sleep(delay)
 
     @classmethod
     def _embed(cls, texts: list[str], batch_size: int = 100) -> list[list[float]]:
-        client = cls._get_client()
-        all_embeddings: list[list[float]] = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            response = client.embeddings.create(model=settings.embedding_model, input=batch)
-            all_embeddings.extend(item.embedding for item in response.data)
-        return all_embeddings
+        """Embed texts in their original order.
+
+        Cache misses are split into batches of at most `batch_size` texts and
+        `embedding_batch_tokens` estimated tokens, and up to
+        `embedding_concurrency` batches are in flight at once.
+        """
+        # Only texts missing from the content-addressed cache go to the API
+        keys = [EmbeddingCache.key(t) for t in texts]
+        found = EmbeddingCache.get_many(keys)
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            miss_keys = list(missing)
+            miss_texts = [missing[k] for k in miss_keys]
+            batches = _token_batches(miss_texts, settings.embedding_batch_tokens, batch_size)
+            if len(batches) == 1:
+                vectors = cls._embed_batch(miss_texts)
+            else:
+                futures = [cls._get_pool().submit(cls._embed_batch, miss_texts[a:b]) for a, b in batches]
+                vectors = [v for f in futures for v in f.result()]
+            fresh = dict(zip(miss_keys, vectors))
+            EmbeddingCache.put_many(fresh)
+            found.update(fresh)
+        return [found[k] for k in keys]
 
     @staticmethod
-    def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
-        if not text:
-            return []
+    def iter_chunk_spans(pieces: Iterable[str | dict], chunk_size: int = 1000, overlap: int = 200) -> Iterator[tuple[str, list[dict]]]:
+        """Lazily chunk a stream of text pieces (pages, paragraphs, transcript turns).
 
-        # Split into sentences (preserve the delimiter at the end of each sentence)
-        sentence_pattern = re.compile(r'(?<=[.!?])\s+|\n{2,}')
-        sentences = sentence_pattern.split(text.strip())
-        sentences = [s.strip() for s in sentences if s.strip()]
+        Pieces are treated as separated by paragraph breaks. Chunks are built
+        from whole sentences up to `chunk_size` characters, each starting with
+        the trailing sentences of the previous chunk that fit in `overlap`.
+        Yields `(chunk, turns)`, where turns are the transcript turn dicts
+        (see `SourceService.iter_vtt`) the chunk's sentences came from.
+        """
+        # (sentence, turn dict or None) pairs of the chunk being built
+        current: deque[tuple[str, dict | None]] = deque()
+        current_len = 0
 
-        if not sentences:
-            return []
+        def span() -> tuple[str, list[dict]]:
+            turns: list[dict] = []
+            for _, turn in current:
+                if turn is not None and (not turns or turns[-1] is not turn):
+                    turns.append(turn)
+            return " ".join(sentence for sentence, _ in current), turns
 
-        chunks: list[str] = []
-        current_sentences: list[str] = []
-        current_len = 0
+        for piece in pieces:
+            turn = piece if isinstance(piece, dict) else None
+            for sentence in _iter_sentences(turn["text"] if turn else piece):
+                sent_len = len(sentence)
 
-        for sentence in sentences:
-            sent_len = len(sentence)
-
-            # If a single sentence exceeds chunk_size, split it by characters
-            if sent_len > chunk_size:
-                # Flush current buffer first
-                if current_sentences:
-                    chunks.append(" ".join(current_sentences))
-                    current_sentences = []
-                    current_len = 0
-                # Character-level fallback for oversized sentences
-                start = 0
-                while start < sent_len:
-                    end = start + chunk_size
-                    piece = sentence[start:end].strip()
-                    if piece:
-                        chunks.append(piece)
-                    start += chunk_size - overlap
-                continue
-
-            # Would adding this sentence exceed the chunk size?
-            new_len = current_len + (1 if current_sentences else 0) + sent_len
-            if new_len > chunk_size and current_sentences:
-                chunks.append(" ".join(current_sentences))
-                # Overlap: carry trailing sentences whose total length <= overlap
-                overlap_sentences: list[str] = []
-                overlap_len = 0
-                for s in reversed(current_sentences):
-                    if overlap_len + len(s) + (1 if overlap_sentences else 0) > overlap:
-                        break
-                    overlap_sentences.insert(0, s)
-                    overlap_len += len(s) + (1 if len(overlap_sentences) > 1 else 0)
-                current_sentences = overlap_sentences
-                current_len = sum(len(s) for s in current_sentences) + max(0, len(current_sentences) - 1)
-
-            current_sentences.append(sentence)
-            current_len += (1 if len(current_sentences) > 1 else 0) + sent_len
+                # If a single sentence exceeds chunk_size, split it by characters
+                if sent_len > chunk_size:
+                    # Flush current buffer first
+                    if current:
+                        yield span()
+                        current.clear()
+                        current_len = 0
+                    # Character-level fallback for oversized sentences
+                    start = 0
+                    while start < sent_len:
+                        chunk = sentence[start:start + chunk_size].strip()
+                        if chunk:
+                            yield chunk, [turn] if turn else []
+                        start += chunk_size - overlap
+                    continue
+
+                # Would adding this sentence exceed the chunk size?
+                if current and current_len + 1 + sent_len > chunk_size:
+                    yield span()
+                    # Overlap: keep the longest run of trailing sentences that fits
+                    while current and current_len > overlap:
+                        current_len -= len(current.popleft()[0]) + (1 if current else 0)
+
+                current.append((sentence, turn))
+                current_len += (1 if len(current) > 1 else 0) + sent_len
 
         # Flush remaining
-        if current_sentences:
-            chunks.append(" ".join(current_sentences))
+        if current:
+            yield span()
+
+    @classmethod
+    def iter_chunks(cls, pieces: Iterable[str | dict], chunk_size: int = 1000, overlap: int = 200) -> Iterator[str]:
+        for chunk, _ in cls.iter_chunk_spans(pieces, chunk_size, overlap):
+            yield chunk
+
+    @classmethod
+    def chunk_text(cls, text: str, chunk_size: int = 1000, overlap: int = 200) -> list[str]:
+        if not text:
+            return []
+        return list(cls.iter_chunks([text], chunk_size, overlap))
 
-        return chunks
+    @classmethod
+    def add_source(cls, source_id: int, source_name: str, text: str, workspace_id: str = "", on_progress: Callable[[int, int], None] | None = None,
+                   before_write: Callable[[], None] | None = None) -> int:
+        """Chunk, embed and store a source. See `add_source_stream`."""
+        return cls.add_source_stream(source_id, source_name, [text] if text else [], workspace_id, on_progress, before_write)
 
     @classmethod
-    def add_source(cls, source_id: int, source_name: str, text: str, workspace_id: str = ""):
+    def add_source_stream(cls, source_id: int, source_name: str, pieces: Iterable[str | dict], workspace_id: str = "", on_progress: Callable[[int, int], None] | None = None,
+                          before_write: Callable[[], None] | None = None) -> int:
+        """Chunk, embed and store a source while its text is still being parsed.
+
+        Chunks are gathered `_PROGRESS_WINDOW` at a time; each window is embedded
+        on a writer thread while the next one is parsed and is committed to the
+        store as soon as it is embedded, so early chunks are searchable before
+        the last page is read and memory stays bounded by two windows.
+        Chunks of transcripts carry the `start`/`end` timestamps and
+        `speakers` of the turns they cover in their metadata.
+        `on_progress(done, total)` is called after each window; `total` is 0
+        until parsing has finished. `before_write()` runs before each window is
+        stored and can raise to abort the ingest. Returns the number of chunks stored.
+        """
         store = cls._load_store()
-        chunks = cls.chunk_text(text)
-        if not chunks:
-            return
-        embeddings = cls._embed(chunks)
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-            store.append({
-                "id": f"ws-{workspace_id}-source-{source_id}-chunk-{i}",
-                "text": chunk,
-                "embedding": emb,
-                "metadata": {"source_id": source_id, "source_name": source_name, "chunk_index": i, "workspace_id": workspace_id},
-            })
-        cls._save_store()
+
+        def write(window: list[tuple[str, list[dict]]], offset: int) -> int:
+            embeddings = cls._embed([chunk for chunk, _ in window])
+            rows = [
+                {
+                    "id": f"ws-{workspace_id}-source-{source_id}-chunk-{offset + i}",
+                    "text": chunk,
+                    "metadata": {
+                        "source_id": source_id, "source_name": source_name, "chunk_index": offset + i, "workspace_id": workspace_id,
+                        **_turn_metadata(turns),
+                    },
+                }
+                for i, (chunk, turns) in enumerate(window)
+            ]
+            if before_write is not None:
+                before_write()
+            store.add(rows, embeddings)
+            return len(window)
+
+        started = time.perf_counter()
+        chunks = cls.iter_chunk_spans(pieces)
+        parsed, done = 0, 0
+        pending = None
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-writer") as writer:
+            while window := list(islice(chunks, _PROGRESS_WINDOW)):
+                if pending is not None:
+                    done += pending.result()
+                    if on_progress:
+                        on_progress(done, 0)
+                pending = writer.submit(write, window, parsed)
+                parsed += len(window)
+            if pending is not None:
+                done += pending.result()
+                if on_progress:
+                    on_progress(done, parsed)
+        if done:
+            elapsed = time.perf_counter() - started
+            logger.info(f"Embedded {done} chunks for source {source_id} in {elapsed:.2f}s ({done / max(elapsed, 1e-6):.1f} chunks/s)")
+        return done
+
+    @classmethod
+    def remove_source(cls, source_id: int, workspace_id: str | None = None):
+        cls._load_store().remove_source(source_id, workspace_id)
+
+    @classmethod
+    def remove_workspace(cls, workspace_id: str):
+        cls._load_store().remove_workspace(workspace_id)
 
     @classmethod
-    def remove_source(cls, source_id: int):
+    def reindex_workspace(cls, workspace_id: str) -> int:
+        """Re-embed a workspace's stored chunks with the current embedding settings.
+
+        Chunk ids, texts and metadata are kept, so sources don't need to be
+        re-uploaded; the new vectors replace the old ones in one swap, which
+        is how a change of `embedding_model` or `embedding_dimensions` is
+        applied to existing data. Returns the number of chunks re-embedded.
+        """
         store = cls._load_store()
-        cls._store = [e for e in store if e["metadata"]["source_id"] != source_id]
-        cls._save_store()
+        rows = store.rows(workspace_id)
+        embeddings = []
+        for start in range(0, len(rows), _PROGRESS_WINDOW):
+            embeddings.extend(cls._embed([r["text"] for r in rows[start:start + _PROGRESS_WINDOW]]))
+        store.replace_workspace(workspace_id, rows, embeddings)
+        return len(rows)
+
+    @classmethod
+    def store_stats(cls) -> dict:
+        return cls._load_store().stats()
+
+    @classmethod
+    def embed_query(cls, text: str) -> list[float]:
+        return cls._embed([text])[0]
 
     @classmethod
-    def query(cls, query_text: str, n_results: int = 15, source_ids: list[int] | None = None, workspace_id: str | None = None, min_similarity: float = 0.3) -> list[dict]:
+    def query(cls, query_text: str | list[str], n_results: int = 15, source_ids: list[int] | None = None, workspace_id: str | None = None, min_similarity: float = 0.3) -> list[dict]:
+        """Top chunks for a query, with at least one chunk per matching source where possible.
+
+        Several query texts (e.g. the question and its HyDE expansion) are
+        embedded in one batch, and a chunk's similarity is its best match
+        across them.
+        """
         store = cls._load_store()
-        if not store:
-            return []
-        candidates = store
-        # Filter by workspace_id to prevent cross-notebook leakage
-        if workspace_id is not None:
-            candidates = [e for e in candidates if e["metadata"].get("workspace_id") == workspace_id]
-        # Filter by source_ids if provided
-        if source_ids is not None:
-            candidates = [e for e in candidates if e["metadata"]["source_id"] in source_ids]
-        if not candidates:
+        # Filter by workspace_id to prevent cross-notebook leakage, then by source_ids
+        if not store.has_candidates(workspace_id, source_ids):
             return []
-        query_emb = cls._embed([query_text])[0]
-        query_vec = np.array(query_emb)
-        # Cosine similarity
+        query_texts = [query_text] if isinstance(query_text, str) else query_text
         scored = []
-        for entry in candidates:
-            entry_vec = np.array(entry["embedding"])
-            sim = float(np.dot(query_vec, entry_vec) / (np.linalg.norm(query_vec) * np.linalg.norm(entry_vec) + 1e-10))
-            if sim >= min_similarity:
-                scored.append((sim, entry))
+        for query_emb in cls._embed(query_texts):
+            scored.extend(store.search(query_emb, workspace_id, source_ids, min_similarity))
+        if len(query_texts) > 1:
+            best: dict[str, tuple[float, dict]] = {}
+            for sim, entry in scored:
+                if entry["id"] not in best or sim > best[entry["id"]][0]:
+                    best[entry["id"]] = (sim, entry)
+            scored = sorted(best.values(), key=lambda x: x[0], reverse=True)
         if not scored:
             return []
-        scored.sort(key=lambda x: x[0], reverse=True)
 
+        results = []
+        for sim, entry in cls._select(scored, n_results):
+            text = entry["text"]
+            if not text:
+                continue  # the source was removed after the search (texts can be read lazily)
+            results.append({
+                "id": entry["id"],
+                "text": text,
+                "metadata": entry["metadata"],
+                "similarity": sim,
+                "distance": 1.0 - sim,
+            })
+        return results
+
+    @staticmethod
+    def _select(scored: list[tuple[float, dict]], n_results: int) -> list[tuple[float, dict]]:
+        """Up to n_results of the (similarity, chunk) pairs, best first, with the top chunk of every source guaranteed a place."""
         # Ensure per-source coverage: pick top chunk from each source first
         seen_sources: set[int] = set()
         guaranteed: list[tuple[float, dict]] = []
@@ -175,14 +415,4 @@ class EmbeddingService:
             if len(selected) >= n_results:
                 break
             selected.append(item)
-
-        results = []
-        for sim, entry in selected:
-            results.append({
-                "id": entry["id"],
-                "text": entry["text"],
-                "metadata": entry["metadata"],
-                "similarity": sim,
-                "distance": 1.0 - sim,
-            })
-        return results
+        return selected
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from app.config import settings
+from app.database import SessionLocal
+from app.models.workspace import Workspace
+from app.services.embedding_service import EmbeddingService
+from app.services.source_service import SourceService, StreamedContent
+from app.services.suggestion_service import SuggestionService
+from app.services.ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept around for status polling
+_MAX_FINISHED_JOBS = 500
+
+
+class WorkspaceDeleted(Exception):
+    """The job's workspace was deleted while the job was running."""
+
+
+class IngestQueue:
+    """Background parse → chunk → embed pipeline for new sources.
+
+    Endpoints enqueue a job and return its id immediately; a worker pool of
+    `ingest_workers` threads does the slow work. Every state change is sent
+    to the workspace as an `ingest_progress` websocket event, and
+    `sources_changed` is broadcast once the source's embeddings are committed
+    and it can be queried.
+    """
+
+    _pool: ThreadPoolExecutor | None = None
+    _jobs: "OrderedDict[str, dict]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_pool(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(max_workers=max(1, settings.ingest_workers), thread_name_prefix="ingest")
+            return cls._pool
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            pool, cls._pool = cls._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def submit(cls, workspace_id: str, kind: str, name: str, **params) -> dict:
+        """Queue a source for ingestion. `kind` is "file", "url" or "paste"."""
+        job = {
+            "id": uuid.uuid4().hex,
+            "workspace_id": workspace_id,
+            "kind": kind,
+            "name": name,
+            "status": "queued",
+            "chunks_done": 0,
+            "chunks_total": 0,
+            "source_id": None,
+            "error": None,
+            "created_at": datetime.now(timezone.utc),
+        }
+        with cls._lock:
+            cls._jobs[job["id"]] = job
+            finished = [jid for jid, j in cls._jobs.items() if j["status"] in ("done", "failed")]
+            for jid in finished[: max(0, len(finished) - _MAX_FINISHED_JOBS)]:
+                del cls._jobs[jid]
+        cls._get_pool().submit(cls._run, job, params)
+        cls._publish(job)
+        return dict(job)
+
+    @classmethod
+    def get(cls, job_id: str) -> dict | None:
+        with cls._lock:
+            job = cls._jobs.get(job_id)
+            return dict(job) if job else None
+
+    @classmethod
+    def list_active(cls, workspace_id: str) -> list[dict]:
+        with cls._lock:
+            return [
+                dict(j) for j in cls._jobs.values()
+                if j["workspace_id"] == workspace_id and j["status"] not in ("done", "failed")
+            ]
+
+    @classmethod
+    def _update(cls, job: dict, **changes):
+        with cls._lock:
+            job.update(changes)
+        cls._publish(job)
+
+    @classmethod
+    def _publish(cls, job: dict):
+        with cls._lock:
+            event = {k: v for k, v in job.items() if k not in ("workspace_id", "created_at")}
+        event["job_id"] = event.pop("id")
+        manager.broadcast_threadsafe(job["workspace_id"], "ingest_progress", **event)
+
+    @staticmethod
+    def _workspace_exists(workspace_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            return db.get(Workspace, workspace_id) is not None
+        finally:
+            db.close()
+
+    @classmethod
+    def _ensure_workspace(cls, workspace_id: str):
+        """Raise WorkspaceDeleted once the workspace is gone, so a job never writes vectors for it."""
+        if not cls._workspace_exists(workspace_id):
+            raise WorkspaceDeleted(f"Workspace {workspace_id} was deleted")
+
+    @classmethod
+    def _run(cls, job: dict, params: dict):
+        workspace_id = job["workspace_id"]
+        db = SessionLocal()
+        source = None
+        before_write = lambda: cls._ensure_workspace(workspace_id)
+        try:
+            before_write()
+            cls._update(job, status="parsing")
+            on_progress = lambda done, total: cls._update(job, chunks_done=done, chunks_total=total)
+            if job["kind"] == "file":
+                # Files are parsed page by page while earlier chunks are embedded
+                source, pieces = SourceService.create_streaming(db, params["file_path"], job["name"], workspace_id)
+                cls._update(job, status="embedding", source_id=source.id, name=source.name)
+                # The text is compressed as it streams by, so memory stays bounded for large files
+                content = StreamedContent()
+                EmbeddingService.add_source_stream(source.id, source.name, content.tee(pieces), workspace_id, on_progress, before_write)
+                before_write()
+                SourceService.set_streamed_content(db, source, content)
+            else:
+                if job["kind"] == "url":
+                    source = asyncio.run(SourceService.create_from_url(db, params["url"], workspace_id))
+                else:
+                    source = SourceService.create_from_paste(db, job["name"], params["content"], workspace_id)
+                cls._update(job, status="embedding", source_id=source.id, name=source.name)
+                EmbeddingService.add_source(source.id, source.name, source.content_text or "", workspace_id, on_progress, before_write)
+                before_write()
+                # Answers cached while the chunks were being embedded are stale now
+                SourceService.touch_workspace(db, workspace_id)
+                db.commit()
+            # delete_workspace drops vectors after committing, so a write that
+            # passed its check is either dropped with the partition or caught here
+            before_write()
+            cls._update(job, status="done")
+            manager.broadcast_threadsafe(workspace_id, "sources_changed")
+            SuggestionService.refresh_suggestions(workspace_id)
+        except Exception as e:
+            # The workspace may vanish between a check and the write after it, which
+            # then fails with a database error rather than WorkspaceDeleted
+            deleted = isinstance(e, WorkspaceDeleted) or not cls._workspace_exists(workspace_id)
+            if deleted:
+                logger.info(f"Ingest job {job['id']} stopped: workspace {workspace_id} was deleted ({e})")
+            else:
+                logger.exception(f"Ingest job {job['id']} failed")
+            # Don't leave a half-ingested source behind
+            try:
+                db.rollback()
+                if deleted:
+                    # A window written just before the delete may have recreated the partition
+                    EmbeddingService.remove_workspace(workspace_id)
+                if source is not None:
+                    # From the job: the rolled-back source may no longer be loadable
+                    EmbeddingService.remove_source(job["source_id"], workspace_id)
+                    SourceService.delete(db, job["source_id"])
+                elif params.get("file_path") and os.path.exists(params["file_path"]):
+                    os.remove(params["file_path"])
+            except Exception:
+                logger.exception(f"Cleanup after failed ingest job {job['id']} failed")
+            cls._update(job, status="failed", error=str(e))
+        finally:
+            db.close()
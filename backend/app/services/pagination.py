@@ -0,0 +1,25 @@
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Query, aliased
+
+
+def keyset_page(query: Query, model, sort: str, limit: int, cursor: int | None, descending: bool = True) -> tuple[list, int | None]:
+    """One page of `query` ordered by (`sort` column, id).
+
+    `cursor` is the id of the last row of the previous page. Its sort value is
+    looked up inside the query rather than round-tripped through the client,
+    so timestamp formatting can't skip or repeat rows. Returns the rows and
+    the cursor for the next page (None on the last page).
+    """
+    column = getattr(model, sort)
+    if cursor is not None:
+        anchor_row = aliased(model)
+        anchor = select(getattr(anchor_row, sort)).where(anchor_row.id == cursor).scalar_subquery()
+        if descending:
+            query = query.filter(or_(column < anchor, and_(column == anchor, model.id < cursor)))
+        else:
+            query = query.filter(or_(column > anchor, and_(column == anchor, model.id > cursor)))
+    order = (column.desc(), model.id.desc()) if descending else (column.asc(), model.id.asc())
+    rows = query.order_by(*order).limit(limit + 1).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
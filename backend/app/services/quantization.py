@@ -0,0 +1,141 @@
+import numpy as np
+from app.config import settings
+
+# Rows converted to float32 at a time when scoring; small enough for the copy to stay in cache
+_SCORE_BLOCK_ROWS = 256
+
+# float16 keeps 11 significant bits, so each component is off by at most this fraction
+_FLOAT16_REL_ERROR = 2.0 ** -11
+
+# Slack for float32 rounding in the dot products themselves
+_SCORE_SLACK = 1e-4
+
+MODES = ("float16", "int8")
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def first_pass_layout() -> tuple[str, int] | None:
+    """(mode, dims) of the first-pass copy the settings ask for: the
+    `vector_quantization` mode ("float32" when off) and the
+    `vector_search_dimensions` prefix (0 = all). None when searches should
+    scan the float32 rows directly."""
+    mode = settings.vector_quantization if settings.vector_quantization in MODES else "float32"
+    dims = settings.vector_search_dimensions
+    if mode == "float32" and not dims:
+        return None
+    return mode, dims
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-10)
+
+
+class QuantizedMatrix:
+    """A cheaper copy of unit-norm embedding rows for first-pass scoring.
+
+    `float16` halves the matrix; `int8` stores each row as int8 codes times a
+    per-row scale (max |component| / 127) and quarters it; `float32` keeps
+    full precision and only makes sense truncated. With `dims` set, only the
+    first `dims` components of each row are kept, re-normalized (Matryoshka
+    embeddings such as text-embedding-3-* are trained for this).
+
+    `candidates` picks the rows a search must score exactly. For a
+    full-length copy, `error` bounds how far `scores` can be off, so every
+    row that could reach the threshold is kept and the final results are
+    the same as an exact search. A truncated prefix has no such bound; its
+    best `rerank` rows are kept instead.
+    """
+
+    def __init__(self, mode: str, data: np.ndarray, scale: np.ndarray | None = None):
+        self.mode = mode
+        self.data = data
+        self.scale = scale
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    @property
+    def dims(self) -> int:
+        return self.data.shape[1]
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, mode: str, dims: int = 0) -> "QuantizedMatrix":
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if dims and dims < vectors.shape[1]:
+            vectors = _unit_rows(vectors[:, :dims]).astype(np.float32)
+        if mode == "float32":
+            return cls(mode, np.ascontiguousarray(vectors))
+        if mode == "float16":
+            return cls(mode, vectors.astype(np.float16))
+        if mode == "int8":
+            scale = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.empty(0, dtype=np.float32)
+            scale = np.maximum(scale, 1e-12).astype(np.float32)
+            codes = np.rint(vectors / scale[:, None]).astype(np.int8)
+            return cls(mode, codes, scale)
+        raise ValueError(f"Unknown vector quantization {mode!r}")
+
+    @classmethod
+    def concatenate(cls, parts: list["QuantizedMatrix"]) -> "QuantizedMatrix":
+        data = np.concatenate([p.data for p in parts])
+        scale = np.concatenate([p.scale for p in parts]) if parts[0].scale is not None else None
+        return cls(parts[0].mode, data, scale)
+
+    # -- files -------------------------------------------------------------
+
+    def tobytes(self) -> bytes:
+        """float32/float16: the rows; int8: the float32 row scales, then the codes."""
+        if self.scale is None:
+            return self.data.tobytes()
+        return self.scale.tobytes() + self.data.tobytes()
+
+    @classmethod
+    def open(cls, path: str, mode: str, n: int, dim: int) -> "QuantizedMatrix":
+        """Memory-map a matrix written with `tobytes`."""
+        if mode != "int8":
+            return cls(mode, np.memmap(path, dtype=_DTYPES[mode], mode="r", shape=(n, dim)))
+        scale = np.memmap(path, dtype=np.float32, mode="r", shape=(n,))
+        data = np.memmap(path, dtype=np.int8, mode="r", offset=4 * n, shape=(n, dim))
+        return cls(mode, data, scale)
+
+    # -- scoring -------------------------------------------------------------
+
+    def scores(self, q: np.ndarray, idx: np.ndarray | None = None) -> np.ndarray:
+        """Approximate similarities of the rows (or rows `idx`) to normalized q."""
+        n = len(self.data) if idx is None else len(idx)
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, _SCORE_BLOCK_ROWS):
+            stop = min(n, start + _SCORE_BLOCK_ROWS)
+            rows = self.data[start:stop] if idx is None else self.data[idx[start:stop]]
+            out[start:stop] = np.asarray(rows, dtype=np.float32) @ q
+        if self.scale is not None:
+            out *= self.scale if idx is None else self.scale[idx]
+        return out
+
+    def error(self, q: np.ndarray, idx: np.ndarray | None = None) -> float | np.ndarray:
+        """Upper bound on |scores - exact similarities| of a full-length copy, per row for int8."""
+        if self.mode == "float32":
+            return _SCORE_SLACK
+        if self.scale is None:
+            # Per component |x - x16| <= 2^-11 |x|, so the dot product is off by <= 2^-11 |q|.|x| <= 2^-11
+            return _FLOAT16_REL_ERROR + _SCORE_SLACK
+        # Rounding to the nearest code is off by at most half a step per component
+        half_step = 0.5 * (self.scale if idx is None else self.scale[idx])
+        return half_step * float(np.abs(q).sum()) + _SCORE_SLACK
+
+    def candidates(self, q: np.ndarray, idx: np.ndarray | None, min_similarity: float, rerank: int) -> np.ndarray:
+        """Row numbers (a subset of `idx`, or of all rows) to score exactly against normalized q."""
+        if self.dims >= len(q):
+            approx = self.scores(q, idx)
+            keep = np.flatnonzero(approx >= min_similarity - self.error(q, idx))
+        else:
+            approx = self.scores(_unit_rows(q[:self.dims]).astype(np.float32), idx)
+            if len(approx) > rerank:
+                keep = np.sort(np.argpartition(-approx, rerank - 1)[:rerank])
+            else:
+                keep = np.arange(len(approx))
+        return keep if idx is None else idx[keep]
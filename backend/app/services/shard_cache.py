@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from typing import Callable
+from app.config import settings
+
+
+class ShardCache:
+    """Per-workspace vector shards resident in memory, least recently used first out.
+
+    Each shard is held with its approximate size in bytes. Once the total
+    exceeds `vector_cache_max_mb`, the coldest shards are evicted — except the
+    one just used, and any whose `evict` callback declines (e.g. a shard
+    being written or compacted right now). Evicted shards are reloaded from
+    storage on their next access; a caller still holding one can keep
+    reading it.
+    """
+
+    def __init__(self, evict: Callable[[object], bool] = lambda shard: True):
+        self._evict = evict
+        self._entries: OrderedDict[str, tuple[object, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._loads = 0
+        self._evictions = 0
+
+    @staticmethod
+    def max_bytes() -> int:
+        return settings.vector_cache_max_mb * 1024 * 1024
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def peek(self, key: str):
+        """The shard without counting a hit or refreshing its recency."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key: str, shard, nbytes: int) -> None:
+        """Hold a freshly loaded shard and evict cold ones past the ceiling."""
+        with self._lock:
+            self._entries[key] = (shard, nbytes)
+            self._entries.move_to_end(key)
+            self._loads += 1
+            self._shrink(key)
+
+    def resize(self, key: str, shard, nbytes: int) -> None:
+        """Record a shard's new size after a write (ignored if it was evicted meanwhile)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not shard:
+                return
+            self._entries[key] = (shard, nbytes)
+            self._shrink(key)
+
+    def pop(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry[0] if entry is not None else None
+
+    def _shrink(self, keep: str) -> None:
+        total = sum(n for _, n in self._entries.values())
+        limit = self.max_bytes()
+        if total <= limit:
+            return
+        for key, (shard, nbytes) in list(self._entries.items()):
+            if total <= limit:
+                break
+            if key == keep or not self._evict(shard):
+                continue
+            del self._entries[key]
+            total -= nbytes
+            self._evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident_shards": len(self._entries),
+                "resident_bytes": sum(n for _, n in self._entries.values()),
+                "max_bytes": self.max_bytes(),
+                "hits": self._hits,
+                "loads": self._loads,
+                "evictions": self._evictions,
+            }
@@ -1,65 +1,224 @@
+import multiprocessing
 import os
 import re
+import threading
+import zlib
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
 import httpx
 from bs4 import BeautifulSoup
 from pypdf import PdfReader
 from docx import Document
-from sqlalchemy.orm import Session
-from app.models.source import Source
+from sqlalchemy import LargeBinary, type_coerce, update
+from sqlalchemy.orm import Session, undefer
+from app.models.source import PREVIEW_CHARS, Source
+from app.models.workspace import Workspace
+from app.services.pagination import keyset_page
 from app.config import settings
 
+_VTT_BLOCK = re.compile(r"(?:NOTE|STYLE)\b")
+_VTT_TIMING = re.compile(r"(\d{2}:\d{2}[\d:.]*)\s*-->\s*(\d{2}:\d{2}[\d:.]*)")
+_VTT_CUE_ID = re.compile(r"^(?:[a-f0-9\-]+/\d+-\d+|\d+)$")
+_VTT_VOICE = re.compile(r"<v\s+([^>]+)>")
+_VTT_TAG = re.compile(r"<[^>]+>")
+
+def piece_text(piece: str | dict) -> str:
+    """The text of a parsed piece: a plain string or a transcript turn dict."""
+    return piece["text"] if isinstance(piece, dict) else piece
+
+
+class StreamedContent:
+    """A source's text, compressed while it is parsed.
+
+    `tee` passes parsed pieces through and feeds their text (joined with
+    paragraph breaks) to a zlib stream, keeping only the compressed bytes
+    plus the preview and length `Source` stores, so a streaming ingest never
+    holds the whole text. Save it with `SourceService.set_streamed_content`.
+    """
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(6)
+        self._blocks: list[bytes] = []
+        self._started = False
+        self.preview = ""
+        self.length = 0
+
+    def tee(self, pieces: Iterator[str | dict]) -> Iterator[str | dict]:
+        for piece in pieces:
+            self.append(piece_text(piece))
+            yield piece
+
+    def append(self, text: str):
+        if self._started:
+            text = "\n\n" + text
+        self._started = True
+        if len(self.preview) < PREVIEW_CHARS:
+            self.preview += text[:PREVIEW_CHARS - len(self.preview)]
+        self.length += len(text)
+        self._blocks.append(self._compressor.compress(text.encode("utf-8")))
+
+    def finish(self) -> bytes:
+        """The compressed text, in the format of `compress_text`."""
+        self._blocks.append(self._compressor.flush())
+        return b"".join(self._blocks)
+
+
+# Per-process reader reused across the page-range tasks of one PDF
+_pdf_reader: tuple[str, float, PdfReader] | None = None
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> list[str]:
+    """Process-pool task: the non-empty text of pages [start, stop)."""
+    global _pdf_reader
+    mtime = os.path.getmtime(file_path)
+    if _pdf_reader is None or _pdf_reader[:2] != (file_path, mtime):
+        _pdf_reader = (file_path, mtime, PdfReader(file_path))
+    reader = _pdf_reader[2]
+    texts = ((reader.pages[i].extract_text() or "").strip() for i in range(start, stop))
+    return [t for t in texts if t]
+
+
 class SourceService:
+    _pdf_pool: ProcessPoolExecutor | None = None
+    _pdf_pool_lock = threading.Lock()
+
+    @staticmethod
+    def iter_vtt(file_path: str) -> Iterator[dict]:
+        """Stream a WebVTT file as speaker turns in a single pass.
+
+        Yields `{"text", "speaker", "start", "end"}` dicts, where text is
+        "Speaker: words" and start/end are the cue timestamps spanning the
+        turn. Headers, NOTE/STYLE blocks and cue ids are dropped, and
+        consecutive cues from the same speaker (or without a speaker) are
+        merged into one turn.
+        """
+        turn: dict | None = None
+        parts: list[str] = []
+        cue_start = cue_end = None
+        state = "header"
+        with open(file_path, "r", encoding="utf-8") as f:
+            for raw in f:
+                line = raw.strip()
+                if state == "header":
+                    state = "body"
+                    if line.lstrip("\ufeff").startswith("WEBVTT"):
+                        continue
+                if state == "skip":
+                    if not line:
+                        state = "body"
+                    continue
+                if not line:
+                    continue
+                if line.startswith(("NOTE", "STYLE")) and _VTT_BLOCK.match(line):
+                    state = "skip"
+                    continue
+                if "-->" in line:
+                    timing = _VTT_TIMING.search(line)
+                    if timing:
+                        cue_start, cue_end = timing.group(1), timing.group(2)
+                        continue
+                if _VTT_CUE_ID.match(line):
+                    continue
+                if "<" in line:
+                    # Voice tags <v Speaker Name>text</v> → "Speaker Name: text"
+                    line = _VTT_TAG.sub("", _VTT_VOICE.sub(r"\1: ", line)).strip()
+                    if not line:
+                        continue
+                speaker, sep, words = line.partition(": ")
+                if turn is not None and (not sep or speaker == turn["speaker"]):
+                    # Same speaker, or a continuation line — extend the current turn
+                    parts.append(words if sep else line)
+                    turn["end"] = cue_end or turn["end"]
+                    continue
+                if turn is not None:
+                    turn["text"] = " ".join(parts)
+                    yield turn
+                turn = {"text": "", "speaker": speaker if sep else None, "start": cue_start, "end": cue_end}
+                parts = [line]
+        if turn is not None:
+            turn["text"] = " ".join(parts)
+            yield turn
+
     @staticmethod
     def parse_vtt(file_path: str) -> str:
         """Parse a WebVTT file, stripping headers, timestamps, and metadata."""
-        with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
-        # Remove WEBVTT header line (and optional description)
-        text = re.sub(r"^WEBVTT[^\n]*\n", "", text)
-        # Remove NOTE blocks (NOTE followed by content until blank line)
-        text = re.sub(r"NOTE\b[^\n]*\n(?:[^\n]+\n)*\n?", "", text)
-        # Remove STYLE blocks
-        text = re.sub(r"STYLE\b[^\n]*\n(?:[^\n]+\n)*\n?", "", text)
-        # Remove timestamp lines like "00:00:00.000 --> 00:00:05.000" with optional settings
-        text = re.sub(r"^[^\n]*\d{2}:\d{2}[\d:.]*\s*-->\s*\d{2}:\d{2}[\d:.]*[^\n]*$", "", text, flags=re.MULTILINE)
-        # Remove cue IDs (GUIDs or standalone numbers)
-        text = re.sub(r"^[a-f0-9\-]+/\d+-\d+\s*$", "", text, flags=re.MULTILINE)
-        text = re.sub(r"^\d+\s*$", "", text, flags=re.MULTILINE)
-        # Convert voice tags <v Speaker Name>text</v> → "Speaker Name: text"
-        text = re.sub(r"<v\s+([^>]+)>", r"\1: ", text)
-        # Strip remaining HTML-like tags (</v>, <b>, etc.)
-        text = re.sub(r"<[^>]+>", "", text)
-        # Collapse blank lines and clean up
-        lines = [line.strip() for line in text.splitlines() if line.strip()]
-        # Merge continuation lines and consecutive lines from the same speaker
-        merged: list[str] = []
-        for line in lines:
-            if not merged:
-                merged.append(line)
-                continue
-            prev = merged[-1]
-            if ": " in line:
-                curr_speaker = line.split(": ", 1)[0]
-                if ": " in prev and prev.split(": ", 1)[0] == curr_speaker:
-                    # Same speaker — append just the text
-                    merged[-1] += " " + line.split(": ", 1)[1]
-                else:
-                    merged.append(line)
-            else:
-                # Continuation line (no speaker prefix) — append to previous
-                merged[-1] += " " + line
-        return "\n\n".join(merged)
+        return "\n\n".join(turn["text"] for turn in SourceService.iter_vtt(file_path))
 
     @staticmethod
-    def parse_docx(file_path: str) -> str:
+    def iter_docx(file_path: str) -> Iterator[str]:
         doc = Document(file_path)
-        return "\n\n".join(p.text for p in doc.paragraphs if p.text.strip())
+        for p in doc.paragraphs:
+            if p.text.strip():
+                yield p.text
 
     @staticmethod
-    def parse_pdf(file_path: str) -> str:
+    def parse_docx(file_path: str) -> str:
+        return "\n\n".join(SourceService.iter_docx(file_path))
+
+    @classmethod
+    def _get_pdf_pool(cls, workers: int) -> ProcessPoolExecutor:
+        with cls._pdf_pool_lock:
+            if cls._pdf_pool is None:
+                # spawn, not fork: the server process runs threads
+                cls._pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            return cls._pdf_pool
+
+    @classmethod
+    def shutdown(cls):
+        with cls._pdf_pool_lock:
+            pool, cls._pdf_pool = cls._pdf_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def iter_pdf(cls, file_path: str) -> Iterator[str]:
+        """Stream the text of a PDF page by page.
+
+        PDFs longer than `pdf_pages_per_task` pages are split into page ranges
+        extracted on a pool of `pdf_workers` processes and yielded back in page
+        order, with at most two ranges per worker in flight.
+        """
         reader = PdfReader(file_path)
-        pages = [page.extract_text() or "" for page in reader.pages]
-        return "\n\n".join(p.strip() for p in pages if p.strip())
+        page_count = len(reader.pages)
+        workers = settings.pdf_workers or os.cpu_count() or 1
+        per_task = max(1, settings.pdf_pages_per_task)
+        if workers <= 1 or page_count <= per_task:
+            for page in reader.pages:
+                text = (page.extract_text() or "").strip()
+                if text:
+                    yield text
+            return
+
+        pool = cls._get_pdf_pool(workers)
+        ranges = deque((start, min(page_count, start + per_task)) for start in range(0, page_count, per_task))
+        pending: deque[Future] = deque()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < 2 * workers:
+                    pending.append(pool.submit(_extract_pdf_pages, file_path, *ranges.popleft()))
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    @staticmethod
+    def parse_pdf(file_path: str) -> str:
+        return "\n\n".join(SourceService.iter_pdf(file_path))
+
+    @staticmethod
+    def iter_file(file_path: str, original_name: str) -> tuple[str, Iterator[str | dict]]:
+        """The source type of an uploaded file and a lazy iterator over its text pieces.
+
+        Pieces are strings, except for transcripts, which yield the turn dicts
+        of `iter_vtt`.
+        """
+        ext = os.path.splitext(original_name)[1].lower()
+        if ext == ".vtt":
+            return "vtt", SourceService.iter_vtt(file_path)
+        if ext == ".pdf":
+            return "pdf", SourceService.iter_pdf(file_path)
+        return "docx", SourceService.iter_docx(file_path)
 
     @staticmethod
     async def scrape_url(url: str) -> tuple[str, str]:
@@ -109,16 +268,8 @@ class SourceService:
 
     @staticmethod
     def create_from_file(db: Session, file_path: str, original_name: str, workspace_id: str) -> Source:
-        ext = os.path.splitext(original_name)[1].lower()
-        if ext == ".vtt":
-            content = SourceService.parse_vtt(file_path)
-            source_type = "vtt"
-        elif ext == ".pdf":
-            content = SourceService.parse_pdf(file_path)
-            source_type = "pdf"
-        else:
-            content = SourceService.parse_docx(file_path)
-            source_type = "docx"
+        source_type, pieces = SourceService.iter_file(file_path, original_name)
+        content = "\n\n".join(piece_text(p) for p in pieces)
         source = Source(
             workspace_id=workspace_id,
             name=original_name,
@@ -127,6 +278,51 @@ class SourceService:
             content_text=content,
         )
         db.add(source)
+        SourceService.touch_workspace(db, workspace_id)
+        db.commit()
+        db.refresh(source)
+        return source
+
+    @staticmethod
+    def create_streaming(db: Session, file_path: str, original_name: str, workspace_id: str) -> tuple[Source, Iterator[str | dict]]:
+        """Create a file source before parsing it.
+
+        Returns the source (with empty content) and an iterator over its text
+        pieces, so the caller can chunk and embed while the file is parsed and
+        save the text with `set_streamed_content` at the end.
+        """
+        source_type, pieces = SourceService.iter_file(file_path, original_name)
+        source = Source(
+            workspace_id=workspace_id,
+            name=original_name,
+            source_type=source_type,
+            file_path=file_path,
+            content_text="",
+        )
+        db.add(source)
+        SourceService.touch_workspace(db, workspace_id)
+        db.commit()
+        db.refresh(source)
+        return source, pieces
+
+    @staticmethod
+    def set_content(db: Session, source: Source, content: str) -> Source:
+        source.content_text = content
+        SourceService.touch_workspace(db, source.workspace_id)
+        db.commit()
+        db.refresh(source)
+        return source
+
+    @staticmethod
+    def set_streamed_content(db: Session, source: Source, content: StreamedContent) -> Source:
+        """`set_content` for text compressed while it was parsed; the compressed bytes are stored as they are."""
+        table = Source.__table__
+        db.execute(
+            update(table).where(table.c.id == source.id).values(
+                content_z=type_coerce(content.finish(), LargeBinary), preview=content.preview, content_length=content.length
+            )
+        )
+        SourceService.touch_workspace(db, source.workspace_id)
         db.commit()
         db.refresh(source)
         return source
@@ -142,6 +338,7 @@ class SourceService:
             content_text=content,
         )
         db.add(source)
+        SourceService.touch_workspace(db, workspace_id)
         db.commit()
         db.refresh(source)
         return source
@@ -158,6 +355,7 @@ class SourceService:
             content_text=content,
         )
         db.add(source)
+        SourceService.touch_workspace(db, workspace_id)
         db.commit()
         db.refresh(source)
         return source
@@ -171,17 +369,40 @@ class SourceService:
             content_text=content,
         )
         db.add(source)
+        SourceService.touch_workspace(db, workspace_id)
         db.commit()
         db.refresh(source)
         return source
 
     @staticmethod
-    def get_all(db: Session, workspace_id: str) -> list[Source]:
-        return db.query(Source).filter(Source.workspace_id == workspace_id).order_by(Source.created_at.desc()).all()
+    def touch_workspace(db: Session, workspace_id: str):
+        """Bump the workspace's content version (committed with the caller's transaction)."""
+        db.query(Workspace).filter(Workspace.id == workspace_id).update(
+            {Workspace.content_version: Workspace.content_version + 1}, synchronize_session=False
+        )
+
+    @staticmethod
+    def get_all(db: Session, workspace_id: str, limit: int, cursor: int | None = None) -> tuple[list[Source], int | None]:
+        """A page of sources, newest first, and the cursor for the next page."""
+        query = db.query(Source).filter(Source.workspace_id == workspace_id)
+        return keyset_page(query, Source, "created_at", limit, cursor)
+
+    @staticmethod
+    def get_ids(db: Session, workspace_id: str) -> list[int]:
+        """Every source id in the workspace, newest first, for clients that page the full list."""
+        rows = (
+            db.query(Source.id)
+            .filter(Source.workspace_id == workspace_id)
+            .order_by(Source.created_at.desc(), Source.id.desc())
+        )
+        return [source_id for (source_id,) in rows]
 
     @staticmethod
-    def get_by_id(db: Session, source_id: int) -> Source | None:
-        return db.query(Source).filter(Source.id == source_id).first()
+    def get_by_id(db: Session, source_id: int, with_content: bool = False) -> Source | None:
+        query = db.query(Source).filter(Source.id == source_id)
+        if with_content:
+            query = query.options(undefer(Source.content_text))
+        return query.first()
 
     @staticmethod
     def delete(db: Session, source_id: int) -> bool:
@@ -191,5 +412,6 @@ class SourceService:
         if source.file_path and os.path.exists(source.file_path):
             os.remove(source.file_path)
         db.delete(source)
+        SourceService.touch_workspace(db, source.workspace_id)
         db.commit()
         return True
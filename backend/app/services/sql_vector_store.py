@@ -0,0 +1,288 @@
+import json
+import threading
+import numpy as np
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.database import SessionLocal
+from app.models.vector import VectorPartition, VectorRow
+from app.services.quantization import QuantizedMatrix, first_pass_layout
+from app.services.shard_cache import ShardCache
+from app.services.vector_store import _ROW_MEMORY_FACTOR, VectorStore, _normalize
+
+# Candidate ids per query when fetching float32 embeddings for rescoring
+_RESCORE_BATCH = 500
+
+
+class _SqlRow(dict):
+    """A row dict ({"id", "metadata"}) whose "text" is fetched from the database when read."""
+
+    __slots__ = ("_store", "_pk")
+
+    def __init__(self, data: dict, store: "SqlVectorStore", pk: int):
+        super().__init__(data)
+        self._store = store
+        self._pk = pk
+
+    def __missing__(self, key):
+        if key != "text":
+            raise KeyError(key)
+        # The row may have been deleted since the search, and SQLite reuses the
+        # ids of deleted rows, so match the chunk id too; a removed row reads as ""
+        with self._store._sessions() as db:
+            return db.query(VectorRow.text).filter(VectorRow.id == self._pk, VectorRow.chunk_id == self["id"]).scalar() or ""
+
+
+class SqlVectorStore(VectorStore):
+    """Embeddings as float32 BLOBs in the application database.
+
+    Every gunicorn worker sees the same rows, so the app can run more than
+    one worker. Each worker caches a workspace's matrix in process and checks
+    the workspace's `vector_partitions` row before using it: if only adds
+    happened since, the rows tagged with newer versions are appended; after a
+    delete the workspace is reloaded. The cached workspaces live in a
+    `ShardCache` bounded by `vector_cache_max_mb`; with a first-pass layout
+    (`vector_quantization` / `vector_search_dimensions`), the cache holds a
+    `QuantizedMatrix` and the candidates it yields are rescored from the
+    float32 BLOBs. Adds take the partition row's write lock
+    while bumping its version, so versions commit in order and a reader never
+    skips rows. Searches are exact; chunk texts are loaded only for the rows a
+    caller actually reads.
+    """
+
+    def __init__(self, session_factory: sessionmaker = SessionLocal):
+        self._sessions = session_factory
+        self._shards = ShardCache()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._sessions() as db:
+            return db.query(func.count(VectorRow.id)).scalar() or 0
+
+    def stats(self) -> dict:
+        return {"backend": "sql", **self._shards.stats()}
+
+    # -- writes ------------------------------------------------------------
+
+    @staticmethod
+    def _bump(db: Session, workspace_id: str, removal: bool = False) -> int | None:
+        """Increment the partition's version (and removal count) and return the new version."""
+        values = {"version": VectorPartition.version + 1}
+        if removal:
+            values["removals"] = VectorPartition.removals + 1
+        result = db.execute(update(VectorPartition).where(VectorPartition.workspace_id == workspace_id).values(**values))
+        if not result.rowcount:
+            return None
+        return db.query(VectorPartition.version).filter(VectorPartition.workspace_id == workspace_id).scalar()
+
+    @staticmethod
+    def _row_objects(workspace_id: str, version: int, rows: list[dict], vectors: np.ndarray) -> list[VectorRow]:
+        return [
+            VectorRow(
+                workspace_id=workspace_id,
+                source_id=r["metadata"]["source_id"],
+                version=version,
+                chunk_id=r["id"],
+                metadata_json=json.dumps(r["metadata"]),
+                embedding=v.tobytes(),
+                text=r["text"],
+            )
+            for r, v in zip(rows, vectors)
+        ]
+
+    def add(self, rows: list[dict], embeddings) -> None:
+        if not rows:
+            return
+        vectors = _normalize(embeddings)
+        workspace_id = rows[0]["metadata"].get("workspace_id", "")
+        for attempt in range(2):
+            with self._sessions() as db:
+                version = self._bump(db, workspace_id)
+                if version is None:
+                    db.add(VectorPartition(workspace_id=workspace_id, dim=vectors.shape[1], version=1, removals=0))
+                    version = 1
+                else:
+                    dim = db.query(VectorPartition.dim).filter(VectorPartition.workspace_id == workspace_id).scalar()
+                    if vectors.shape[1] != dim:
+                        raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {dim}")
+                db.add_all(self._row_objects(workspace_id, version, rows, vectors))
+                try:
+                    db.commit()
+                    return
+                except IntegrityError:
+                    # Another worker created the partition first; bump it instead
+                    db.rollback()
+                    if attempt:
+                        raise
+
+    def remove_source(self, source_id: int, workspace_id: str | None = None) -> None:
+        with self._sessions() as db:
+            if workspace_id is None:
+                workspaces = [w for (w,) in db.query(VectorRow.workspace_id).filter(VectorRow.source_id == source_id).distinct()]
+            else:
+                workspaces = [workspace_id]
+            for ws in workspaces:
+                deleted = db.query(VectorRow).filter(
+                    VectorRow.workspace_id == ws, VectorRow.source_id == source_id
+                ).delete(synchronize_session=False)
+                if deleted:
+                    self._bump(db, ws, removal=True)
+            db.commit()
+
+    def remove_workspace(self, workspace_id: str) -> None:
+        with self._sessions() as db:
+            db.query(VectorRow).filter(VectorRow.workspace_id == workspace_id).delete(synchronize_session=False)
+            db.query(VectorPartition).filter(VectorPartition.workspace_id == workspace_id).delete(synchronize_session=False)
+            db.commit()
+        self._shards.pop(workspace_id)
+
+    def replace_workspace(self, workspace_id: str, rows: list[dict], embeddings) -> None:
+        """Delete and re-insert the workspace's rows in one transaction, under a new version."""
+        vectors = _normalize(embeddings) if rows else None
+        with self._sessions() as db:
+            db.query(VectorRow).filter(VectorRow.workspace_id == workspace_id).delete(synchronize_session=False)
+            if not rows:
+                db.query(VectorPartition).filter(VectorPartition.workspace_id == workspace_id).delete(synchronize_session=False)
+            else:
+                version = self._bump(db, workspace_id, removal=True)
+                if version is None:
+                    db.add(VectorPartition(workspace_id=workspace_id, dim=vectors.shape[1], version=1, removals=0))
+                    version = 1
+                else:
+                    db.execute(update(VectorPartition).where(VectorPartition.workspace_id == workspace_id).values(dim=vectors.shape[1]))
+                db.add_all(self._row_objects(workspace_id, version, rows, vectors))
+            db.commit()
+        self._shards.pop(workspace_id)
+
+    # -- reads -------------------------------------------------------------
+
+    def rows(self, workspace_id: str) -> list[dict]:
+        with self._sessions() as db:
+            result = (
+                db.query(VectorRow.chunk_id, VectorRow.metadata_json, VectorRow.text)
+                .filter(VectorRow.workspace_id == workspace_id)
+                .order_by(VectorRow.id)
+                .all()
+            )
+        return [{"id": chunk_id, "text": text, "metadata": json.loads(meta)} for chunk_id, meta, text in result]
+
+    def _load_rows(self, db: Session, workspace_id: str, after: int, through: int) -> tuple[list[dict], np.ndarray, np.ndarray, int]:
+        """Rows, matrix, source ids and approximate memory of the rows in a version range."""
+        result = (
+            db.query(VectorRow.id, VectorRow.chunk_id, VectorRow.metadata_json, VectorRow.embedding)
+            .filter(VectorRow.workspace_id == workspace_id, VectorRow.version > after, VectorRow.version <= through)
+            .order_by(VectorRow.id)
+            .all()
+        )
+        rows = [_SqlRow({"id": chunk_id, "metadata": json.loads(meta)}, self, pk) for pk, chunk_id, meta, _ in result]
+        matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for *_, blob in result]) if result else None
+        layout = first_pass_layout()
+        if matrix is not None and layout is not None:
+            # The float32 rows stay in the database for rescoring
+            matrix = QuantizedMatrix.from_vectors(matrix, *layout)
+        source_ids = np.fromiter((r["metadata"]["source_id"] for r in rows), dtype=np.int64, count=len(rows))
+        nbytes = sum(len(chunk_id) + len(meta) for _, chunk_id, meta, _ in result) * _ROW_MEMORY_FACTOR
+        nbytes += (matrix.nbytes if matrix is not None else 0) + source_ids.nbytes
+        return rows, matrix, source_ids, nbytes
+
+    def _partition(self, workspace_id: str) -> dict | None:
+        """The workspace's cached rows and matrix, refreshed if another worker (or thread) changed it."""
+        with self._sessions() as db:
+            part = db.get(VectorPartition, workspace_id)
+            if part is None:
+                self._shards.pop(workspace_id)
+                return None
+            cached = self._shards.get(workspace_id)
+            if cached is not None and cached["version"] == part.version:
+                return cached
+            if cached is not None and cached["removals"] == part.removals and cached["layout"] == first_pass_layout():
+                rows, matrix, source_ids, nbytes = self._load_rows(db, workspace_id, cached["version"], part.version)
+                if matrix is not None:
+                    rows = cached["rows"] + rows
+                    if isinstance(matrix, QuantizedMatrix) and cached["matrix"] is not None:
+                        matrix = QuantizedMatrix.concatenate([cached["matrix"], matrix])
+                    elif cached["matrix"] is not None:
+                        matrix = np.concatenate((cached["matrix"], matrix))
+                    source_ids = np.concatenate((cached["source_ids"], source_ids))
+                    nbytes += cached["nbytes"]
+                else:
+                    rows, matrix, source_ids, nbytes = cached["rows"], cached["matrix"], cached["source_ids"], cached["nbytes"]
+            else:
+                rows, matrix, source_ids, nbytes = self._load_rows(db, workspace_id, 0, part.version)
+            entry = {
+                "version": part.version,
+                "removals": part.removals,
+                "rows": rows,
+                "matrix": matrix,
+                "source_ids": source_ids,
+                "nbytes": nbytes,
+                "layout": first_pass_layout(),
+                "dim": part.dim,
+            }
+        with self._lock:
+            current = self._shards.peek(workspace_id)
+            if current is None or current["version"] <= entry["version"]:
+                self._shards.put(workspace_id, entry, nbytes)
+        return entry
+
+    def _workspaces(self, workspace_id: str | None) -> list[str]:
+        if workspace_id is not None:
+            return [workspace_id]
+        with self._sessions() as db:
+            return [w for (w,) in db.query(VectorPartition.workspace_id)]
+
+    def has_candidates(self, workspace_id: str | None = None, source_ids: list[int] | None = None) -> bool:
+        for ws in self._workspaces(workspace_id):
+            part = self._partition(ws)
+            if part is None or not part["rows"]:
+                continue
+            if source_ids is None or np.isin(part["source_ids"], source_ids).any():
+                return True
+        return False
+
+    def _rescore(self, rows: list[_SqlRow], idx: np.ndarray, q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Exact similarities of candidate rows from their float32 BLOBs. Rows
+        deleted since the partition was cached are dropped."""
+        wanted = {rows[i]._pk: i for i in idx.tolist()}
+        found: dict[int, bytes] = {}
+        pks = list(wanted)
+        with self._sessions() as db:
+            for start in range(0, len(pks), _RESCORE_BATCH):
+                batch = pks[start:start + _RESCORE_BATCH]
+                for pk, chunk_id, blob in db.query(VectorRow.id, VectorRow.chunk_id, VectorRow.embedding).filter(VectorRow.id.in_(batch)):
+                    i = wanted[pk]
+                    # SQLite reuses the ids of deleted rows
+                    if rows[i]["id"] == chunk_id:
+                        found[i] = blob
+        keep = np.asarray(sorted(found), dtype=np.int64)
+        if not len(keep):
+            return keep, np.empty(0, dtype=np.float32)
+        matrix = np.stack([np.frombuffer(found[i], dtype=np.float32) for i in keep.tolist()])
+        return keep, matrix @ q
+
+    def search(self, query_embedding, workspace_id: str | None = None, source_ids: list[int] | None = None, min_similarity: float = 0.0) -> list[tuple[float, dict]]:
+        q = _normalize(query_embedding)[0]
+        scored: list[tuple[float, dict]] = []
+        for ws in self._workspaces(workspace_id):
+            part = self._partition(ws)
+            if part is None or part["matrix"] is None:
+                continue
+            if source_ids is None:
+                idx = np.arange(len(part["rows"]))
+            else:
+                idx = np.flatnonzero(np.isin(part["source_ids"], source_ids))
+            if not len(idx):
+                continue
+            rows = part["rows"]
+            matrix = part["matrix"]
+            if len(q) != part["dim"]:
+                raise ValueError(f"Query dimension {len(q)} does not match store dimension {part['dim']}; run python -m app.reindex")
+            if isinstance(matrix, QuantizedMatrix):
+                idx, sims = self._rescore(rows, matrix.candidates(q, idx, min_similarity, settings.vector_rerank_candidates), q)
+            else:
+                sims = matrix[idx] @ q
+            hits = np.flatnonzero(sims >= min_similarity)
+            scored.extend((float(sims[h]), rows[int(idx[h])]) for h in hits.tolist())
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return scored
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from openai import OpenAI
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, dialect_insert
+from app.models.chat import ChatMessage
+from app.models.source import Source
+from app.models.suggestion import WorkspaceSuggestions
+from app.models.workspace import Workspace
+from app.services.ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_questions(raw: str) -> list[str]:
+    raw = raw.strip()
+    # Strip markdown code fences if present
+    if raw.startswith("```"):
+        raw = raw.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
+    try:
+        questions = json.loads(raw)
+        if isinstance(questions, list):
+            return [str(q) for q in questions[:3]]
+    except json.JSONDecodeError:
+        pass
+    return []
+
+
+class SuggestionService:
+    """Starter suggestions and follow-up questions, generated off the request path.
+
+    Results are stored per workspace in `workspace_suggestions`, keyed by a
+    hash of the source set (suggestions) or the id of the latest chat message
+    (followups), so the endpoints answer from the table once they are ready.
+    Suggestions are refreshed in the background when sources change, and
+    followups right after each answer is saved. Concurrent requests for the
+    same (workspace, kind, key) share one in-flight LLM call. The endpoints
+    never wait for it: on a miss they report the result as pending, and it
+    arrives as a `suggestions_ready` websocket event.
+    """
+
+    _client: OpenAI | None = None
+    _pool: ThreadPoolExecutor | None = None
+    _lock = threading.Lock()
+    _inflight: dict[tuple[str, str, str], Future] = {}
+
+    @classmethod
+    def _get_client(cls) -> OpenAI:
+        if cls._client is None:
+            cls._client = OpenAI(
+                base_url=settings.llm_base_url,
+                api_key=settings.github_token,
+            )
+        return cls._client
+
+    @classmethod
+    def _get_pool(cls) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._pool is None:
+                cls._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="suggest")
+            return cls._pool
+
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            pool, cls._pool = cls._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # -- keys and storage ----------------------------------------------------
+
+    @staticmethod
+    def _source_set_key(db: Session, workspace_id: str) -> str | None:
+        rows = (
+            db.query(Source.id, Source.content_length)
+            .filter(Source.workspace_id == workspace_id)
+            .order_by(Source.id)
+            .all()
+        )
+        if not rows:
+            return None
+        return hashlib.sha256(json.dumps([[i, n or 0] for i, n in rows]).encode()).hexdigest()
+
+    @staticmethod
+    def _history_query(db: Session, workspace_id: str):
+        query = db.query(ChatMessage).filter(ChatMessage.workspace_id == workspace_id)
+        ws = db.query(Workspace).filter(Workspace.id == workspace_id).first()
+        if ws and ws.chat_reset_at:
+            query = query.filter(ChatMessage.created_at > ws.chat_reset_at)
+        return query
+
+    @classmethod
+    def _last_message_key(cls, db: Session, workspace_id: str) -> str | None:
+        last = cls._history_query(db, workspace_id).order_by(ChatMessage.id.desc()).first()
+        return str(last.id) if last else None
+
+    @staticmethod
+    def _cached(db: Session, workspace_id: str, kind: str, key: str) -> list[str] | None:
+        row = db.get(WorkspaceSuggestions, (workspace_id, kind))
+        return json.loads(row.items) if row and row.key == key else None
+
+    @staticmethod
+    def _store(workspace_id: str, kind: str, key: str, items: list[str]):
+        db = SessionLocal()
+        try:
+            # The workspace may have been deleted while the LLM call was running
+            if db.get(Workspace, workspace_id) is None:
+                return
+            # Upsert: a concurrent generation for another key may be storing the same (workspace, kind)
+            stmt = dialect_insert(WorkspaceSuggestions).values(workspace_id=workspace_id, kind=kind, key=key, items=json.dumps(items))
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[WorkspaceSuggestions.workspace_id, WorkspaceSuggestions.kind],
+                set_={"key": stmt.excluded["key"], "items": stmt.excluded["items"], "updated_at": func.now()},
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    @classmethod
+    def forget_workspace(cls, db: Session, workspace_id: str):
+        """Delete a workspace's stored results (in the caller's transaction) and stop sharing its in-flight calls.
+
+        Calls already running finish for their waiters, but `_store` finds the workspace gone and keeps nothing.
+        """
+        db.query(WorkspaceSuggestions).filter(WorkspaceSuggestions.workspace_id == workspace_id).delete(synchronize_session=False)
+        with cls._lock:
+            for flight in [f for f in cls._inflight if f[0] == workspace_id]:
+                del cls._inflight[flight]
+
+    @classmethod
+    def _compute(cls, workspace_id: str, kind: str, key: str) -> Future:
+        """Generate and store one result, sharing the call with identical concurrent requests."""
+        flight = (workspace_id, kind, key)
+        pool = cls._get_pool()
+        with cls._lock:
+            future = cls._inflight.get(flight)
+            if future is None:
+                generate = cls._generate_suggestions if kind == "suggestions" else cls._generate_followups
+                future = cls._inflight[flight] = pool.submit(cls._run, flight, generate)
+            return future
+
+    @classmethod
+    def _run(cls, flight: tuple[str, str, str], generate) -> list[str]:
+        workspace_id, kind, key = flight
+        try:
+            db = SessionLocal()
+            try:
+                items = generate(db, workspace_id)
+            finally:
+                db.close()
+            # Don't pin an empty result; the next request retries
+            if items:
+                cls._store(workspace_id, kind, key, items)
+        except Exception:
+            logger.exception(f"Generating {kind} for workspace {workspace_id} failed")
+            items = []
+        finally:
+            with cls._lock:
+                cls._inflight.pop(flight, None)
+        # Also sent when empty, so clients waiting on a pending result stop waiting
+        manager.broadcast_threadsafe(workspace_id, "suggestions_ready", kind=kind, key=key, suggestions=items)
+        return items
+
+    # -- public API ----------------------------------------------------------
+
+    @classmethod
+    def get_suggestions(cls, db: Session, workspace_id: str) -> list[str] | None:
+        """Starter questions, or None while they are generated (see `suggestions_ready`)."""
+        key = cls._source_set_key(db, workspace_id)
+        if key is None:
+            return []
+        cached = cls._cached(db, workspace_id, "suggestions", key)
+        if cached is not None:
+            return cached
+        cls._compute(workspace_id, "suggestions", key)
+        return None
+
+    @classmethod
+    def get_followups(cls, db: Session, workspace_id: str) -> list[str] | None:
+        """Follow-up questions, or None while they are generated (see `suggestions_ready`)."""
+        key = cls._last_message_key(db, workspace_id)
+        if key is None:
+            return []
+        cached = cls._cached(db, workspace_id, "followups", key)
+        if cached is not None:
+            return cached
+        cls._compute(workspace_id, "followups", key)
+        return None
+
+    @classmethod
+    def refresh_suggestions(cls, workspace_id: str):
+        """Start regenerating suggestions if the source set changed. Doesn't wait."""
+        db = SessionLocal()
+        try:
+            key = cls._source_set_key(db, workspace_id)
+            if key is None or cls._cached(db, workspace_id, "suggestions", key) is not None:
+                return
+        finally:
+            db.close()
+        cls._compute(workspace_id, "suggestions", key)
+
+    @classmethod
+    def prefetch_followups(cls, workspace_id: str, message_id: int):
+        """Start generating followups for the conversation ending at `message_id`. Doesn't wait."""
+        cls._compute(workspace_id, "followups", str(message_id))
+
+    # -- generation ----------------------------------------------------------
+
+    @classmethod
+    def _generate_suggestions(cls, db: Session, workspace_id: str) -> list[str]:
+        # Sample content from each source via its stored preview (~2000 chars)
+        sources = (
+            db.query(Source.name, Source.preview)
+            .filter(Source.workspace_id == workspace_id)
+            .all()
+        )
+        content_samples = []
+        for name, text in sources:
+            text = (text or "").strip()
+            if text:
+                content_samples.append(f"[{name}]: {text}")
+        if not content_samples:
+            return []
+
+        combined = "\n\n---\n\n".join(content_samples)
+        # Cap total context to avoid token limits
+        combined = combined[:8000]
+
+        response = cls._get_client().chat.completions.create(
+            model=settings.chat_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Based on the following source material, suggest exactly 3 specific, useful questions "
+                        "a user could ask about this content. The questions should be diverse and help the user "
+                        "extract key insights. Return ONLY a JSON array of 3 strings, no other text."
+                    ),
+                },
+                {"role": "user", "content": combined},
+            ],
+            temperature=0.7,
+            max_tokens=300,
+        )
+        return _parse_questions(response.choices[0].message.content)
+
+    @classmethod
+    def _generate_followups(cls, db: Session, workspace_id: str) -> list[str]:
+        """Generate follow-up questions based on the current conversation."""
+        history = cls._history_query(db, workspace_id).order_by(ChatMessage.created_at.desc()).limit(10).all()
+        history.reverse()
+        if not history:
+            return []
+
+        conversation = "\n".join(
+            f"{'User' if m.role == 'user' else 'Assistant'}: {m.content[:1000]}" for m in history
+        )
+
+        response = cls._get_client().chat.completions.create(
+            model=settings.chat_model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Based on the conversation below, suggest exactly 3 follow-up questions the user could ask. "
+                        "Focus on deeper analysis of the sources, identifying key insights, comparisons across sources, "
+                        "or actionable takeaways. The questions should be specific, diverse, and build on what was already discussed. "
+                        "Return ONLY a JSON array of 3 strings, no other text."
+                    ),
+                },
+                {"role": "user", "content": conversation},
+            ],
+            temperature=0.7,
+            max_tokens=300,
+        )
+        return _parse_questions(response.choices[0].message.content)
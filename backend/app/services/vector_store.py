@@ -0,0 +1,841 @@
+import copy
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import zlib
+import numpy as np
+from app.config import settings
+from app.services.ann_index import IVFIndex
+from app.services.quantization import QuantizedMatrix, first_pass_layout
+from app.services.shard_cache import ShardCache
+
+logger = logging.getLogger(__name__)
+
+_SAFE_PARTITION_NAME = re.compile(r"^[A-Za-z0-9-]+$")
+
+# Chunk texts are compressed together in blocks of this many rows; neighbouring
+# chunks overlap, so blocks compress far better than single rows
+_TEXT_BLOCK_ROWS = 16
+
+_FIRST_PASS_EXTENSIONS = {"float32": "f32", "float16": "f16", "int8": "i8"}
+
+# Parsed row dicts take roughly this many times their JSON size in memory
+_ROW_MEMORY_FACTOR = 3
+
+
+def _normalize(vectors) -> np.ndarray:
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim == 1:
+        arr = arr[None, :]
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    return np.ascontiguousarray(arr / (norms + 1e-10), dtype=np.float32)
+
+
+def _write_json(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # e.g. still memory-mapped on Windows; harmless leftover
+
+
+def _write_text_blocks(path: str, texts: list[str]):
+    """Write texts as zlib-compressed JSON blocks: a little-endian uint64 block
+    count, block count + 1 offsets into the data, then the blocks."""
+    blocks = [
+        zlib.compress(json.dumps(texts[i:i + _TEXT_BLOCK_ROWS]).encode("utf-8"), 6)
+        for i in range(0, len(texts), _TEXT_BLOCK_ROWS)
+    ]
+    offsets = np.zeros(len(blocks) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(b) for b in blocks])
+    with open(path + ".tmp", "wb") as f:
+        f.write(np.asarray([len(blocks)], dtype="<u8").tobytes())
+        f.write(offsets.tobytes())
+        for block in blocks:
+            f.write(block)
+    os.replace(path + ".tmp", path)
+
+
+class _Row(dict):
+    """A row dict ({"id", "metadata"}) whose "text" is decompressed from its
+    segment's text file each time it is read, so texts stay out of memory."""
+
+    __slots__ = ("_segment", "_index")
+
+    def __init__(self, data: dict, segment: "_Segment", index: int):
+        super().__init__(data)
+        self._segment = segment
+        self._index = index
+
+    def __missing__(self, key):
+        if key != "text":
+            raise KeyError(key)
+        return self._segment.text(self._index)
+
+
+def _source_ranges(source_ids: np.ndarray) -> dict[int, list[tuple[int, int]]]:
+    """Map each source id to the [start, stop) row runs it occupies."""
+    ranges: dict[int, list[tuple[int, int]]] = {}
+    if not len(source_ids):
+        return ranges
+    bounds = np.flatnonzero(np.diff(source_ids)) + 1
+    starts = np.concatenate(([0], bounds))
+    stops = np.concatenate((bounds, [len(source_ids)]))
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        ranges.setdefault(int(source_ids[start]), []).append((start, stop))
+    return ranges
+
+
+class _Segment:
+    """An immutable slab of rows: a float32 matrix file, its row sidecar and
+    the rows' compressed texts, plus a first-pass copy of the matrix
+    (quantized and/or truncated, see `first_pass_layout`) when the settings
+    ask for one.
+
+    Segments are written once and never modified. Deletions produce a new
+    view of the segment (`without`) with a different `live` row mask, so a
+    reader holding the old view keeps a consistent picture. Segments
+    written before text compression keep their texts inline in the sidecar
+    (`compressed` is False) until compaction rewrites them.
+    """
+
+    def __init__(self, seq: int, matrix: np.ndarray, rows: list[dict], text_blob: np.ndarray | None = None, rows_bytes: int = 0,
+                 first_pass: QuantizedMatrix | None = None):
+        self.seq = seq
+        self.matrix = matrix
+        self.first_pass = first_pass
+        self.rows_bytes = rows_bytes
+        self.compressed = text_blob is not None
+        if text_blob is not None:
+            n_blocks = int(np.frombuffer(text_blob, dtype="<u8", count=1)[0])
+            self._text_offsets = np.frombuffer(text_blob, dtype="<u8", count=n_blocks + 1, offset=8)
+            self._text_data = text_blob[8 * (n_blocks + 2):]
+            self._last_block: tuple[int, list[str]] | None = None
+            rows = [_Row(r, self, i) for i, r in enumerate(rows)]
+        self.rows = rows
+        self.source_ids = np.fromiter((r["metadata"]["source_id"] for r in rows), dtype=np.int64, count=len(rows))
+        self.source_ranges = _source_ranges(self.source_ids)
+        self.live = np.ones(len(rows), dtype=bool)
+        self.live_count = len(rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held once the segment is fully paged in."""
+        text = len(self._text_data) if self.compressed else 0
+        # With a first-pass copy, only the rescored candidates' float32 rows are read
+        matrix = self.first_pass.nbytes if self.first_pass is not None else self.matrix.nbytes
+        return matrix + text + self.rows_bytes * _ROW_MEMORY_FACTOR + self.source_ids.nbytes + self.live.nbytes
+
+    def _block(self, block: int) -> list[str]:
+        cached = self._last_block
+        if cached is not None and cached[0] == block:
+            return cached[1]
+        start, stop = int(self._text_offsets[block]), int(self._text_offsets[block + 1])
+        texts = json.loads(zlib.decompress(self._text_data[start:stop].tobytes()))
+        self._last_block = (block, texts)
+        return texts
+
+    def text(self, i: int) -> str:
+        if not self.compressed:
+            return self.rows[i]["text"]
+        return self._block(i // _TEXT_BLOCK_ROWS)[i % _TEXT_BLOCK_ROWS]
+
+    def texts(self) -> list[str]:
+        """Every row's text, decompressing each block once."""
+        if not self.compressed:
+            return [r["text"] for r in self.rows]
+        return [t for b in range(len(self._text_offsets) - 1) for t in self._block(b)]
+
+    def without(self, source_id: int) -> "_Segment":
+        """This segment with the source's rows hidden (itself if it has none)."""
+        ranges = self.source_ranges.get(source_id)
+        if not ranges:
+            return self
+        live = self.live.copy()
+        for start, stop in ranges:
+            live[start:stop] = False
+        view = copy.copy(self)
+        view.live = live
+        view.live_count = int(live.sum())
+        return view
+
+
+class SegmentLog:
+    """Append-only log of embedding segments with tombstone deletes.
+
+    Layout of `directory`:
+      manifest.json          {"workspace_id", "dim", "next_seq", "segments": [seq, ...]}
+      seg-<seq>.f32          raw row-major float32, L2-normalized rows
+      seg-<seq>.rows.json    [{"id", "metadata"}, ...]
+      seg-<seq>.text.z       row texts, zlib-compressed in blocks of 16 rows
+      seg-<seq>[.p<dims>].f32 / .f16 / .i8
+                             first-pass copy of the matrix (see `QuantizedMatrix`)
+      tombstones.jsonl       one {"seq", "source_id"} per line
+
+    A tombstone with sequence number t hides the source's rows in every
+    segment with seq < t, so a source id that is re-added later survives.
+    Writes cost O(size of change); segments left with no live rows are
+    dropped immediately, and `compact()` merges the rest once
+    `needs_compaction()` says the log has become fragmented.
+
+    Once the log holds `ann_min_rows` live rows, an IVF index (`ivf.npz`
+    holds its centroids) is trained in the background and new segments are
+    assigned to it as they are appended; smaller logs are searched exactly.
+    """
+
+    def __init__(self, directory: str, workspace_id: str = ""):
+        self.directory = directory
+        self.workspace_id = workspace_id
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.tombstones_path = os.path.join(directory, "tombstones.jsonl")
+        self.ann_path = os.path.join(directory, "ivf.npz")
+        self.dim = 0
+        self.next_seq = 1
+        self.segments: tuple[_Segment, ...] = ()
+        self.tombstones: list[tuple[int, int]] = []
+        self.ann: IVFIndex | None = None
+        self._lock = threading.Lock()
+        self._compacting = False
+        self._ann_building = False
+        # Set (under the lock) once the workspace is removed; later writes are ignored
+        self.dropped = False
+        # Set (under the lock) once the log is unloaded; writers must reopen it
+        self.evicted = False
+        self._load()
+
+    def __len__(self) -> int:
+        return sum(s.live_count for s in self.segments)
+
+    @property
+    def nbytes(self) -> int:
+        ann = self.ann
+        return sum(s.nbytes for s in self.segments) + (ann.nbytes if ann is not None else 0)
+
+    def try_evict(self) -> bool:
+        """Close the log to writes so it can be unloaded; False while it is being written, compacted or indexed."""
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            if self._compacting or self._ann_building:
+                return False
+            self.evicted = True
+            return True
+        finally:
+            self._lock.release()
+
+    def _paths(self, seq: int) -> tuple[str, str, str]:
+        base = os.path.join(self.directory, f"seg-{seq:08d}")
+        return base + ".f32", base + ".rows.json", base + ".text.z"
+
+    def _first_pass_path(self, seq: int, layout: tuple[str, int]) -> str:
+        mode, dims = layout
+        prefix = f".p{dims}" if dims else ""
+        return os.path.join(self.directory, f"seg-{seq:08d}{prefix}.{_FIRST_PASS_EXTENSIONS[mode]}")
+
+    def _segment_files(self, seq: int, suffix: str = "") -> list[str]:
+        """The segment's files on disk, first-pass copies of any layout included
+        (with `suffix`, only the ones written under that side name)."""
+        start = f"seg-{seq:08d}."
+        return [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.startswith(start) and (name.endswith(suffix) if suffix else not name.endswith((".compact", ".tmp")))
+        ]
+
+    @staticmethod
+    def _up_to_date(seg: _Segment) -> bool:
+        """Whether the segment is in the current on-disk format (compressed texts, first-pass copy if enabled)."""
+        return seg.compressed and (seg.first_pass is not None or first_pass_layout() is None)
+
+    # -- persistence -------------------------------------------------------
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+        self.workspace_id = manifest.get("workspace_id", self.workspace_id)
+        self.dim = manifest["dim"]
+        self.next_seq = manifest["next_seq"]
+        if os.path.exists(self.tombstones_path):
+            with open(self.tombstones_path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        t = json.loads(line)
+                        self.tombstones.append((t["seq"], t["source_id"]))
+        self.segments = tuple(self._apply_tombstones(self._open_segment(seq)) for seq in manifest["segments"])
+        ann = IVFIndex.load(self.ann_path)
+        if ann is not None and ann.centroids.shape[1] == self.dim:
+            self.ann = ann  # segment lists are rebuilt by build_ann()
+
+    def _open_segment(self, seq: int) -> _Segment:
+        matrix_path, rows_path, text_path = self._paths(seq)
+        with open(rows_path, "r") as f:
+            rows = json.load(f)
+        if rows:
+            matrix = np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(len(rows), self.dim))
+        else:
+            matrix = np.empty((0, self.dim), dtype=np.float32)
+        text_blob = np.memmap(text_path, dtype=np.uint8, mode="r") if os.path.exists(text_path) else None
+        first_pass = None
+        layout = first_pass_layout()
+        if rows and layout is not None and os.path.exists(self._first_pass_path(seq, layout)):
+            mode, dims = layout
+            first_pass = QuantizedMatrix.open(self._first_pass_path(seq, layout), mode, len(rows), min(dims or self.dim, self.dim))
+        return _Segment(seq, matrix, rows, text_blob, os.path.getsize(rows_path), first_pass)
+
+    def _write_segment(self, seq: int, rows: list[dict], texts: list[str], vectors: np.ndarray, suffix: str = ""):
+        matrix_path, rows_path, text_path = (p + suffix for p in self._paths(seq))
+        with open(matrix_path + ".tmp", "wb") as f:
+            f.write(vectors.tobytes())
+        os.replace(matrix_path + ".tmp", matrix_path)
+        layout = first_pass_layout()
+        if layout is not None and len(vectors):
+            first_pass_path = self._first_pass_path(seq, layout) + suffix
+            with open(first_pass_path + ".tmp", "wb") as f:
+                f.write(QuantizedMatrix.from_vectors(vectors, *layout).tobytes())
+            os.replace(first_pass_path + ".tmp", first_pass_path)
+        _write_text_blocks(text_path, texts)
+        _write_json(rows_path, [{"id": r["id"], "metadata": r["metadata"]} for r in rows])
+
+    def _write_manifest(self, segments):
+        _write_json(self.manifest_path, {
+            "workspace_id": self.workspace_id,
+            "dim": self.dim,
+            "next_seq": self.next_seq,
+            "segments": [s.seq for s in segments],
+        })
+
+    def _write_tombstones(self):
+        tmp = self.tombstones_path + ".tmp"
+        with open(tmp, "w") as f:
+            for t, sid in self.tombstones:
+                f.write(json.dumps({"seq": t, "source_id": sid}) + "\n")
+        os.replace(tmp, self.tombstones_path)
+
+    def _apply_tombstones(self, seg: _Segment) -> _Segment:
+        for t, sid in self.tombstones:
+            if t > seg.seq:
+                seg = seg.without(sid)
+        return seg
+
+    # -- writes ------------------------------------------------------------
+
+    def append(self, rows: list[dict], embeddings) -> bool:
+        """Write rows as a new segment. Cost scales with len(rows) only.
+
+        Returns False, writing nothing, if the log was evicted; the caller
+        reopens it and retries.
+        """
+        if not rows:
+            return True
+        vectors = _normalize(embeddings)
+        with self._lock:
+            if self.evicted:
+                return False
+            if self.dropped:
+                return True
+            if self.dim and vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.dim}")
+            self.dim = vectors.shape[1]
+            os.makedirs(self.directory, exist_ok=True)
+            seq = self.next_seq
+            self.next_seq += 1
+            self._write_segment(seq, rows, [r["text"] for r in rows], vectors)
+            seg = self._open_segment(seq)
+            if self.ann is not None:
+                self.ann.add_segment(seq, seg.matrix)
+            segments = self.segments + (seg,)
+            self._write_manifest(segments)
+            self.segments = segments
+        return True
+
+    def has_source(self, source_id: int) -> bool:
+        return any(source_id in s.source_ranges for s in self.segments)
+
+    def delete_source(self, source_id: int) -> bool:
+        """Hide every existing row of the source behind a tombstone.
+
+        Uses the source's row ranges, never a scan. Segments with no live rows
+        left (the common case, since each ingest writes its own segment) are
+        dropped from the manifest and deleted on the spot. Like `append`,
+        returns False if the log was evicted.
+        """
+        with self._lock:
+            if self.evicted:
+                return False
+            if self.dropped or not self.has_source(source_id):
+                return True
+            seq = self.next_seq
+            self.next_seq += 1
+            views = [s.without(source_id) for s in self.segments]
+            segments = tuple(s for s in views if s.live_count)
+            dropped = [s for s in views if not s.live_count]
+            if any(source_id in s.source_ranges for s in segments):
+                with open(self.tombstones_path, "a") as f:
+                    f.write(json.dumps({"seq": seq, "source_id": source_id}) + "\n")
+                self.tombstones.append((seq, source_id))
+            self._write_manifest(segments)
+            self.segments = segments
+        for seg in dropped:
+            if self.ann is not None:
+                self.ann.drop_segment(seg.seq)
+            for path in self._segment_files(seg.seq):
+                _remove_quietly(path)
+        return True
+
+    # -- compaction --------------------------------------------------------
+
+    def needs_compaction(self) -> bool:
+        segments = self.segments
+        if len(segments) >= settings.vector_compact_segments:
+            return True
+        # Rewrite segments that still keep their texts uncompressed or lack the current first-pass copy
+        if any(s.rows and not self._up_to_date(s) for s in segments):
+            return True
+        total = sum(len(s.rows) for s in segments)
+        dead = total - sum(s.live_count for s in segments)
+        return total > 0 and dead / total >= settings.vector_compact_dead_ratio
+
+    def compact(self) -> None:
+        """Merge all current segments into one, dropping tombstoned rows.
+
+        The merge runs outside the write lock on immutable segment files; only
+        the manifest swap is serialized with writers. The merged segment takes
+        the highest input seq, so tombstones written during the merge still
+        apply to it.
+        """
+        inputs = self.segments
+        if len(inputs) < 2 and all(s.live_count == len(s.rows) and self._up_to_date(s) for s in inputs):
+            return
+        rows: list[dict] = []
+        texts: list[str] = []
+        parts: list[np.ndarray] = []
+        for seg in inputs:
+            keep = seg.live
+            rows.extend(r for r, k in zip(seg.rows, keep) if k)
+            texts.extend(t for t, k in zip(seg.texts(), keep) if k)
+            parts.append(np.asarray(seg.matrix[keep], dtype=np.float32))
+        merged_seq = max(s.seq for s in inputs)
+        vectors = np.concatenate(parts) if parts else np.empty((0, self.dim), dtype=np.float32)
+        # Write under a side name first; the input segment keeps its files until the swap
+        self._write_segment(merged_seq, rows, texts, vectors, suffix=".compact")
+
+        with self._lock:
+            input_seqs = {s.seq for s in inputs}
+            current = {s.seq for s in self.segments}
+            if self.dropped or self.evicted or not input_seqs <= current:
+                # A delete emptied one of the inputs (no tombstone is kept for a
+                # dropped segment) or the workspace was removed: the merge is stale
+                for path in self._segment_files(merged_seq, ".compact"):
+                    _remove_quietly(path)
+                return
+            written = {path[:-len(".compact")] for path in self._segment_files(merged_seq, ".compact")}
+            for path in self._segment_files(merged_seq):
+                if path not in written:
+                    _remove_quietly(path)  # a first-pass copy in a layout no longer in use
+            for path in written:
+                os.replace(path + ".compact", path)
+            merged = self._apply_tombstones(self._open_segment(merged_seq))
+            if self.ann is not None:
+                self.ann.add_segment(merged_seq, merged.matrix)
+            segments = (merged,) + tuple(s for s in self.segments if s.seq not in input_seqs)
+            self._write_manifest(segments)
+            self.segments = segments
+            # Drop tombstones that no longer hide any row
+            self.tombstones = [
+                (t, sid) for t, sid in self.tombstones
+                if any(seg.seq < t and sid in seg.source_ranges for seg in segments)
+            ]
+            self._write_tombstones()
+        for seq in input_seqs - {merged_seq}:
+            if self.ann is not None:
+                self.ann.drop_segment(seq)
+            for path in self._segment_files(seq):
+                _remove_quietly(path)
+
+    def maybe_compact_in_background(self) -> None:
+        """Start a background compaction if the log is fragmented enough."""
+        if self._compacting or self.dropped or self.evicted or not self.needs_compaction():
+            return  # the common case, decided without waiting on a writer
+        with self._lock:
+            if self._compacting or self.dropped or self.evicted:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Vector store compaction failed")
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name="vector-compactor", daemon=True).start()
+
+    # -- ANN index ---------------------------------------------------------
+
+    def needs_ann_build(self) -> bool:
+        if not settings.ann_enabled or len(self) < settings.ann_min_rows:
+            return False
+        ann = self.ann
+        if ann is None or len(self) > 2 * ann.trained_rows:
+            return True
+        return any(not ann.has_segment(s.seq) for s in self.segments)
+
+    def build_ann(self) -> None:
+        """Train the IVF index (or retrain once the log has doubled) and index every segment.
+
+        Training uses a random sample of at most `ann_train_sample` live rows.
+        When the existing centroids are still current, only unindexed
+        segments are assigned.
+        """
+        segments = self.segments
+        ann = self.ann
+        if ann is None or len(self) > 2 * ann.trained_rows:
+            live = [(seg, np.flatnonzero(seg.live)) for seg in segments]
+            total = sum(len(idx) for _, idx in live)
+            if not total:
+                return
+            rng = np.random.default_rng(0)
+            take = np.sort(rng.choice(total, min(total, settings.ann_train_sample), replace=False))
+            parts, base = [], 0
+            for seg, idx in live:
+                local = take[(take >= base) & (take < base + len(idx))] - base
+                if len(local):
+                    parts.append(np.asarray(seg.matrix[idx[local]], dtype=np.float32))
+                base += len(idx)
+            ann = IVFIndex.train(np.concatenate(parts))
+            ann.trained_rows = total
+            ann.save(self.ann_path)
+        for seg in segments:
+            if not ann.has_segment(seg.seq):
+                ann.add_segment(seg.seq, seg.matrix)
+        with self._lock:
+            if self.dropped or self.evicted:
+                return
+            # Segments appended while we were training are indexed before publishing
+            for seg in self.segments:
+                if not ann.has_segment(seg.seq):
+                    ann.add_segment(seg.seq, seg.matrix)
+            self.ann = ann
+
+    def maybe_build_ann_in_background(self) -> None:
+        if self._ann_building or self.dropped or self.evicted or not self.needs_ann_build():
+            return  # the common case, decided without waiting on a writer
+        with self._lock:
+            if self._ann_building or self.dropped or self.evicted:
+                return
+            self._ann_building = True
+
+        def run():
+            try:
+                self.build_ann()
+            except Exception:
+                logger.exception("ANN index build failed")
+            finally:
+                self._ann_building = False
+
+        threading.Thread(target=run, name="ann-builder", daemon=True).start()
+
+    # -- reads -------------------------------------------------------------
+
+    def live_rows(self) -> list[dict]:
+        """Every live row as a plain {"id", "text", "metadata"} dict, in log order."""
+        out = []
+        for seg in self.segments:
+            texts = seg.texts()
+            out.extend(
+                {"id": r["id"], "text": texts[i], "metadata": r["metadata"]}
+                for i, r in enumerate(seg.rows) if seg.live[i]
+            )
+        return out
+
+    def search(self, q: np.ndarray, source_ids: list[int] | None, min_similarity: float) -> list[tuple[float, dict]]:
+        """Score a normalized query against live rows, optionally limited to sources.
+
+        Source filters resolve to row ranges through each segment's index, so
+        only the selected rows are touched. Logs large enough to have an ANN
+        index only score rows in the query's `ann_nprobe` nearest IVF lists.
+        Segments with a first-pass copy are scored on it first and only its
+        `QuantizedMatrix.candidates` are rescored from the float32 matrix.
+        """
+        if self.dim and len(q) != self.dim:
+            raise ValueError(f"Query dimension {len(q)} does not match store dimension {self.dim}; run python -m app.reindex")
+        ann = self.ann
+        lists = None
+        if ann is not None and settings.ann_enabled and len(self) >= settings.ann_min_rows:
+            lists = ann.probe(q, settings.ann_nprobe)
+        wanted = np.asarray(source_ids, dtype=np.int64) if source_ids is not None else None
+        scored: list[tuple[float, dict]] = []
+        for seg in self.segments:
+            cand = ann.candidates(seg.seq, seg.matrix, lists) if lists is not None else None
+            if cand is not None:
+                idx = cand[seg.live[cand]]
+                if wanted is not None:
+                    idx = idx[np.isin(seg.source_ids[idx], wanted)]
+            elif source_ids is None:
+                if seg.live_count == len(seg.rows):
+                    idx = None
+                else:
+                    idx = np.flatnonzero(seg.live)
+            else:
+                ranges = [r for sid in source_ids for r in seg.source_ranges.get(sid, ())]
+                if not ranges:
+                    continue
+                idx = np.concatenate([np.arange(a, b) for a, b in ranges])
+                idx = idx[seg.live[idx]]
+            if seg.first_pass is not None:
+                idx = seg.first_pass.candidates(q, idx, min_similarity, settings.vector_rerank_candidates)
+            if idx is None:
+                sims = seg.matrix @ q
+            elif len(idx):
+                sims = seg.matrix[idx] @ q
+            else:
+                continue
+            hits = np.flatnonzero(sims >= min_similarity)
+            rows = seg.rows
+            if idx is None:
+                scored.extend((float(sims[h]), rows[h]) for h in hits.tolist())
+            else:
+                scored.extend((float(sims[h]), rows[int(idx[h])]) for h in hits.tolist())
+        return scored
+
+
+class VectorStore(ABC):
+    """Where EmbeddingService keeps chunk embeddings; `vector_store_backend` picks the implementation.
+
+    Rows are dicts with "id", "text" and "metadata" (which holds "source_id"
+    and "workspace_id"); all rows of one `add` call belong to one workspace.
+    Embeddings are L2-normalized on insert, so `search` scores are cosine
+    similarities. `python -m benchmarks.bench_vector_stores` runs the shared
+    conformance checks and timings against every backend.
+    """
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    @abstractmethod
+    def add(self, rows: list[dict], embeddings) -> None:
+        """Append rows and their embeddings."""
+
+    @abstractmethod
+    def remove_source(self, source_id: int, workspace_id: str | None = None) -> None: ...
+
+    @abstractmethod
+    def remove_workspace(self, workspace_id: str) -> None: ...
+
+    @abstractmethod
+    def rows(self, workspace_id: str) -> list[dict]:
+        """Every row of the workspace with its text, for re-embedding."""
+
+    @abstractmethod
+    def replace_workspace(self, workspace_id: str, rows: list[dict], embeddings) -> None:
+        """Swap all of a workspace's rows for these in one step; the embedding dimension may change."""
+
+    @abstractmethod
+    def has_candidates(self, workspace_id: str | None = None, source_ids: list[int] | None = None) -> bool:
+        """Whether a search with these filters could return anything."""
+
+    @abstractmethod
+    def search(self, query_embedding, workspace_id: str | None = None, source_ids: list[int] | None = None, min_similarity: float = 0.0) -> list[tuple[float, dict]]:
+        """(similarity, row) for rows matching the filters with similarity >= min_similarity, best first."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Backend name and `ShardCache` residency counters, for /api/stats/vector-store."""
+
+
+class FileVectorStore(VectorStore):
+    """Embedding store partitioned into one segment log per workspace.
+
+    Each workspace lives in `partitions/<workspace>/` as a `SegmentLog` of
+    memory-mapped float32 matrices. Vectors are L2-normalized on insert, so
+    cosine similarity is a plain dot product. Workspace filters are a dict
+    lookup, source filters resolve through per-segment row-range indexes, and
+    dropping a workspace removes its directory outright.
+
+    Logs are opened on a workspace's first access and kept in a `ShardCache`,
+    so memory follows the active workspaces, not all of them: past
+    `vector_cache_max_mb` the least recently used logs are unloaded (a log
+    that is being written, compacted or indexed stays until it is idle).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.partitions_dir = os.path.join(directory, "partitions")
+        self._shards = ShardCache(evict=lambda log: log.try_evict())
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(log) for log in self._logs(None))
+
+    def stats(self) -> dict:
+        return {"backend": "file", **self._shards.stats()}
+
+    def _partition_dir(self, workspace_id: str) -> str:
+        if not workspace_id:
+            name = "_unscoped"
+        elif _SAFE_PARTITION_NAME.match(workspace_id):
+            name = workspace_id
+        else:
+            name = "x-" + hashlib.sha1(workspace_id.encode()).hexdigest()
+        return os.path.join(self.partitions_dir, name)
+
+    def _workspace_ids(self) -> list[str]:
+        """Every workspace with a partition on disk, resident or not."""
+        if not os.path.isdir(self.partitions_dir):
+            return []
+        ids = []
+        for name in sorted(os.listdir(self.partitions_dir)):
+            try:
+                with open(os.path.join(self.partitions_dir, name, "manifest.json"), "r") as f:
+                    ids.append(json.load(f).get("workspace_id", ""))
+            except FileNotFoundError:
+                continue
+        return ids
+
+    def _partition(self, workspace_id: str, create: bool = True) -> SegmentLog | None:
+        """The workspace's log, loaded on first access. None if the workspace
+        has no partition on disk and `create` is False."""
+        log = self._shards.get(workspace_id)
+        if log is not None:
+            return log
+        with self._lock:
+            log = self._shards.peek(workspace_id)
+            if log is None:
+                directory = self._partition_dir(workspace_id)
+                if not create and not os.path.exists(os.path.join(directory, "manifest.json")):
+                    return None
+                log = SegmentLog(directory, workspace_id)
+                self._shards.put(workspace_id, log, log.nbytes)
+                # Also rewrites segments from before text compression
+                log.maybe_compact_in_background()
+        return log
+
+    # -- writes ------------------------------------------------------------
+
+    def add(self, rows: list[dict], embeddings):
+        """Append rows (dicts with id/text/metadata) and their embeddings.
+
+        All rows of one call must belong to the same workspace.
+        """
+        if not rows:
+            return
+        workspace_id = rows[0]["metadata"].get("workspace_id", "")
+        log = self._partition(workspace_id)
+        # The log was unloaded between the lookup and the write: reopen it
+        while not log.append(rows, embeddings):
+            log = self._partition(workspace_id)
+        self._shards.resize(workspace_id, log, log.nbytes)
+        log.maybe_compact_in_background()
+        log.maybe_build_ann_in_background()
+
+    def remove_source(self, source_id: int, workspace_id: str | None = None):
+        for ws in [workspace_id] if workspace_id is not None else self._workspace_ids():
+            log = self._partition(ws, create=False)
+            while log is not None and not log.delete_source(source_id):
+                log = self._partition(ws, create=False)
+            if log is not None:
+                self._shards.resize(ws, log, log.nbytes)
+                log.maybe_compact_in_background()
+
+    def remove_workspace(self, workspace_id: str):
+        """Drop a workspace's whole partition without touching any other."""
+        with self._lock:
+            log = self._shards.pop(workspace_id)
+            if log is not None:
+                # An add or delete that already holds the log must not recreate its directory
+                with log._lock:
+                    log.dropped = True
+            # A new partition isn't opened until the old one is gone
+            shutil.rmtree(self._partition_dir(workspace_id), ignore_errors=True)
+
+    def replace_workspace(self, workspace_id: str, rows: list[dict], embeddings):
+        """Build the new partition beside the old one, then swap the directories."""
+        target = self._partition_dir(workspace_id)
+        staging = os.path.join(self.directory, "reindex", os.path.basename(target))
+        shutil.rmtree(staging, ignore_errors=True)
+        if rows:
+            SegmentLog(staging, workspace_id).append(rows, embeddings)
+        with self._lock:
+            log = self._shards.pop(workspace_id)
+            if log is not None:
+                with log._lock:
+                    log.dropped = True
+            shutil.rmtree(target, ignore_errors=True)
+            if rows:
+                os.makedirs(self.partitions_dir, exist_ok=True)
+                os.replace(staging, target)
+
+    # -- reads -------------------------------------------------------------
+
+    def rows(self, workspace_id: str) -> list[dict]:
+        log = self._partition(workspace_id, create=False)
+        return log.live_rows() if log is not None else []
+
+    def _logs(self, workspace_id: str | None) -> list[SegmentLog]:
+        workspace_ids = [workspace_id] if workspace_id is not None else self._workspace_ids()
+        return [log for ws in workspace_ids if (log := self._partition(ws, create=False)) is not None]
+
+    def has_candidates(self, workspace_id: str | None = None, source_ids: list[int] | None = None) -> bool:
+        for log in self._logs(workspace_id):
+            if source_ids is None:
+                if len(log):
+                    return True
+            elif any(log.has_source(sid) for sid in source_ids):
+                return True
+        return False
+
+    def search(self, query_embedding, workspace_id: str | None = None, source_ids: list[int] | None = None, min_similarity: float = 0.0) -> list[tuple[float, dict]]:
+        """Rows matching the filters with cosine similarity >= min_similarity, best first."""
+        q = _normalize(query_embedding)[0]
+        scored: list[tuple[float, dict]] = []
+        for log in self._logs(workspace_id):
+            log.maybe_build_ann_in_background()
+            scored.extend(log.search(q, source_ids, min_similarity))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return scored
+
+    # -- migration ---------------------------------------------------------
+
+    def _import(self, rows: list[dict], matrix: np.ndarray) -> int:
+        """Append rows to their workspace partitions, one segment per source."""
+        groups: dict[tuple[str, int], list[int]] = {}
+        for i, r in enumerate(rows):
+            key = (r["metadata"].get("workspace_id", ""), r["metadata"]["source_id"])
+            groups.setdefault(key, []).append(i)
+        for idx in groups.values():
+            self.add([rows[i] for i in idx], matrix[idx])
+        return len(rows)
+
+    def migrate_legacy(self, legacy_json_path: str) -> int:
+        """One-time import of the original `vectors.json` list-of-dicts store into workspace partitions.
+
+        The file is renamed to `vectors.json.migrated` so the import never
+        repeats. Returns the number of rows imported.
+        """
+        if not os.path.exists(legacy_json_path):
+            return 0
+        with open(legacy_json_path, "r") as f:
+            entries = json.load(f)
+        entries = [e for e in entries if e.get("embedding")]
+        imported = 0
+        if entries:
+            imported = self._import(
+                [{"id": e["id"], "text": e["text"], "metadata": e["metadata"]} for e in entries],
+                np.asarray([e["embedding"] for e in entries], dtype=np.float32),
+            )
+        os.replace(legacy_json_path, legacy_json_path + ".migrated")
+        return imported
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import WebSocket
 from collections import defaultdict
 import json
@@ -6,6 +7,11 @@ import json
 class ConnectionManager:
     def __init__(self):
         self._connections: dict[str, list[WebSocket]] = defaultdict(list)
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Remember the server's event loop so worker threads can broadcast."""
+        self._loop = loop
 
     async def connect(self, workspace_id: str, ws: WebSocket):
         await ws.accept()
@@ -16,8 +22,8 @@ class ConnectionManager:
         if not self._connections[workspace_id]:
             del self._connections[workspace_id]
 
-    async def broadcast(self, workspace_id: str, event_type: str):
-        message = json.dumps({"type": event_type})
+    async def broadcast(self, workspace_id: str, event_type: str, **payload):
+        message = json.dumps({"type": event_type, **payload})
         dead: list[WebSocket] = []
         for ws in self._connections.get(workspace_id, []):
             try:
@@ -30,5 +36,11 @@ class ConnectionManager:
             except ValueError:
                 pass
 
+    def broadcast_threadsafe(self, workspace_id: str, event_type: str, **payload):
+        """Schedule a broadcast on the event loop from a non-async worker thread."""
+        if self._loop is None or self._loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self.broadcast(workspace_id, event_type, **payload), self._loop)
+
 
 manager = ConnectionManager()
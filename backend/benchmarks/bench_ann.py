@@ -0,0 +1,76 @@
+"""Recall@k vs latency of the IVF index against exact search.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_ann [--sizes 2000 10000 50000] [--dim 1536]
+
+Uses synthetic clustered unit vectors (topic centres plus noise) so it runs
+without an embeddings API key; queries are perturbed copies of stored rows,
+which is how HyDE-style queries land near real chunks.
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.config import settings
+from app.services.vector_store import SegmentLog, _normalize
+
+
+def _corpus(n: int, dim: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    centres = _normalize(rng.normal(size=(topics, dim)))
+    labels = rng.integers(0, topics, size=n)
+    return _normalize(centres[labels] + rng.normal(scale=0.1, size=(n, dim)))
+
+
+def _timed_search(log: SegmentLog, queries: np.ndarray, k: int) -> tuple[list[list[str]], float]:
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        scored = log.search(q, None, -1.0)
+        scored.sort(key=lambda x: x[0], reverse=True)
+        results.append([row["id"] for _, row in scored[:k]])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    print(f"{'rows':>7} {'mode':>12} {'ms/query':>9} {'recall@' + str(args.k):>10}")
+    for n in args.sizes:
+        vectors = _corpus(n, args.dim, topics=max(8, n // 200), rng=rng)
+        with tempfile.TemporaryDirectory() as tmp:
+            log = SegmentLog(tmp, "bench")
+            per_source = 200
+            for start in range(0, n, per_source):
+                stop = min(n, start + per_source)
+                rows = [{"id": str(i), "text": "", "metadata": {"source_id": start // per_source}} for i in range(start, stop)]
+                log.append(rows, vectors[start:stop])
+            queries = _normalize(vectors[rng.choice(n, args.queries)] + rng.normal(scale=0.02, size=(args.queries, args.dim)))
+
+            settings.ann_enabled = False
+            exact, exact_ms = _timed_search(log, queries, args.k)
+            print(f"{n:>7} {'exact':>12} {exact_ms:>9.2f} {1.0:>10.3f}")
+
+            settings.ann_enabled = True
+            settings.ann_min_rows = 0
+            build_start = time.perf_counter()
+            log.build_ann()
+            build_s = time.perf_counter() - build_start
+            for nprobe in args.nprobe:
+                settings.ann_nprobe = nprobe
+                approx, ann_ms = _timed_search(log, queries, args.k)
+                recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact) if e])
+                label = f"ivf/{log.ann.nlist}p{nprobe}"
+                print(f"{n:>7} {label:>12} {ann_ms:>9.2f} {recall:>10.3f}")
+            print(f"{n:>7} {'ivf build':>12} {build_s * 1000:>9.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
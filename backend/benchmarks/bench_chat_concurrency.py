@@ -0,0 +1,84 @@
+"""Concurrent chat throughput of one worker against a fake OpenAI server.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_chat_concurrency [--concurrency 1 8 32] [--latency-ms 500]
+
+Drives the FastAPI app in-process (one event loop, like one uvicorn worker)
+with N simultaneous POST /chat requests. The fake model answers every HyDE
+and chat completion after `--latency-ms`, so a blocking pipeline takes about
+N x 2 x latency while a non-blocking one stays near 2 x latency. It also
+reports how long /api/health takes while the chats are in flight.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+_TMP = tempfile.mkdtemp(prefix="bench-chat-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/bench.db")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_TMP, "vectors"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_TMP, "uploads"))
+
+import httpx  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.workspace import Workspace  # noqa: E402
+from app.services.embedding_service import EmbeddingService  # noqa: E402
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+
+
+def _setup_workspace() -> str:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    ws = Workspace(name="bench")
+    db.add(ws)
+    db.commit()
+    workspace_id = ws.id
+    db.close()
+    text = " ".join(f"Sentence {i} about trust services and audit controls." for i in range(400))
+    EmbeddingService.add_source(1, "bench.txt", text, workspace_id)
+    return workspace_id
+
+
+async def _round(client: httpx.AsyncClient, workspace_id: str, n: int) -> tuple[float, float]:
+    async def chat(i: int):
+        r = await client.post(f"/api/workspaces/{workspace_id}/chat", json={"content": f"What about audit control {i}?"})
+        r.raise_for_status()
+
+    async def health() -> float:
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        (await client.get("/api/health")).raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(health(), *(chat(i) for i in range(n)))
+    return time.perf_counter() - start, results[0]
+
+
+async def _main(args):
+    with FakeOpenAI(latency_ms=args.latency_ms) as server:
+        settings.llm_base_url = server.url
+        settings.hyde_enabled = not args.no_hyde
+        workspace_id = _setup_workspace()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            print(f"{'chats':>6} {'wall s':>8} {'chats/s':>8} {'health ms':>10}")
+            for n in args.concurrency:
+                wall, health = await _round(client, workspace_id, n)
+                print(f"{n:>6} {wall:>8.2f} {n / wall:>8.1f} {health * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--no-hyde", action="store_true")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Time to first token: streamed vs blocking chat answers.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_chat_ttft [--latency-ms 300] [--token-ms 20] [--runs 5]
+
+Serves the app with uvicorn (an in-process ASGI transport would buffer the
+stream) against the fake OpenAI server, and compares how long the user
+waits before seeing any answer text: the whole POST /chat response for the
+blocking endpoint, and the first `token` event of POST /chat/stream.
+Each mode asks its own questions and the answer cache is off, so every
+answer comes from the model.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+import uvicorn
+# First: points the app at a throwaway database before app.config is loaded
+from benchmarks.bench_chat_concurrency import _setup_workspace
+from app.config import settings  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.fake_openai import FakeOpenAI  # noqa: E402
+
+
+async def _blocking(client: httpx.AsyncClient, url: str, question: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    (await client.post(url, json={"content": question})).raise_for_status()
+    total = time.perf_counter() - start
+    return total, total
+
+
+async def _streamed(client: httpx.AsyncClient, url: str, question: str) -> tuple[float, float]:
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", f"{url}/stream", json={"content": question}) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event["type"] == "token" and first is None:
+                first = time.perf_counter() - start
+            elif event["type"] == "error":
+                raise RuntimeError(event["detail"])
+    return first, time.perf_counter() - start
+
+
+async def _main(args):
+    with FakeOpenAI(latency_ms=args.latency_ms, token_ms=args.token_ms) as server:
+        settings.llm_base_url = server.url
+        settings.answer_cache_enabled = False
+        workspace_id = _setup_workspace()
+        url = f"/api/workspaces/{workspace_id}/chat"
+        app_server, base_url = await _serve()
+        async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+            print(f"{'mode':<10} {'first text ms':>14} {'complete ms':>12}")
+            for name, run in (("blocking", _blocking), ("streamed", _streamed)):
+                results = [await run(client, url, f"What about audit control {i} ({name})?") for i in range(args.runs)]
+                first = statistics.median(r[0] for r in results) * 1000
+                total = statistics.median(r[1] for r in results) * 1000
+                print(f"{name:<10} {first:>14.0f} {total:>12.0f}")
+        app_server.should_exit = True
+
+
+async def _serve() -> tuple[uvicorn.Server, str]:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, lifespan="off", log_level="warning"))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Storage and I/O saved by compressing source text and chunk texts.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_compression
+
+Extracts every seed document (seed_data/ transcripts and web_trust_data/
+PDFs), then compares:
+
+- `sources.content_text` stored raw vs. through `CompressedText`;
+- the vector store's chunk texts kept inline in each segment's row sidecar
+  (the old layout, read in full whenever a partition is opened) vs. the
+  sidecar plus the block-compressed `seg-*.text.z` file, of which a search
+  only reads the blocks holding its results.
+"""
+import glob
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from app.database import compress_text, decompress_text
+from app.services.embedding_service import EmbeddingService
+from app.services.source_service import SourceService, piece_text
+from app.services.vector_store import SegmentLog
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+SEED_GLOBS = (
+    os.path.join(BACKEND_DIR, "seed_data", "*", "*.vtt"),
+    os.path.join(BACKEND_DIR, "..", "web_trust_data", "*.pdf"),
+)
+
+
+def _kb(n: int) -> str:
+    return f"{n / 1024:,.0f} KB"
+
+
+def main():
+    files = sorted(f for pattern in SEED_GLOBS for f in glob.glob(pattern))
+    if not files:
+        raise SystemExit("No seed documents found")
+    raw_content = z_content = 0
+    raw_sidecars = new_sidecars = text_files = 0
+    chunks_total = 0
+    decompress_s = 0.0
+    rng = np.random.default_rng(0)
+    for source_id, path in enumerate(files):
+        _, pieces = SourceService.iter_file(path, os.path.basename(path))
+        pieces = list(pieces)
+        content = "\n\n".join(piece_text(p) for p in pieces)
+        raw_content += len(content.encode("utf-8"))
+        z = compress_text(content)
+        z_content += len(z)
+        start = time.perf_counter()
+        assert decompress_text(z) == content
+        decompress_s += time.perf_counter() - start
+
+        chunks = list(EmbeddingService.iter_chunks(pieces))
+        chunks_total += len(chunks)
+        rows = [{"id": f"{source_id}-{i}", "text": c, "metadata": {"source_id": source_id, "source_name": os.path.basename(path)}}
+                for i, c in enumerate(chunks)]
+        raw_sidecars += len(json.dumps(rows).encode("utf-8"))
+        with tempfile.TemporaryDirectory() as tmp:
+            log = SegmentLog(tmp, "bench")
+            log.append(rows, rng.normal(size=(len(rows), 8)))
+            _, rows_path, text_path = log._paths(log.segments[0].seq)
+            new_sidecars += os.path.getsize(rows_path)
+            text_files += os.path.getsize(text_path)
+            assert log.segments[0].texts() == chunks
+
+    print(f"{len(files)} documents, {chunks_total} chunks\n")
+    print(f"{'':34} {'before':>10} {'after':>10} {'ratio':>7}")
+    print(f"{'sources.content_text':34} {_kb(raw_content):>10} {_kb(z_content):>10} {z_content / raw_content:>7.2f}")
+    new_total = new_sidecars + text_files
+    print(f"{'vector store text on disk':34} {_kb(raw_sidecars):>10} {_kb(new_total):>10} {new_total / raw_sidecars:>7.2f}")
+    print(f"{'read when a partition is opened':34} {_kb(raw_sidecars):>10} {_kb(new_sidecars):>10} {new_sidecars / raw_sidecars:>7.2f}")
+    print(f"\ncontent_text decompression: {raw_content / 1e6 / decompress_s:,.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
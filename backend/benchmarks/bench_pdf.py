@@ -0,0 +1,55 @@
+"""Serial vs process-pool PDF text extraction over web_trust_data/.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pdf [--workers 1 2 4] [--pages-per-task 8]
+
+Each PDF is extracted with `SourceService.iter_pdf` at every worker count
+(1 = the in-process path) and checked against the serial output page for
+page. Pool start-up is excluded by a warm-up pass.
+"""
+import argparse
+import glob
+import os
+import time
+from app.config import settings
+from app.services.source_service import SourceService
+
+PDF_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "web_trust_data")
+
+
+def _extract(path: str, workers: int) -> tuple[list[str], float]:
+    settings.pdf_workers = workers
+    start = time.perf_counter()
+    pages = list(SourceService.iter_pdf(path))
+    return pages, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--pages-per-task", type=int, default=settings.pdf_pages_per_task)
+    parser.add_argument("--dir", default=PDF_DIR)
+    args = parser.parse_args()
+    settings.pdf_pages_per_task = args.pages_per_task
+    paths = sorted(glob.glob(os.path.join(args.dir, "*.pdf")))
+    workers = sorted(set(args.workers))
+
+    print(f"{'pdf':<40} {'workers':>7} {'seconds':>8} {'speedup':>8}")
+    for path in paths:
+        serial, serial_s = _extract(path, 1)
+        name = os.path.basename(path)[:40]
+        print(f"{name:<40} {1:>7} {serial_s:>8.2f} {1.0:>8.2f}")
+        for n in workers:
+            if n <= 1:
+                continue
+            SourceService.shutdown()
+            _extract(path, n)  # warm-up: spawn the pool
+            pages, seconds = _extract(path, n)
+            assert pages == serial, f"{name}: pool output differs from serial"
+            print(f"{name:<40} {n:>7} {seconds:>8.2f} {serial_s / seconds:>8.2f}")
+    SourceService.shutdown()
+
+
+if __name__ == "__main__":
+    main()
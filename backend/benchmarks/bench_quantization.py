@@ -0,0 +1,157 @@
+"""Memory, latency and recall@k of quantized and truncated first-pass search.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_quantization [--dim 1536] [--copies 10] [--queries 200] [--k 15]
+                                            [--search-dims 0,256,512] [--rerank 200]
+
+Chunks every seed document (seed_data/ transcripts and web_trust_data/
+PDFs) the way ingest does. So that it runs without an embeddings API key,
+chunks are embedded as idf-weighted hashed bag-of-words projections (every
+word gets a fixed random direction), which gives related chunks related
+vectors. The corpus is repeated `--copies` times with small perturbations
+to reach a realistic workspace size. Queries are 20-word windows of random
+chunks, searched with the app's `min_similarity` of 0.3.
+
+For each `vector_quantization` mode and `vector_search_dimensions` prefix
+the same rows are appended to a `SegmentLog` and the report shows the
+resident first-pass matrix size, search latency, how many rows the first
+pass sends to rescoring, recall@k of the first pass alone (ranking by its
+approximate scores) and recall@k of the final results. The hashed vectors
+are not trained Matryoshka-style, so their prefixes are plain random
+projections; text-embedding-3-* prefixes hold more of the signal, and
+truncated recall here is a lower bound.
+"""
+import argparse
+import glob
+import math
+import os
+import re
+import tempfile
+import time
+import zlib
+from collections import Counter
+import numpy as np
+from app.config import settings
+from app.services.embedding_service import EmbeddingService
+from app.services.source_service import SourceService
+from app.services.vector_store import SegmentLog, _normalize
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+SEED_GLOBS = (
+    os.path.join(BACKEND_DIR, "seed_data", "*", "*.vtt"),
+    os.path.join(BACKEND_DIR, "..", "web_trust_data", "*.pdf"),
+)
+MIN_SIMILARITY = 0.3
+_WORD = re.compile(r"[a-z0-9]{3,}")
+
+
+def _chunks() -> list[tuple[int, str]]:
+    files = sorted(f for pattern in SEED_GLOBS for f in glob.glob(pattern))
+    if not files:
+        raise SystemExit("No seed documents found")
+    out = []
+    for source_id, path in enumerate(files):
+        _, pieces = SourceService.iter_file(path, os.path.basename(path))
+        out.extend((source_id, chunk) for chunk in EmbeddingService.iter_chunks(pieces))
+    return out
+
+
+class _HashedEmbedder:
+    def __init__(self, texts: list[str], dim: int):
+        self.dim = dim
+        self._directions: dict[str, np.ndarray] = {}
+        df = Counter(w for t in texts for w in set(_WORD.findall(t.lower())))
+        self._idf = {w: math.log(len(texts) / n) for w, n in df.items()}
+
+    def _direction(self, word: str) -> np.ndarray:
+        vec = self._directions.get(word)
+        if vec is None:
+            vec = self._directions[word] = np.random.default_rng(zlib.crc32(word.encode())).normal(size=self.dim)
+        return vec
+
+    def embed(self, text: str) -> np.ndarray:
+        counts = Counter(_WORD.findall(text.lower()))
+        vec = np.zeros(self.dim)
+        for word, n in counts.items():
+            vec += (1 + math.log(n)) * self._idf.get(word, 1.0) * self._direction(word)
+        return vec
+
+
+def _recall(found: list[list[int]], exact: list[list[int]]) -> float:
+    scores = [len(set(f) & set(e)) / len(e) for f, e in zip(found, exact) if e]
+    return float(np.mean(scores)) if scores else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--search-dims", default="0,256,512", help="comma-separated prefixes; 0 = full length")
+    parser.add_argument("--rerank", type=int, default=settings.vector_rerank_candidates)
+    args = parser.parse_args()
+    settings.ann_enabled = False  # measure the first-pass scan itself
+    settings.vector_rerank_candidates = args.rerank
+
+    chunks = _chunks()
+    embedder = _HashedEmbedder([c for _, c in chunks], args.dim)
+    base = _normalize(np.stack([embedder.embed(c) for _, c in chunks]))
+    rng = np.random.default_rng(0)
+    vectors = _normalize(np.concatenate(
+        [base] + [base + rng.normal(scale=0.02, size=base.shape) for _ in range(args.copies - 1)]
+    ))
+    source_ids = [sid + copy * 1000 for copy in range(args.copies) for sid, _ in chunks]
+    picks = rng.choice(len(chunks), args.queries)
+    queries = []
+    for i in picks:
+        words = chunks[i][1].split()
+        start = int(rng.integers(0, max(1, len(words) - 20)))
+        queries.append(embedder.embed(" ".join(words[start:start + 20])))
+    queries = _normalize(np.stack(queries))
+
+    # Ground truth: exact similarities over the whole corpus
+    exact_sims = queries @ vectors.T
+    exact_top = [[int(i) for i in np.argsort(-s)[:args.k] if s[i] >= MIN_SIMILARITY] for s in exact_sims]
+    print(f"{len(chunks)} seed chunks x {args.copies} copies = {len(vectors)} rows x {args.dim} dims, "
+          f"{args.queries} queries, min_similarity {MIN_SIMILARITY}, "
+          f"{np.mean([len(t) for t in exact_top]):.1f} of top {args.k} above it on average\n")
+    print(f"{'mode':<8} {'dims':>5} {'matrix MB':>9} {'ms/query':>9} {'rescored':>9} {'first-pass recall@' + str(args.k):>21} {'recall@' + str(args.k):>10}")
+
+    for dims in [int(d) for d in args.search_dims.split(",")]:
+        for mode in ("none", "float16", "int8"):
+            settings.vector_quantization = mode
+            settings.vector_search_dimensions = dims
+            with tempfile.TemporaryDirectory() as tmp:
+                log = SegmentLog(tmp, "bench")
+                per_segment = 256
+                for start in range(0, len(vectors), per_segment):
+                    stop = min(len(vectors), start + per_segment)
+                    rows = [{"id": str(i), "text": "", "metadata": {"source_id": source_ids[i]}} for i in range(start, stop)]
+                    log.append(rows, vectors[start:stop])
+                log.compact()
+                first = log.segments[0].first_pass
+                matrix_mb = (first.nbytes if first is not None else log.segments[0].matrix.nbytes) / 2**20
+
+                found = []
+                start = time.perf_counter()
+                for q in queries:
+                    scored = log.search(q, None, MIN_SIMILARITY)
+                    scored.sort(key=lambda x: x[0], reverse=True)
+                    found.append([int(r["id"]) for _, r in scored[:args.k]])
+                ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+                if first is None:
+                    rescored, first_pass = 0.0, 1.0
+                else:
+                    rescored = float(np.mean([len(first.candidates(q, None, MIN_SIMILARITY, args.rerank)) for q in queries]))
+                    approx = np.stack([first.scores(_normalize(q[:first.dims])[0]) for q in queries])
+                    first_pass = _recall(
+                        [[int(i) for i in np.argsort(-a)[:args.k] if a[i] >= MIN_SIMILARITY] for a in approx], exact_top
+                    )
+                label = dims if dims and dims < args.dim else "all"
+                print(f"{mode:<8} {label:>5} {matrix_mb:>9.1f} {ms:>9.2f} {rescored:>9.0f} {first_pass:>21.3f} {_recall(found, exact_top):>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Memory held by resident workspace vectors under a `vector_cache_max_mb` ceiling.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_vector_residency [--workspaces 40] [--rows 2000] [--dim 256] [--cache-mb 16]
+
+Fills many workspaces, then replays a skewed workload (most queries hit a
+few hot workspaces, the rest are spread over the cold tail) against every
+backend, once with the ceiling and once effectively unbounded. Reports
+resident shards and bytes, hit ratio, evictions and search latency. While
+the bounded run is going a writer keeps adding to random workspaces, and at
+the end a fresh instance must find every row that was written, so evicting
+a shard mid-write never loses data. Uses a throwaway SQLite database and
+vector directory.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+_TMP = tempfile.mkdtemp(prefix="bench-residency-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/bench.db")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_TMP, "chroma"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_TMP, "uploads"))
+
+import numpy as np  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import Base, engine  # noqa: E402
+from app.services.sql_vector_store import SqlVectorStore  # noqa: E402
+from app.services.vector_store import FileVectorStore  # noqa: E402
+
+BACKENDS = {
+    "file": lambda: FileVectorStore(os.path.join(_TMP, "file-store")),
+    "sql": SqlVectorStore,
+}
+HOT_SHARE = 0.8  # fraction of queries that go to the hot workspaces
+HOT_WORKSPACES = 4
+
+
+def _rows(ws: str, source_id: int, n: int) -> list[dict]:
+    return [
+        {"id": f"{ws}-{source_id}-{i}", "text": f"chunk {i}", "metadata": {"source_id": source_id, "workspace_id": ws}}
+        for i in range(n)
+    ]
+
+
+def _pick(rng: random.Random, workspaces: list[str]) -> str:
+    if rng.random() < HOT_SHARE:
+        return workspaces[rng.randrange(HOT_WORKSPACES)]
+    return workspaces[rng.randrange(len(workspaces))]
+
+
+def _replay(store, workspaces: list[str], args, writer: bool) -> tuple[list[float], dict[str, int]]:
+    """Run the query workload (and optionally a concurrent writer); returns latencies and rows written."""
+    written: dict[str, int] = {}
+    stop = threading.Event()
+
+    def write():
+        rng = random.Random(1)
+        source_id = 1_000_000
+        while not stop.is_set():
+            ws = workspaces[rng.randrange(len(workspaces))]
+            source_id += 1
+            store.add(_rows(ws, source_id, 20), np.random.default_rng(source_id).normal(size=(20, args.dim)))
+            written[ws] = written.get(ws, 0) + 20
+
+    thread = threading.Thread(target=write) if writer else None
+    if thread:
+        thread.start()
+    rng = random.Random(0)
+    queries = np.random.default_rng(2).normal(size=(args.queries, args.dim))
+    latencies = []
+    for q in queries:
+        ws = _pick(rng, workspaces)
+        start = time.perf_counter()
+        store.search(q, ws, min_similarity=0.3)
+        latencies.append(time.perf_counter() - start)
+    if thread:
+        stop.set()
+        thread.join()
+    return latencies, written
+
+
+def bench(name: str, factory, args) -> bool:
+    settings.vector_cache_max_mb = 1 << 20
+    store = factory()
+    workspaces = [uuid.uuid4().hex for _ in range(args.workspaces)]
+    rng = np.random.default_rng(0)
+    for ws in workspaces:
+        store.add(_rows(ws, 1, args.rows), rng.normal(size=(args.rows, args.dim)))
+
+    ok = True
+    for label, cache_mb, writer in (("unbounded", 1 << 20, False), (f"{args.cache_mb} MB", args.cache_mb, True)):
+        settings.vector_cache_max_mb = cache_mb
+        store = factory()  # starts cold, like a restarted worker
+        latencies, written = _replay(store, workspaces, args, writer)
+        stats = store.stats()
+        lookups = stats["hits"] + stats["loads"]
+        ms = np.asarray(latencies) * 1000
+        print(
+            f"  {name:<5} {label:>10} {stats['resident_shards']:>9} {stats['resident_bytes'] / 2**20:>9.1f} "
+            f"{stats['hits'] / max(lookups, 1):>8.0%} {stats['evictions']:>9} "
+            f"{np.percentile(ms, 50):>8.2f} {np.percentile(ms, 99):>8.2f}"
+        )
+        if writer:
+            settings.vector_cache_max_mb = 1 << 20
+            fresh = factory()
+            for ws in workspaces:
+                found = len(fresh.search(np.ones(args.dim), ws, min_similarity=-1.0))
+                if found != args.rows + written.get(ws, 0):
+                    print(f"  {name}: workspace {ws} has {found} rows, expected {args.rows + written.get(ws, 0)}")
+                    ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workspaces", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--cache-mb", type=int, default=16)
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    settings.ann_enabled = False  # every search reads the whole shard
+    settings.vector_search_dimensions = 0  # and returns every row above the threshold
+
+    print(f"{args.workspaces} workspaces x {args.rows} rows x {args.dim} dims, {HOT_SHARE:.0%} of {args.queries} queries on {HOT_WORKSPACES} hot ones")
+    print(f"  {'':<5} {'ceiling':>10} {'resident':>9} {'MB':>9} {'hit rate':>8} {'evictions':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    ok = all([bench(name, factory, args) for name, factory in BACKENDS.items()])
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
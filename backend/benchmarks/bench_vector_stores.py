@@ -0,0 +1,218 @@
+"""Conformance checks and timings for every VectorStore backend.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_vector_stores [--rows 20000] [--dim 256] [--queries 200]
+
+Each backend first runs the same behavioural checks (search order, source
+and workspace filters, thresholds, deletes, re-adds, dimension errors,
+re-embedding a workspace at a new dimension, and —
+for backends meant to be shared between workers — visibility of one
+instance's writes to a second instance). Then it is timed: bulk add in
+ingest-sized windows, the first (cold) search, warm searches, and the search
+right after another writer added a window. Uses a throwaway SQLite database
+and vector directory.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+_TMP = tempfile.mkdtemp(prefix="bench-vectors-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/bench.db")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_TMP, "chroma"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_TMP, "uploads"))
+
+import numpy as np  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import Base, engine  # noqa: E402
+from app.services.sql_vector_store import SqlVectorStore  # noqa: E402
+from app.services.vector_store import FileVectorStore, VectorStore  # noqa: E402
+
+WINDOW = 256  # rows per add, like add_source_stream
+
+# name → (factory, shared between workers)
+BACKENDS = {
+    "file": (lambda: FileVectorStore(os.path.join(_TMP, "file-store")), False),
+    "sql": (SqlVectorStore, True),
+}
+
+
+def _rows(workspace_id: str, source_id: int, n: int, start: int = 0) -> list[dict]:
+    return [
+        {
+            "id": f"{workspace_id}-{source_id}-{i}",
+            "text": f"chunk {i} of source {source_id}",
+            "metadata": {"source_id": source_id, "workspace_id": workspace_id, "chunk_index": i},
+        }
+        for i in range(start, start + n)
+    ]
+
+
+# -- conformance ---------------------------------------------------------------
+
+def check_search(store: VectorStore, rng):
+    ws = uuid.uuid4().hex
+    vectors = rng.normal(size=(20, 16))
+    store.add(_rows(ws, 1, 10), vectors[:10])
+    store.add(_rows(ws, 2, 10), vectors[10:])
+    hits = store.search(vectors[13], ws)
+    assert hits[0][1]["id"] == f"{ws}-2-3", hits[0][1]["id"]
+    assert abs(hits[0][0] - 1.0) < 1e-5
+    assert hits[0][1]["text"] == "chunk 3 of source 2"
+    assert hits[0][1]["metadata"]["chunk_index"] == 3
+    assert [s for s, _ in hits] == sorted((s for s, _ in hits), reverse=True)
+    assert all(r["metadata"]["source_id"] == 1 for _, r in store.search(vectors[13], ws, source_ids=[1]))
+    assert all(s >= 0.5 for s, _ in store.search(vectors[13], ws, min_similarity=0.5))
+
+
+def check_workspace_isolation(store: VectorStore, rng):
+    a, b = uuid.uuid4().hex, uuid.uuid4().hex
+    vectors = rng.normal(size=(5, 16))
+    store.add(_rows(a, 1, 5), vectors)
+    assert not store.search(vectors[0], b)
+    assert not store.has_candidates(b)
+    assert store.has_candidates(a) and store.has_candidates(a, [1]) and not store.has_candidates(a, [2])
+
+
+def check_remove_source(store: VectorStore, rng):
+    ws = uuid.uuid4().hex
+    vectors = rng.normal(size=(10, 16))
+    store.add(_rows(ws, 1, 5), vectors[:5])
+    store.add(_rows(ws, 2, 5), vectors[5:])
+    store.remove_source(1, ws)
+    assert {r["metadata"]["source_id"] for _, r in store.search(vectors[0], ws)} == {2}
+    assert not store.has_candidates(ws, [1])
+    store.remove_source(2)  # workspace looked up by the store
+    assert not store.has_candidates(ws)
+    # A source id can be added again after its rows were removed
+    store.add(_rows(ws, 1, 5), vectors[:5])
+    assert store.search(vectors[0], ws)[0][1]["id"] == f"{ws}-1-0"
+
+
+def check_remove_workspace(store: VectorStore, rng):
+    ws = uuid.uuid4().hex
+    vectors = rng.normal(size=(5, 16))
+    store.add(_rows(ws, 1, 5), vectors)
+    store.remove_workspace(ws)
+    assert not store.has_candidates(ws) and not store.search(vectors[0], ws)
+
+
+def check_dimension_mismatch(store: VectorStore, rng):
+    ws = uuid.uuid4().hex
+    store.add(_rows(ws, 1, 2), rng.normal(size=(2, 16)))
+    try:
+        store.add(_rows(ws, 2, 2), rng.normal(size=(2, 8)))
+    except ValueError:
+        return
+    raise AssertionError("adding a different dimension should raise ValueError")
+
+
+def check_replace_workspace(store: VectorStore, rng):
+    ws, other = uuid.uuid4().hex, uuid.uuid4().hex
+    store.add(_rows(ws, 1, 5), rng.normal(size=(5, 16)))
+    store.add(_rows(ws, 2, 5), rng.normal(size=(5, 16)))
+    store.add(_rows(other, 1, 5), rng.normal(size=(5, 16)))
+    store.remove_source(1, ws)
+    rows = store.rows(ws)
+    assert [r["id"] for r in rows] == [f"{ws}-2-{i}" for i in range(5)]
+    assert rows[3]["text"] == "chunk 3 of source 2" and rows[3]["metadata"]["chunk_index"] == 3
+    # Re-embedded at a smaller dimension, as after changing embedding_dimensions
+    vectors = rng.normal(size=(5, 8))
+    store.replace_workspace(ws, rows, vectors)
+    hits = store.search(vectors[2], ws)
+    assert hits[0][1]["id"] == f"{ws}-2-2" and hits[0][1]["text"] == "chunk 2 of source 2"
+    assert len(hits) <= 5 and store.has_candidates(ws, [2]) and not store.has_candidates(ws, [1])
+    store.add(_rows(ws, 3, 2), rng.normal(size=(2, 8)))
+    assert len(store.rows(ws)) == 7 and len(store.rows(other)) == 5
+    store.replace_workspace(ws, [], [])
+    assert not store.has_candidates(ws) and not store.rows(ws)
+
+
+def check_shared(store: VectorStore, rng, factory):
+    """A second instance (another worker) sees adds and deletes made through the first."""
+    other = factory()
+    ws = uuid.uuid4().hex
+    vectors = rng.normal(size=(10, 16))
+    store.add(_rows(ws, 1, 5), vectors[:5])
+    assert other.search(vectors[0], ws)[0][1]["id"] == f"{ws}-1-0"
+    store.add(_rows(ws, 2, 5), vectors[5:])
+    assert other.search(vectors[7], ws)[0][1]["id"] == f"{ws}-2-2"
+    other.remove_source(1, ws)
+    assert {r["metadata"]["source_id"] for _, r in store.search(vectors[0], ws)} == {2}
+    other.remove_workspace(ws)
+    assert not store.has_candidates(ws)
+
+
+CHECKS = [check_search, check_workspace_isolation, check_remove_source, check_remove_workspace, check_dimension_mismatch,
+          check_replace_workspace]
+
+
+def conformance(name: str, factory, shared: bool) -> bool:
+    rng = np.random.default_rng(0)
+    store = factory()
+    ok = True
+    for check in CHECKS + ([check_shared] if shared else []):
+        try:
+            check(store, rng, factory) if check is check_shared else check(store, rng)
+            status = "ok"
+        except Exception as e:
+            ok = False
+            status = f"FAILED: {e!r}"
+        print(f"  {name:<5} {check.__name__:<28} {status}")
+    return ok
+
+
+# -- timings ---------------------------------------------------------------------
+
+def bench(name: str, factory, shared: bool, args) -> None:
+    rng = np.random.default_rng(1)
+    store = factory()
+    ws = uuid.uuid4().hex
+    vectors = rng.normal(size=(args.rows + WINDOW, args.dim)).astype(np.float32)
+    start = time.perf_counter()
+    for offset in range(0, args.rows, WINDOW):
+        n = min(WINDOW, args.rows - offset)
+        store.add(_rows(ws, offset // 2000, n, offset), vectors[offset:offset + n])
+    add_s = time.perf_counter() - start
+
+    reader = factory() if shared else store
+    queries = vectors[rng.choice(args.rows, args.queries)]
+    start = time.perf_counter()
+    reader.search(queries[0], ws, min_similarity=0.3)
+    cold_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for q in queries:
+        reader.search(q, ws, min_similarity=0.3)
+    warm_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    store.add(_rows(ws, 99999, WINDOW, args.rows), vectors[args.rows:])
+    start = time.perf_counter()
+    hits = reader.search(vectors[args.rows], ws, min_similarity=0.3)
+    refresh_ms = (time.perf_counter() - start) * 1000
+    assert hits and hits[0][1]["id"] == f"{ws}-99999-{args.rows}", "search missed the newest window"
+    print(f"  {name:<5} {args.rows / add_s:>9,.0f} {cold_ms:>9.1f} {warm_ms:>9.2f} {refresh_ms:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    settings.ann_enabled = False  # compare exact search on both backends
+
+    print("Conformance")
+    ok = all([conformance(name, factory, shared) for name, (factory, shared) in BACKENDS.items()])
+    print(f"\nTimings ({args.rows} rows x {args.dim} dims, {WINDOW}-row adds)")
+    print(f"  {'':<5} {'rows/s add':>9} {'cold ms':>9} {'warm ms':>9} {'refresh ms':>11}")
+    for name, (factory, shared) in BACKENDS.items():
+        bench(name, factory, shared, args)
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Throughput of the single-pass VTT parser against the old multi-pass one.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_vtt [--repeat 50]
+
+Parses every transcript in seed_data/fake_transcripts/ and
+seed_data/fake_pm_team_meetings/ `--repeat` times with each parser, checks
+that both produce the same text, and reports MB/s and turns/s.
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from app.services.source_service import SourceService
+
+SEED_DIR = os.path.join(os.path.dirname(__file__), "..", "seed_data")
+FOLDERS = ("fake_transcripts", "fake_pm_team_meetings")
+
+
+def _legacy_parse_vtt(file_path: str) -> str:
+    """The previous parser: whole-file regex passes, then a line merge."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    text = re.sub(r"^WEBVTT[^\n]*\n", "", text)
+    text = re.sub(r"NOTE\b[^\n]*\n(?:[^\n]+\n)*\n?", "", text)
+    text = re.sub(r"STYLE\b[^\n]*\n(?:[^\n]+\n)*\n?", "", text)
+    text = re.sub(r"^[^\n]*\d{2}:\d{2}[\d:.]*\s*-->\s*\d{2}:\d{2}[\d:.]*[^\n]*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^[a-f0-9\-]+/\d+-\d+\s*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"^\d+\s*$", "", text, flags=re.MULTILINE)
+    text = re.sub(r"<v\s+([^>]+)>", r"\1: ", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    merged: list[str] = []
+    for line in lines:
+        if not merged:
+            merged.append(line)
+            continue
+        prev = merged[-1]
+        if ": " in line:
+            curr_speaker = line.split(": ", 1)[0]
+            if ": " in prev and prev.split(": ", 1)[0] == curr_speaker:
+                merged[-1] += " " + line.split(": ", 1)[1]
+            else:
+                merged.append(line)
+        else:
+            merged[-1] += " " + line
+    return "\n\n".join(merged)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    paths = sorted(p for folder in FOLDERS for p in glob.glob(os.path.join(SEED_DIR, folder, "*.vtt")))
+    megabytes = sum(os.path.getsize(p) for p in paths) / 1e6
+
+    for path in paths:
+        assert _legacy_parse_vtt(path) == SourceService.parse_vtt(path), f"{path}: parsers disagree"
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for path in paths:
+            _legacy_parse_vtt(path)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    turns = 0
+    for _ in range(args.repeat):
+        for path in paths:
+            turns += sum(1 for _ in SourceService.iter_vtt(path))
+    single_s = time.perf_counter() - start
+
+    print(f"{len(paths)} transcripts, {megabytes:.2f} MB, {turns // args.repeat} turns, x{args.repeat}")
+    print(f"{'parser':<12} {'seconds':>8} {'MB/s':>8} {'turns/s':>10}")
+    for name, seconds in (("multi-pass", legacy_s), ("single-pass", single_s)):
+        print(f"{name:<12} {seconds:>8.3f} {megabytes * args.repeat / seconds:>8.1f} {turns / seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""A local OpenAI-compatible server for benchmarks.
+
+Serves /chat/completions (plain and `stream=True` SSE) and /embeddings.
+Completions take `latency_ms` before the first token plus `token_ms` per
+token, so chat benchmarks measure our pipeline rather than the model. Embeddings are deterministic pseudo-random vectors of the text.
+"""
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+ANSWER = "This is a canned answer from the fake model, long enough to stream as several tokens."
+
+
+class FakeOpenAI:
+    """Run with `with FakeOpenAI(latency_ms=...) as server:` and point `llm_base_url` at `server.url`."""
+
+    def __init__(self, latency_ms: float = 500, token_ms: float = 20, dim: int = 64):
+        self.latency = latency_ms / 1000
+        self.token_delay = token_ms / 1000
+        self.dim = dim
+        self.requests = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+                fake.requests += 1
+                if self.path.endswith("/embeddings"):
+                    self._json(fake._embeddings(body))
+                elif self.path.endswith("/chat/completions"):
+                    time.sleep(fake.latency)
+                    if body.get("stream"):
+                        self._stream()
+                    else:
+                        # A blocking answer arrives once every token is generated
+                        time.sleep(fake.token_delay * len(ANSWER.split(" ")))
+                        self._json(fake._completion(ANSWER))
+                else:
+                    self.send_error(404)
+
+            def _json(self, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self):
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("connection", "close")
+                self.end_headers()
+                for token in ANSWER.split(" "):
+                    chunk = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+                             "choices": [{"index": 0, "delta": {"content": token + " "}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(fake.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def _embeddings(self, body: dict) -> dict:
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dim = body.get("dimensions") or self.dim
+        data = []
+        for i, text in enumerate(inputs):
+            rng = np.random.default_rng(int(hashlib.md5(str(text).encode()).hexdigest()[:8], 16))
+            data.append({"object": "embedding", "index": i, "embedding": rng.normal(size=dim).tolist()})
+        return {"object": "list", "data": data, "model": "fake", "usage": {"prompt_tokens": 0, "total_tokens": 0}}
+
+    @staticmethod
+    def _completion(content: str) -> dict:
+        return {
+            "id": "fake", "object": "chat.completion", "created": 0, "model": "fake",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def __enter__(self) -> "FakeOpenAI":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,231 @@
+"""Concurrent readers, writers and deleters against every VectorStore backend.
+
+Run from the backend directory:
+
+    python -m benchmarks.stress_vector_store [--seconds 10] [--writers 2] [--readers 4]
+
+Writers add whole sources (one `add` call each), a deleter removes random
+live ones, and readers search continuously while compaction runs as often as
+possible (`vector_compact_segments=2`). Readers check that
+
+- no row of a source whose removal finished before the search started is
+  returned, and every returned row's text belongs to its id;
+- a source whose add finished before the search started (and isn't being
+  removed) is found when searched for with its own vector.
+
+Reader latency is reported idle and under writes. At the end the store is
+reopened from disk (a new instance) and must hold exactly the sources that
+are still live, with all their rows. Uses a throwaway SQLite database and
+vector directory; exits non-zero on any violation.
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+_TMP = tempfile.mkdtemp(prefix="stress-vectors-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/stress.db")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_TMP, "chroma"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_TMP, "uploads"))
+
+import numpy as np  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import Base, engine  # noqa: E402
+from app.services.sql_vector_store import SqlVectorStore  # noqa: E402
+from app.services.vector_store import FileVectorStore, VectorStore  # noqa: E402
+
+FILE_DIR = os.path.join(_TMP, "file-store")
+BACKENDS = {
+    "file": lambda: FileVectorStore(FILE_DIR),
+    "sql": SqlVectorStore,
+}
+
+
+def _vectors(source_id: int, n: int, dim: int) -> np.ndarray:
+    return np.random.default_rng(source_id).normal(size=(n, dim)).astype(np.float32)
+
+
+def _text(chunk_id: str) -> str:
+    return f"text of {chunk_id}"
+
+
+class Run:
+    """Shared bookkeeping of one stress run."""
+
+    def __init__(self, store: VectorStore, workspace_id: str, dim: int):
+        self.store = store
+        self.ws = workspace_id
+        self.dim = dim
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.live: dict[int, int] = {}  # source id -> row count, once its add returned
+        self.removing: set[int] = set()
+        self.removed_at: dict[int, float] = {}
+        self.errors: list[str] = []
+        self.latencies: list[float] = []
+        self.stop = threading.Event()
+
+    def fail(self, message: str):
+        with self.lock:
+            if len(self.errors) < 20:
+                self.errors.append(message)
+
+    def write_loop(self):
+        rng = random.Random()
+        while not self.stop.is_set():
+            sid = next(self.ids)
+            n = rng.randint(5, 120)
+            rows = [
+                {"id": f"{sid}-{i}", "text": _text(f"{sid}-{i}"), "metadata": {"source_id": sid, "workspace_id": self.ws, "chunk_index": i}}
+                for i in range(n)
+            ]
+            try:
+                self.store.add(rows, _vectors(sid, n, self.dim))
+            except Exception as e:
+                self.fail(f"add {sid}: {e!r}")
+                continue
+            with self.lock:
+                self.live[sid] = n
+
+    def delete_loop(self):
+        rng = random.Random()
+        while not self.stop.is_set():
+            with self.lock:
+                # Keep roughly half the sources around
+                if len(self.live) < 8:
+                    sid = None
+                else:
+                    sid = rng.choice(list(self.live))
+                    self.removing.add(sid)
+            if sid is None:
+                time.sleep(0.005)
+                continue
+            try:
+                self.store.remove_source(sid, self.ws)
+            except Exception as e:
+                self.fail(f"remove {sid}: {e!r}")
+            with self.lock:
+                self.live.pop(sid, None)
+                self.removing.discard(sid)
+                self.removed_at[sid] = time.monotonic()
+
+    def read_once(self, rng: random.Random) -> float:
+        with self.lock:
+            candidates = [s for s in self.live if s not in self.removing]
+            gone = set(self.removed_at)
+        target = rng.choice(candidates) if candidates else None
+        q = _vectors(target, 1, self.dim)[0] if target is not None else np.random.default_rng().normal(size=self.dim)
+        start = time.perf_counter()
+        hits = self.store.search(q, self.ws, min_similarity=0.2)
+        elapsed = time.perf_counter() - start
+        for _, row in hits:
+            sid = row["metadata"]["source_id"]
+            if sid in gone:
+                self.fail(f"search returned {row['id']} after source {sid} was removed")
+            text = row["text"]
+            if text != _text(row["id"]):
+                # The SQL store reads texts lazily, so a row removed after the search reads as ""
+                with self.lock:
+                    removed_since = sid in self.removing or sid in self.removed_at
+                if text or not removed_since:
+                    self.fail(f"row {row['id']} came back with text {text!r}")
+        if target is not None:
+            with self.lock:
+                being_removed = target in self.removing or target in self.removed_at
+            if not being_removed and not any(r["id"] == f"{target}-0" for _, r in hits[:5]):
+                self.fail(f"source {target} was added but its first row was not found")
+        return elapsed
+
+    def read_loop(self):
+        rng = random.Random()
+        while not self.stop.is_set():
+            try:
+                elapsed = self.read_once(rng)
+            except Exception as e:
+                self.fail(f"search: {e!r}")
+                continue
+            with self.lock:
+                self.latencies.append(elapsed)
+
+
+def _wait_for_background_work():
+    for t in threading.enumerate():
+        if t.name in ("vector-compactor", "ann-builder"):
+            t.join()
+
+
+def _percentiles(samples: list[float]) -> str:
+    if not samples:
+        return "n/a"
+    ms = np.asarray(samples) * 1000
+    return f"p50 {np.percentile(ms, 50):6.2f} ms  p99 {np.percentile(ms, 99):6.2f} ms  ({len(ms)} searches)"
+
+
+def stress(name: str, factory, args) -> bool:
+    store = factory()
+    run = Run(store, uuid.uuid4().hex, args.dim)
+    # Seed some data and measure idle reads
+    for _ in range(20):
+        sid = next(run.ids)
+        rows = [{"id": f"{sid}-{i}", "text": _text(f"{sid}-{i}"), "metadata": {"source_id": sid, "workspace_id": run.ws}} for i in range(50)]
+        store.add(rows, _vectors(sid, 50, args.dim))
+        run.live[sid] = 50
+    _wait_for_background_work()
+    rng = random.Random(0)
+    idle = [run.read_once(rng) for _ in range(200)]
+
+    threads = [threading.Thread(target=run.write_loop) for _ in range(args.writers)]
+    threads += [threading.Thread(target=run.delete_loop)]
+    threads += [threading.Thread(target=run.read_loop) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    run.stop.set()
+    for t in threads:
+        t.join()
+    _wait_for_background_work()
+
+    # A fresh instance must see exactly the live sources, nothing more and nothing less
+    # Exact search, so every row is scored
+    settings.ann_enabled = False
+    search_dimensions, settings.vector_search_dimensions = settings.vector_search_dimensions, 0
+    reopened = factory()
+    expected = {f"{sid}-{i}" for sid, n in run.live.items() for i in range(n)}
+    found = {r["id"] for _, r in reopened.search(np.ones(args.dim), run.ws, min_similarity=-1.0)}
+    if found != expected:
+        run.fail(f"reopened store has {len(found - expected)} unexpected and {len(expected - found)} missing rows")
+    settings.ann_enabled = True
+    settings.vector_search_dimensions = search_dimensions
+
+    print(f"  {name}: {len(run.live)} live sources, {len(run.removed_at)} removed, {len(expected)} rows")
+    print(f"    reads idle         {_percentiles(idle)}")
+    print(f"    reads under writes {_percentiles(run.latencies)}")
+    for e in run.errors:
+        print(f"    FAILED: {e}")
+    print(f"    {'ok' if not run.errors else 'FAILED'}")
+    return not run.errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=64)
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    settings.vector_compact_segments = 2  # compact after nearly every write
+    settings.ann_min_rows = 2000  # and build the ANN index mid-run
+
+    print(f"{args.writers} writers, 1 deleter, {args.readers} readers for {args.seconds:g}s per backend")
+    ok = all([stress(name, factory, args) for name, factory in BACKENDS.items()])
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import numpy as np
+from app.services.answer_cache import AnswerCache
+
+
+def _vector(i: int) -> np.ndarray:
+    v = np.zeros(8, dtype=np.float32)
+    v[i] = 1.0
+    return v
+
+
+def test_hit_on_later_entry_moves_it_to_the_end():
+    ws = "test-answer-cache"
+    AnswerCache.forget_workspace(ws)
+    AnswerCache.store(ws, 1, None, _vector(0), "answer A", None, 1.0)
+    AnswerCache.store(ws, 1, None, _vector(1), "answer B", None, 1.0)
+
+    hit = AnswerCache.lookup(ws, 1, None, _vector(1))
+    assert hit is not None and hit["content"] == "answer B"
+    assert [e["content"] for e in AnswerCache._entries[ws]] == ["answer A", "answer B"]
+
+    hit = AnswerCache.lookup(ws, 1, None, _vector(0))
+    assert hit is not None and hit["content"] == "answer A"
+    assert [e["content"] for e in AnswerCache._entries[ws]] == ["answer B", "answer A"]
+    AnswerCache.forget_workspace(ws)
+
+
+def test_scope_and_version_are_respected():
+    ws = "test-answer-cache-scope"
+    AnswerCache.forget_workspace(ws)
+    AnswerCache.store(ws, 1, [2, 1], _vector(0), "scoped", None, 1.0)
+    AnswerCache.store(ws, 1, None, _vector(1), "all sources", None, 1.0)
+    assert AnswerCache.lookup(ws, 1, [1, 2], _vector(0))["content"] == "scoped"
+    assert AnswerCache.lookup(ws, 1, None, _vector(0)) is None
+    assert AnswerCache.lookup(ws, 2, None, _vector(1)) is None
+    AnswerCache.forget_workspace(ws)
@@ -0,0 +1,40 @@
+from app.services.context_packer import ContextPacker
+from app.services.embedding_service import estimate_tokens
+
+
+def _chunk(source_id: int, index: int, text: str, similarity: float) -> dict:
+    return {
+        "id": f"{source_id}-{index}",
+        "text": text,
+        "metadata": {"source_id": source_id, "source_name": f"source {source_id}", "chunk_index": index},
+        "similarity": similarity,
+    }
+
+
+def _sentences(n: int, word: str) -> str:
+    return " ".join(f"Sentence {i} is about {word}." for i in range(n))
+
+
+def test_long_top_passage_is_truncated_not_dropped():
+    long_text = _sentences(200, "budgets")
+    packed = ContextPacker.pack([_chunk(1, 0, long_text, 0.9)], budget=100)
+
+    assert len(packed) == 1
+    text = packed[0]["text"]
+    assert long_text.startswith(text) and text.endswith(".")
+    assert estimate_tokens(text) <= 100
+
+
+def test_truncation_leaves_room_for_later_sources():
+    contexts = [
+        _chunk(1, 0, _sentences(200, "budgets"), 0.9),
+        _chunk(2, 0, _sentences(5, "timelines"), 0.8),
+        _chunk(3, 0, _sentences(200, "staffing"), 0.7),
+    ]
+    budget = 300
+    packed = ContextPacker.pack(contexts, budget)
+
+    assert [p["metadata"]["source_id"] for p in packed] == [1, 2, 3]
+    assert packed[1]["text"] == contexts[1]["text"]
+    assert all(p["text"] for p in packed)
+    assert sum(estimate_tokens(p["text"]) for p in packed) <= budget
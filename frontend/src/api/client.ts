@@ -35,6 +35,19 @@ async function request<T>(url: string, options?: RequestInit): Promise<T> {
   return res.json();
 }
 
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+// One page of a cursor-paginated list; pass nextCursor back for the next page (null on the last one)
+async function requestPage<T>(url: string, cursor?: string | null): Promise<Page<T>> {
+  const sep = url.includes("?") ? "&" : "?";
+  const res = await fetch(`${BASE}${url}${cursor ? `${sep}cursor=${encodeURIComponent(cursor)}` : ""}`);
+  if (!res.ok) throw new Error(await res.text());
+  return { items: await res.json(), nextCursor: res.headers.get("X-Next-Cursor") };
+}
+
 function wsPrefix(workspaceId: string) {
   return `/api/workspaces/${workspaceId}`;
 }
@@ -43,11 +56,14 @@ export function createApi(workspaceId: string) {
   const p = wsPrefix(workspaceId);
   return {
     // Sources
-    getSources: () => request<import("../types").Source[]>(`${p}/sources`),
+    // Newest sources first page; nextCursor loads older ones
+    getSources: (cursor?: string | null) => requestPage<import("../types").Source>(`${p}/sources`, cursor),
+    // Every source id, for select-all and the enabled-source set
+    getSourceIds: () => request<number[]>(`${p}/sources/ids`),
     getSource: (id: number) =>
       request<import("../types").Source>(`${p}/sources/${id}`),
     addUrl: (url: string) =>
-      request<import("../types").Source>(`${p}/sources/url`, {
+      request<import("../types").IngestJob>(`${p}/sources/url`, {
         method: "POST",
         body: JSON.stringify({ url }),
       }),
@@ -56,7 +72,7 @@ export function createApi(workspaceId: string) {
     loginSharePoint: () =>
       request<{ ok: boolean }>(`${p}/sources/sharepoint/login`, { method: "POST" }),
     pasteContent: (title: string, content: string) =>
-      request<import("../types").Source>(`${p}/sources/paste`, {
+      request<import("../types").IngestJob>(`${p}/sources/paste`, {
         method: "POST",
         body: JSON.stringify({ title, content }),
       }),
@@ -65,29 +81,58 @@ export function createApi(workspaceId: string) {
       form.append("file", file);
       const res = await fetch(`${p}/sources/upload`, { method: "POST", body: form });
       if (!res.ok) throw new Error(await res.text());
-      return res.json() as Promise<import("../types").Source>;
+      return res.json() as Promise<import("../types").IngestJob>;
     },
+    getIngestJobs: () => request<import("../types").IngestJob[]>(`${p}/sources/jobs`),
     deleteSource: (id: number) =>
       request<void>(`${p}/sources/${id}`, { method: "DELETE" }),
 
     // Chat
-    getMessages: () => request<import("../types").ChatMessage[]>(`${p}/chat`),
+    // Newest messages first page; nextCursor loads earlier ones
+    getMessages: (cursor?: string | null) => requestPage<import("../types").ChatMessage>(`${p}/chat`, cursor),
     sendMessage: (content: string, source_ids?: number[]) =>
       request<import("../types").ChatMessage>(`${p}/chat`, {
         method: "POST",
         body: JSON.stringify({ content, source_ids }),
       }),
+    // Streams the answer over SSE, calling onToken with each text delta; resolves with the saved message
+    streamMessage: async (content: string, source_ids: number[] | undefined, onToken: (delta: string) => void) => {
+      const res = await fetch(`${BASE}${p}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ content, source_ids }),
+      });
+      if (!res.ok || !res.body) throw new Error(await res.text());
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop() ?? "";
+        for (const raw of events) {
+          if (!raw.startsWith("data: ")) continue;
+          const event = JSON.parse(raw.slice(6));
+          if (event.type === "token") onToken(event.content);
+          else if (event.type === "done") return event.message as import("../types").ChatMessage;
+          else if (event.type === "error") throw new Error(event.detail);
+        }
+      }
+      throw new Error("Chat stream ended before the answer was saved");
+    },
     resetChat: () =>
       request<{ ok: boolean }>(`${p}/chat/reset`, { method: "POST" }),
     restoreChat: () =>
       request<{ ok: boolean }>(`${p}/chat/reset`, { method: "DELETE" }),
     getSuggestions: () =>
-      request<{ suggestions: string[] }>(`${p}/chat/suggestions`).then((r) => r.suggestions),
+      request<import("../types").Suggestions>(`${p}/chat/suggestions`),
     getFollowups: () =>
-      request<{ suggestions: string[] }>(`${p}/chat/followups`, { method: "POST" }).then((r) => r.suggestions),
+      request<import("../types").Suggestions>(`${p}/chat/followups`, { method: "POST" }),
 
     // Artifacts
-    getArtifacts: () => request<import("../types").Artifact[]>(`${p}/artifacts`),
+    getArtifacts: (cursor?: string | null) => requestPage<import("../types").Artifact>(`${p}/artifacts`, cursor),
     createArtifact: (title: string, content_markdown: string) =>
       request<import("../types").Artifact>(`${p}/artifacts`, {
         method: "POST",
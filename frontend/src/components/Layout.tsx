@@ -1,4 +1,4 @@
-import { useState, useRef, useMemo } from "react";
+import { useState, useRef, useMemo, useEffect } from "react";
 import { Panel, Group as PanelGroup, usePanelRef, type PanelSize } from "react-resizable-panels";
 import { Share2, Check, ArrowLeft } from "lucide-react";
 import { SourcesPane } from "./sources/SourcesPane";
@@ -9,7 +9,7 @@ import { ResizeHandle } from "./ResizeHandle";
 import NotebookSwitcher from "./NotebookSwitcher";
 import { createApi } from "../api/client";
 import { useWorkspaceSync } from "../hooks/useWorkspaceSync";
-import type { Workspace } from "../types";
+import type { Workspace, IngestJob, SuggestionsReady } from "../types";
 
 interface LayoutProps {
   workspaceId: string;
@@ -41,10 +41,31 @@ export function Layout({ workspaceId, workspaces, onSwitchNotebook, onCreateNote
   const [chatRefresh, setChatRefresh] = useState(0);
   const [artifactsRefresh, setArtifactsRefresh] = useState(0);
 
+  // Background ingest jobs (uploads/URLs/pastes still being parsed and embedded)
+  const [ingestJobs, setIngestJobs] = useState<Record<string, IngestJob>>({});
+
+  // Latest suggestions/follow-ups generated in the background
+  const [suggestionsReady, setSuggestionsReady] = useState<SuggestionsReady | null>(null);
+
+  useEffect(() => {
+    setIngestJobs({});
+    api.getIngestJobs()
+      .then((jobs) => setIngestJobs(Object.fromEntries(jobs.map((j) => [j.id, j]))))
+      .catch(() => {});
+  }, [api]);
+
   useWorkspaceSync(workspaceId, {
     onSourcesChanged: () => setSourcesRefresh((n) => n + 1),
     onChatMessage: () => setChatRefresh((n) => n + 1),
     onArtifactsChanged: () => setArtifactsRefresh((n) => n + 1),
+    onIngestProgress: (job) =>
+      setIngestJobs((prev) => {
+        const next = { ...prev };
+        if (job.status === "done") delete next[job.id];
+        else next[job.id] = job;
+        return next;
+      }),
+    onSuggestionsReady: setSuggestionsReady,
   });
 
   // Panel refs for programmatic collapse/expand
@@ -167,6 +188,8 @@ export function Layout({ workspaceId, workspaces, onSwitchNotebook, onCreateNote
             onToggleSource={toggleSourceEnabled}
             onSetAllSources={setAllSources}
             onSourcesChanged={onSourcesChanged}
+            ingestJobs={Object.values(ingestJobs)}
+            onDismissJob={(id) => setIngestJobs((prev) => { const next = { ...prev }; delete next[id]; return next; })}
           />
         </Panel>
         <ResizeHandle id="sources-chat" />
@@ -180,7 +203,7 @@ export function Layout({ workspaceId, workspaces, onSwitchNotebook, onCreateNote
           onResize={makeResizeHandler(setChatCollapsed)}
           className="flex flex-col min-w-0"
         >
-          <ChatPane api={api} refreshKey={chatRefresh} enabledSourceIds={enabledSourceIds} onSaveToNote={handleSaveToNote} />
+          <ChatPane api={api} refreshKey={chatRefresh} enabledSourceIds={enabledSourceIds} suggestionsReady={suggestionsReady} onSaveToNote={handleSaveToNote} />
         </Panel>
         <ResizeHandle id="chat-studio" />
         <Panel
@@ -199,7 +222,7 @@ export function Layout({ workspaceId, workspaces, onSwitchNotebook, onCreateNote
       {sourcesEmpty && !modalDismissed && (
         <AddSourceModal
           api={api}
-          onSourceAdded={() => setSourcesRefresh((n) => n + 1)}
+          onSourceAdded={() => { setSourcesRefresh((n) => n + 1); setModalDismissed(true); }}
           onDismiss={() => setModalDismissed(true)}
         />
       )}
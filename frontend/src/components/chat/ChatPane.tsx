@@ -2,12 +2,14 @@ import { useState, useEffect, useRef } from "react";
 import { Send, Loader2, BookmarkPlus, Sparkles, Copy, Check } from "lucide-react";
 import ReactMarkdown from "react-markdown";
 import type { Api } from "../../api/client";
-import type { ChatMessage } from "../../types";
+import type { ChatMessage, SuggestionsReady } from "../../types";
 
-export function ChatPane({ api, refreshKey, enabledSourceIds, onSaveToNote }: { api: Api; refreshKey: number; enabledSourceIds: Set<number>; onSaveToNote: (content: string) => void }) {
+export function ChatPane({ api, refreshKey, enabledSourceIds, suggestionsReady, onSaveToNote }: { api: Api; refreshKey: number; enabledSourceIds: Set<number>; suggestionsReady: SuggestionsReady | null; onSaveToNote: (content: string) => void }) {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
+  const [olderCursor, setOlderCursor] = useState<string | null>(null);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streamingContent, setStreamingContent] = useState("");
   const [suggestions, setSuggestions] = useState<string[]>([]);
   const [loadingSuggestions, setLoadingSuggestions] = useState(false);
   const [followups, setFollowups] = useState<string[]>([]);
@@ -16,16 +18,27 @@ export function ChatPane({ api, refreshKey, enabledSourceIds, onSaveToNote }: {
   const bottomRef = useRef<HTMLDivElement>(null);
   const pendingTeachRef = useRef<string | null>(null);
 
+  // Pending follow-ups keep the spinner until their suggestions_ready event
+  const fetchFollowups = () => {
+    setLoadingFollowups(true);
+    api.getFollowups()
+      .then(({ suggestions, pending }) => {
+        setFollowups(suggestions);
+        setLoadingFollowups(pending);
+      })
+      .catch(() => {
+        setFollowups([]);
+        setLoadingFollowups(false);
+      });
+  };
+
   useEffect(() => {
-    api.getMessages().then((msgs) => {
+    api.getMessages().then(({ items: msgs, nextCursor }) => {
       setMessages(msgs);
+      setOlderCursor(nextCursor);
       // Restore follow-up suggestions for existing conversations
       if (msgs.length > 0 && msgs[msgs.length - 1].role === "assistant") {
-        setLoadingFollowups(true);
-        api.getFollowups()
-          .then(setFollowups)
-          .catch(() => setFollowups([]))
-          .finally(() => setLoadingFollowups(false));
+        fetchFollowups();
       }
     }).catch(() => {});
   }, [refreshKey]);
@@ -35,17 +48,37 @@ export function ChatPane({ api, refreshKey, enabledSourceIds, onSaveToNote }: {
     if (messages.length === 0 && enabledSourceIds.size > 0) {
       setLoadingSuggestions(true);
       api.getSuggestions()
-        .then(setSuggestions)
-        .catch(() => setSuggestions([]))
-        .finally(() => setLoadingSuggestions(false));
+        .then(({ suggestions, pending }) => {
+          setSuggestions(suggestions);
+          setLoadingSuggestions(pending);
+        })
+        .catch(() => {
+          setSuggestions([]);
+          setLoadingSuggestions(false);
+        });
     } else {
       setSuggestions([]);
+      setLoadingSuggestions(false);
     }
   }, [messages.length, enabledSourceIds.size]);
 
+  // Results generated in the background; follow-ups only if they are for the latest message
+  useEffect(() => {
+    if (!suggestionsReady) return;
+    if (suggestionsReady.kind === "suggestions") {
+      if (messages.length === 0) {
+        setSuggestions(suggestionsReady.suggestions);
+        setLoadingSuggestions(false);
+      }
+    } else if (String(messages[messages.length - 1]?.id) === suggestionsReady.key) {
+      setFollowups(suggestionsReady.suggestions);
+      setLoadingFollowups(false);
+    }
+  }, [suggestionsReady]);
+
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [messages, followups]);
+  }, [messages[messages.length - 1]?.id, followups, streamingContent]);
 
   const SLASH_COMMANDS: Record<string, string> = {
     "/new": "Clear the chat and start a fresh conversation",
@@ -58,13 +91,19 @@ export function ChatPane({ api, refreshKey, enabledSourceIds, onSaveToNote }: {
     const cmd = command.toLowerCase().trim();
 
     if (cmd === "/new") {
-      api.resetChat().then(() => setMessages([])).catch(() => {});
+      api.resetChat().then(() => {
+        setMessages([]);
+        setOlderCursor(null);
+      }).catch(() => {});
       return true;
     }
 
     if (cmd === "/restore") {
       api.restoreChat().then(() => {
-        api.getMessages().then(setMessages).catch(() => {});
+        api.getMessages().then(({ items, nextCursor }) => {
+          setMessages(items);
+          setOlderCursor(nextCursor);
+        }).catch(() => {});
       }).catch(() => {});
       return true;
     }
@@ -174,16 +213,12 @@ The topic to teach: ${topic}`;
 
     try {
       const sourceIds = enabledSourceIds.size > 0 ? Array.from(enabledSourceIds) : undefined;
-      await api.sendMessage(apiContent, sourceIds);
-      // Refresh all messages to get proper IDs
-      const updated = await api.getMessages();
-      setMessages(updated);
+      await api.streamMessage(apiContent, sourceIds, (delta) => setStreamingContent((prev) => prev + delta));
+      // Refresh the newest page to get proper IDs, keeping earlier pages already loaded
+      const { items: latest } = await api.getMessages();
+      setMessages((prev) => [...prev.filter((m) => latest.length > 0 && m.id < latest[0].id), ...latest]);
       // Fetch follow-up suggestions in the background
-      setLoadingFollowups(true);
-      api.getFollowups()
-        .then(setFollowups)
-        .catch(() => setFollowups([]))
-        .finally(() => setLoadingFollowups(false));
+      fetchFollowups();
     } catch {
       setMessages((prev) => [
         ...prev,
@@ -197,6 +232,17 @@ The topic to teach: ${topic}`;
       ]);
     } finally {
       setLoading(false);
+      setStreamingContent("");
+    }
+  };
+
+  const loadEarlier = async () => {
+    try {
+      const { items, nextCursor } = await api.getMessages(olderCursor);
+      setMessages((prev) => [...items, ...prev]);
+      setOlderCursor(nextCursor);
+    } catch {
+      /* ignore */
     }
   };
 
@@ -236,6 +282,14 @@ The topic to teach: ${topic}`;
             )}
           </div>
         )}
+        {olderCursor && (
+          <button
+            onClick={loadEarlier}
+            className="block mx-auto px-3 py-1 text-xs text-gray-400 hover:text-gray-200 hover:bg-gray-800/50 rounded-lg transition-colors"
+          >
+            Load earlier messages
+          </button>
+        )}
         {messages.map((msg) => (
           <div key={msg.id} className={`flex flex-col ${msg.role === "user" ? "items-end" : "items-start"}`}>
             <div
@@ -284,9 +338,17 @@ The topic to teach: ${topic}`;
         ))}
         {loading && (
           <div className="flex justify-start">
-            <div className="bg-gray-800 px-4 py-2.5 rounded-2xl rounded-bl-md">
-              <Loader2 size={16} className="animate-spin text-gray-400" />
-            </div>
+            {streamingContent ? (
+              <div className="max-w-[80%] bg-gray-800 text-gray-100 px-4 py-2.5 rounded-2xl rounded-bl-md text-sm leading-relaxed">
+                <div className="prose prose-invert prose-sm max-w-none prose-p:my-1 prose-headings:my-2 prose-ul:my-1 prose-ol:my-1 prose-li:my-0 prose-pre:my-2 prose-code:text-blue-300 prose-a:text-blue-400">
+                  <ReactMarkdown>{streamingContent}</ReactMarkdown>
+                </div>
+              </div>
+            ) : (
+              <div className="bg-gray-800 px-4 py-2.5 rounded-2xl rounded-bl-md">
+                <Loader2 size={16} className="animate-spin text-gray-400" />
+              </div>
+            )}
           </div>
         )}
         {!loading && (loadingFollowups || followups.length > 0) && (
@@ -1,7 +1,7 @@
 import { useState, useEffect } from "react";
 import { FileUp, Globe, Trash2, Loader2, ClipboardPaste, X, CheckSquare, Square } from "lucide-react";
 import type { Api } from "../../api/client";
-import type { Source } from "../../types";
+import type { Source, IngestJob } from "../../types";
 
 interface SourcesPaneProps {
   api: Api;
@@ -12,10 +12,20 @@ interface SourcesPaneProps {
   onToggleSource: (id: number) => void;
   onSetAllSources: (ids: number[]) => void;
   onSourcesChanged: (sourceIds: number[]) => void;
+  ingestJobs: IngestJob[];
+  onDismissJob: (id: string) => void;
 }
 
-export function SourcesPane({ api, refreshKey, onSelectSource, selectedSourceId, enabledSourceIds, onToggleSource, onSetAllSources, onSourcesChanged }: SourcesPaneProps) {
+const INGEST_LABELS: Record<IngestJob["kind"], string> = {
+  file: "Processing file",
+  url: "Fetching URL",
+  paste: "Adding pasted text",
+};
+
+export function SourcesPane({ api, refreshKey, onSelectSource, selectedSourceId, enabledSourceIds, onToggleSource, onSetAllSources, onSourcesChanged, ingestJobs, onDismissJob }: SourcesPaneProps) {
   const [sources, setSources] = useState<Source[]>([]);
+  const [sourceIds, setSourceIds] = useState<number[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [url, setUrl] = useState("");
   const [loading, setLoading] = useState(false);
   const [loadingMsg, setLoadingMsg] = useState("Processing...");
@@ -26,9 +36,21 @@ export function SourcesPane({ api, refreshKey, onSelectSource, selectedSourceId,
 
   const fetchSources = async () => {
     try {
-      const data = await api.getSources();
-      setSources(data);
-      onSourcesChanged(data.map((s) => s.id));
+      const [page, ids] = await Promise.all([api.getSources(), api.getSourceIds()]);
+      setSources(page.items);
+      setNextCursor(page.nextCursor);
+      setSourceIds(ids);
+      onSourcesChanged(ids);
+    } catch {
+      /* ignore */
+    }
+  };
+
+  const loadMore = async () => {
+    try {
+      const page = await api.getSources(nextCursor);
+      setSources((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
     } catch {
       /* ignore */
     }
@@ -186,23 +208,49 @@ export function SourcesPane({ api, refreshKey, onSelectSource, selectedSourceId,
         </div>
       )}
 
+      {/* Background ingest jobs */}
+      {ingestJobs.length > 0 && (
+        <div className="px-3 py-2 border-b border-gray-800 space-y-1">
+          {ingestJobs.map((job) =>
+            job.status === "failed" ? (
+              <div key={job.id} className="flex items-start gap-2 text-xs text-red-400">
+                <span className="flex-1">{INGEST_LABELS[job.kind]} failed: {job.error}</span>
+                <button onClick={() => onDismissJob(job.id)} className="text-gray-500 hover:text-gray-300">
+                  <X size={12} />
+                </button>
+              </div>
+            ) : (
+              <div key={job.id} className="flex items-center gap-2 text-xs text-gray-400">
+                <Loader2 size={12} className="animate-spin flex-shrink-0" />
+                <span>
+                  {INGEST_LABELS[job.kind]}
+                  {job.status === "embedding" && job.chunks_done > 0
+                    ? ` — embedded ${job.chunks_done}${job.chunks_total > 0 ? `/${job.chunks_total}` : ""} chunks`
+                    : "…"}
+                </span>
+              </div>
+            )
+          )}
+        </div>
+      )}
+
       {/* Source List */}
       <div className="flex-1 overflow-y-auto p-2">
-        {sources.length > 0 && (
+        {sourceIds.length > 0 && (
           <button
             onClick={() => {
-              const allEnabled = sources.every((s) => enabledSourceIds.has(s.id));
-              onSetAllSources(allEnabled ? [] : sources.map((s) => s.id));
+              const allEnabled = sourceIds.every((id) => enabledSourceIds.has(id));
+              onSetAllSources(allEnabled ? [] : sourceIds);
             }}
             className="flex items-center gap-2 w-full px-2 py-1.5 mb-1 text-xs text-gray-400 hover:text-gray-200 hover:bg-gray-800/50 rounded transition-colors"
           >
-            {sources.every((s) => enabledSourceIds.has(s.id))
+            {sourceIds.every((id) => enabledSourceIds.has(id))
               ? <CheckSquare size={14} className="text-blue-500" />
-              : sources.some((s) => enabledSourceIds.has(s.id))
+              : sourceIds.some((id) => enabledSourceIds.has(id))
                 ? <Square size={14} className="text-blue-500/50" />
                 : <Square size={14} />
             }
-            {sources.every((s) => enabledSourceIds.has(s.id)) ? "Deselect all" : "Select all"}
+            {sourceIds.every((id) => enabledSourceIds.has(id)) ? "Deselect all" : "Select all"}
           </button>
         )}
         {sources.length === 0 && !loading && (
@@ -233,6 +281,14 @@ export function SourcesPane({ api, refreshKey, onSelectSource, selectedSourceId,
             </button>
           </div>
         ))}
+        {nextCursor && (
+          <button
+            onClick={loadMore}
+            className="w-full px-2 py-1.5 text-xs text-gray-400 hover:text-gray-200 hover:bg-gray-800/50 rounded transition-colors"
+          >
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
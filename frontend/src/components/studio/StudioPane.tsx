@@ -7,6 +7,7 @@ import type { Artifact, Source } from "../../types";
 
 export function StudioPane({ api, refreshKey, selectedSourceId, onClearSource, pendingArtifactId, onClearPending }: { api: Api; refreshKey: number; selectedSourceId: number | null; onClearSource: () => void; pendingArtifactId?: number | null; onClearPending?: () => void }) {
   const [artifacts, setArtifacts] = useState<Artifact[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [selected, setSelected] = useState<Artifact | null>(null);
   const [editing, setEditing] = useState(false);
   const [title, setTitle] = useState("");
@@ -18,8 +19,9 @@ export function StudioPane({ api, refreshKey, selectedSourceId, onClearSource, p
 
   const fetchArtifacts = async () => {
     try {
-      const data = await api.getArtifacts();
-      setArtifacts(data);
+      const page = await api.getArtifacts();
+      setArtifacts(page.items);
+      setNextCursor(page.nextCursor);
     } catch {
       /* ignore */
     }
@@ -31,10 +33,11 @@ export function StudioPane({ api, refreshKey, selectedSourceId, onClearSource, p
   useEffect(() => {
     if (pendingArtifactId == null) return;
     fetchArtifacts().then(() => {
-      api.getArtifacts().then((data) => {
+      api.getArtifacts().then(({ items: data, nextCursor }) => {
         const target = data.find((a) => a.id === pendingArtifactId);
         if (target) {
           setArtifacts(data);
+          setNextCursor(nextCursor);
           selectArtifact(target);
           setEditing(true);
         }
@@ -67,6 +70,16 @@ export function StudioPane({ api, refreshKey, selectedSourceId, onClearSource, p
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const page = await api.getArtifacts(nextCursor);
+      setArtifacts((prev) => [...prev, ...page.items]);
+      setNextCursor(page.nextCursor);
+    } catch {
+      /* ignore */
+    }
+  };
+
   const selectArtifact = (artifact: Artifact) => {
     setSelected(artifact);
     setTitle(artifact.title);
@@ -163,6 +176,14 @@ export function StudioPane({ api, refreshKey, selectedSourceId, onClearSource, p
               </button>
             </div>
           ))}
+          {nextCursor && (
+            <button
+              onClick={loadMore}
+              className="w-full px-2 py-1.5 text-xs text-gray-400 hover:text-gray-200 hover:bg-gray-800/50 rounded transition-colors"
+            >
+              Load more
+            </button>
+          )}
         </div>
       ) : (
         /* Editor / Preview */
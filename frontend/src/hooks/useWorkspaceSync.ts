@@ -1,9 +1,12 @@
 import { useEffect, useRef, useCallback } from "react";
+import type { IngestJob, SuggestionsReady } from "../types";
 
 interface SyncCallbacks {
   onSourcesChanged?: () => void;
   onChatMessage?: () => void;
   onArtifactsChanged?: () => void;
+  onIngestProgress?: (job: IngestJob) => void;
+  onSuggestionsReady?: (ready: SuggestionsReady) => void;
 }
 
 export function useWorkspaceSync(workspaceId: string | null, callbacks: SyncCallbacks) {
@@ -31,6 +34,14 @@ export function useWorkspaceSync(workspaceId: string | null, callbacks: SyncCall
           case "artifacts_changed":
             callbacksRef.current.onArtifactsChanged?.();
             break;
+          case "ingest_progress": {
+            const { job_id, ...rest } = data;
+            callbacksRef.current.onIngestProgress?.({ id: job_id, ...rest });
+            break;
+          }
+          case "suggestions_ready":
+            callbacksRef.current.onSuggestionsReady?.({ kind: data.kind, key: data.key, suggestions: data.suggestions });
+            break;
         }
       } catch {
         // ignore malformed messages
@@ -21,6 +21,29 @@ export interface Source {
   created_at: string;
 }
 
+export interface IngestJob {
+  id: string;
+  kind: "file" | "url" | "paste";
+  name: string;
+  status: "queued" | "parsing" | "embedding" | "done" | "failed";
+  chunks_done: number;
+  chunks_total: number;
+  source_id: number | null;
+  error: string | null;
+}
+
+// Suggestions or follow-ups; pending ones arrive later as a SuggestionsReady event
+export interface Suggestions {
+  suggestions: string[];
+  pending: boolean;
+}
+
+export interface SuggestionsReady {
+  kind: "suggestions" | "followups";
+  key: string;
+  suggestions: string[];
+}
+
 export interface ChatMessage {
   id: number;
   role: "user" | "assistant";